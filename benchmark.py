@@ -0,0 +1,209 @@
+# Banc d'essai pour l'importation des vidéos dans ChronoPhys
+# Usage : python benchmark.py chemin/vers/video.mp4 [nombre d'images ...]
+#
+# Compare, pour plusieurs nombres d'images à extraire, le décodage par saut
+# (seek avant chaque image) et le décodage séquentiel (grab/retrieve).
+# Les écarts sont les plus marqués sur les vidéos à GOP long (smartphones).
+# Mesure ensuite l'évolution du temps d'importation avec le nombre de processus,
+# puis les allocations mémoire par image du prétraitement (tracemalloc) et, pour
+# les vidéos MJPEG (webcam), le décodage directement réduit. Mesure enfin le nombre
+# d'images affichées par seconde en passant d'une image à la suivante dans le canvas.
+
+import sys, os, time, tempfile, tracemalloc
+
+from cv2 import VideoCapture, resize, cvtColor, rotate, COLOR_BGR2RGB, INTER_AREA, ROTATE_90_CLOCKWISE, ROTATE_90_COUNTERCLOCKWISE, ROTATE_180
+from numpy import empty, uint8, full, nan
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from extract import extract_infos, extract_images, output_size, sample_indices, read_frames, FramePreprocessor, VideoSource, mjpeg_reduction, open_mjpeg
+from framestore import extract_to_store
+from renderer import CanvasRenderer
+
+def bench_decode_modes(video_file, budgets, repeat=3):
+    frame, camera_Width, camera_Height, fps, frame_count, duration = extract_infos(video_file)
+    print("Vidéo : "+video_file)
+    print("  "+str(camera_Width)+"x"+str(camera_Height)+", "+str(frame_count)+" images, "+str(round(fps,2))+" ips")
+    print("{:>8} {:>6} {:>12} {:>12} {:>12}".format("images", "pas", "seek (s)", "séq. (s)", "auto (s)"))
+
+    results = []
+    for maxFrames in budgets:
+        maxFrames = min(maxFrames, frame_count)
+        settings_perso = (camera_Width, camera_Height, maxFrames, 0)
+        increment = max(1, round(frame_count/maxFrames))
+        timings = []
+        for mode in ("seek", "sequential", "auto"):
+            best = None
+            for k in range(repeat):
+                start = time.perf_counter()
+                extract_images(video_file, settings_perso, mode)
+                elapsed = time.perf_counter()-start
+                if best == None or elapsed < best:
+                    best = elapsed
+            timings.append(best)
+        results.append((maxFrames, increment, timings))
+        print("{:>8} {:>6} {:>12.3f} {:>12.3f} {:>12.3f}".format(maxFrames, increment, *timings))
+    return results
+
+def bench_workers(video_file, workers_list):
+    frame, camera_Width, camera_Height, fps, frame_count, duration = extract_infos(video_file)
+    settings_perso = (camera_Width, camera_Height, frame_count, 0)
+    print("Importation complète ("+str(frame_count)+" images) sur le disque")
+    print("{:>10} {:>12} {:>10}".format("processus", "durée (s)", "gain"))
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for workers in workers_list:
+            path = os.path.join(folder, "bench_"+str(workers)+".frames")
+            start = time.perf_counter()
+            store = extract_to_store(video_file, settings_perso, path, workers=workers)[0]
+            elapsed = time.perf_counter()-start
+            store.release()
+            results.append((workers, elapsed))
+            print("{:>10} {:>12.3f} {:>10.2f}".format(workers, elapsed, results[0][1]/elapsed))
+    return results
+
+def prepare_frame_alloc(frameOrig, frameSize, rotation):
+    # Prétraitement d'origine : une nouvelle image à chaque étape, pour comparaison
+    frame = cvtColor(resize(frameOrig, frameSize,fx=0,fy=0, interpolation = INTER_AREA), COLOR_BGR2RGB)
+    if rotation == 90:
+        frame = rotate(frame, ROTATE_90_CLOCKWISE)
+    elif rotation == -90:
+        frame = rotate(frame, ROTATE_90_COUNTERCLOCKWISE)
+    elif rotation == 180:
+        frame = rotate(frame, ROTATE_180)
+    return frame
+
+def measure_allocations(video_file, settings_perso, preallocated):
+    # Renvoie (octets alloués temporairement par image, pic mémoire) pendant le prétraitement
+    frame, camera_Width, camera_Height, fps, frame_count, duration = extract_infos(video_file)
+    frameSize = output_size(camera_Width, camera_Height, settings_perso)
+    indices = sample_indices(frame_count, settings_perso[2])
+    preprocess = FramePreprocessor(frameSize, settings_perso[3], (camera_Width, camera_Height))
+    video_capture = VideoCapture(video_file)
+
+    tracemalloc.start()
+    if preallocated:
+        images = empty((len(indices),)+preprocess.shape, dtype=uint8)
+        buffer = preprocess.decoded
+    else:
+        images = []
+        buffer = None
+    transient = 0
+    k = 0
+    before = tracemalloc.get_traced_memory()[0]
+    for i, frameOrig, timestamp in read_frames(video_capture, indices, "auto", buffer):
+        if preallocated:
+            preprocess(frameOrig, images[k])
+        else:
+            images.append(prepare_frame_alloc(frameOrig, frameSize, settings_perso[3]))
+        current, peak = tracemalloc.get_traced_memory()
+        transient += peak-before
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        k += 1
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    video_capture.release()
+    return transient/max(1, k), peak
+
+def bench_allocations(video_file, maxFrames=60, rotation=90):
+    frame, camera_Width, camera_Height, fps, frame_count, duration = extract_infos(video_file)
+    settings_perso = (camera_Width, camera_Height, min(maxFrames, frame_count), rotation)
+    frame_bytes = FramePreprocessor(output_size(camera_Width, camera_Height, settings_perso), rotation).resized.nbytes
+    print("Allocations pendant le prétraitement ("+str(settings_perso[2])+" images, rotation "+str(rotation)+")")
+    print("{:>14} {:>16} {:>16} {:>12}".format("sortie", "Ko/image", "images allouées", "pic (Mo)"))
+
+    results = []
+    for name, preallocated in (("liste", False), ("préallouée", True)):
+        per_frame, peak = measure_allocations(video_file, settings_perso, preallocated)
+        results.append((name, per_frame, peak))
+        print("{:>14} {:>16.1f} {:>16.2f} {:>12.1f}".format(name, per_frame/1024, per_frame/frame_bytes, peak/1024**2))
+    return results
+
+def bench_mjpeg(video_file, scales=(2, 4, 8), repeat=3):
+    # Décodage complet puis redimensionnement, contre décodage JPEG directement réduit
+    source = VideoSource(video_file)
+    source.release()
+    if mjpeg_reduction(source, (source.width//2, source.height//2)) == 1:
+        print("Vidéo "+source.codec+" : pas de décodage réduit (MJPEG uniquement)")
+        return []
+    print("Décodage de toutes les images d'une vidéo MJPEG ("+str(source.frame_count)+" images)")
+    print("{:>10} {:>12} {:>12} {:>8}".format("taille", "complet (s)", "réduit (s)", "gain"))
+
+    results = []
+    for scale in scales:
+        frameSize = (source.width//scale, source.height//scale)
+        timings = []
+        for reduction in (1, mjpeg_reduction(source, frameSize)):
+            best = None
+            for k in range(repeat):
+                video_capture = open_mjpeg(video_file, reduction)
+                if video_capture == None:
+                    video_capture = VideoCapture(video_file)
+                    reduction = 1
+                preprocess = FramePreprocessor(frameSize, 0, (source.width, source.height), reduction=reduction)
+                out = empty(preprocess.shape, dtype=uint8)
+                start = time.perf_counter()
+                for i, frameOrig, timestamp in read_frames(video_capture, range(source.frame_count), "sequential", preprocess.decoded):
+                    preprocess(frameOrig, out)
+                elapsed = time.perf_counter()-start
+                video_capture.release()
+                if best == None or elapsed < best:
+                    best = elapsed
+            timings.append(best)
+        results.append((frameSize, timings))
+        print("{:>10} {:>12.3f} {:>12.3f} {:>8.2f}".format(str(frameSize[0])+"x"+str(frameSize[1]), timings[0], timings[1], timings[0]/timings[1]))
+    return results
+
+def bench_stepping(video_file, maxFrames=60, canvasSize=(1280, 720)):
+    # Passage d'une image à la suivante, hors écran (Agg) : cla() et imshow() à chaque image
+    # (affichage d'origine) contre les éléments persistants de CanvasRenderer
+    frame, camera_Width, camera_Height, fps, frame_count, duration = extract_infos(video_file)
+    images = extract_images(video_file, (camera_Width, camera_Height, min(maxFrames, frame_count), 0))[0]
+    height, width = images[0].shape[:2]
+    extent = [-width/2, width/2, -height/2, height/2]
+    settings = {"color":"b","line":"","point":".","grid":False,"ticks":True}
+    etalonnage = {"done":False, "valeurMetres":0, "valeurPixels":0}
+    x = full(len(images), nan)
+    y = full(len(images), nan)
+    print("Affichage de "+str(len(images))+" images "+str(width)+"x"+str(height)+" dans un canvas "+str(canvasSize[0])+"x"+str(canvasSize[1]))
+    print("{:>14} {:>12}".format("affichage", "images/s"))
+
+    results = []
+    for name in ("cla + imshow", "persistant"):
+        figure = Figure(figsize=(canvasSize[0]/100, canvasSize[1]/100), dpi=100)
+        canvas = FigureCanvasAgg(figure)
+        axes = figure.add_subplot(111)
+        figure.subplots_adjust(bottom=0, right=1, top=1, left=0)
+        renderer = CanvasRenderer(canvas, axes)
+        start = time.perf_counter()
+        for k in range(len(images)):
+            # Un point mesuré par image, comme pendant les mesures
+            x[k], y[k] = 0, 0
+            if name == "persistant":
+                renderer.render(k, images[k], extent, extent, x, y, settings, etalonnage, None, 1)
+            else:
+                axes.cla()
+                axes.imshow(images[k], extent=extent)
+                axes.plot(x, y, settings["color"]+settings["point"]+settings["line"])
+                canvas.draw()
+        elapsed = time.perf_counter()-start
+        x[:], y[:] = nan, nan
+        results.append((name, len(images)/elapsed))
+        print("{:>14} {:>12.1f}".format(name, len(images)/elapsed))
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage : python benchmark.py video.mp4 [nombre d'images ...]")
+        sys.exit(1)
+    budgets = [int(value) for value in sys.argv[2:]] or [10, 30, 60, 149]
+    bench_decode_modes(sys.argv[1], budgets)
+    workers_list = [1]
+    while workers_list[-1]*2 <= (os.cpu_count() or 1):
+        workers_list.append(workers_list[-1]*2)
+    bench_workers(sys.argv[1], workers_list)
+    bench_allocations(sys.argv[1])
+    bench_mjpeg(sys.argv[1])
+    bench_stepping(sys.argv[1])
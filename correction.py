@@ -0,0 +1,141 @@
+# Correction de la distorsion de l'objectif et de la perspective des images importées.
+# Chaque image est corrigée par un seul remap() à travers des tables de correspondance
+# calculées une fois par résolution et par réglage de correction, puis gardées sur le
+# disque pour les importations suivantes.
+#
+# Réglage de correction : (profil, points)
+#  - profil : profil de caméra (voir load_profiles) ou None
+#  - points : quatre coins (x, y) d'un rectangle du plan du mouvement, dans l'image
+#    d'origine sans distorsion (haut gauche, haut droit, bas droit, bas gauche), ou None
+#
+# Profil de caméra : fichier .json issu d'un étalonnage OpenCV (calibrateCamera)
+#  {"name": "Téléphone grand angle", "width": 1920, "height": 1080,
+#   "camera_matrix": [[fx, 0, cx], [0, fy, cy], [0, 0, 1]], "dist_coeffs": [k1, k2, p1, p2, k3]}
+
+import os, json, hashlib, zipfile
+
+from cv2 import initUndistortRectifyMap, getPerspectiveTransform, remap, CV_16SC2, INTER_LINEAR
+from numpy import array, eye, zeros, empty, float32, float64, savez, load
+from numpy.linalg import inv, norm
+
+# Dossier des tables de correspondance (None : tables recalculées à chaque importation), fixé par main.py
+CACHE_DIR = None
+# Nombre de tables gardées sur le disque (environ 12 Mo chacune en 1920x1080)
+TABLES_MAX = 8
+
+def load_profiles(folder):
+    # Profils de caméra du dossier, triés par nom de fichier (les fichiers invalides sont ignorés)
+    profiles = []
+    if not os.path.isdir(folder):
+        return profiles
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(folder, name), "r") as profilefile:
+                profile = json.load(profilefile)
+            array(profile["camera_matrix"], dtype=float64).reshape(3, 3)
+            if profile["width"] <= 0 or profile["height"] <= 0:
+                continue
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+        profile.setdefault("name", os.path.splitext(name)[0])
+        profiles.append(profile)
+    return profiles
+
+def camera_matrix(profile, size):
+    # Matrice de la caméra et coefficients de distorsion pour des images de taille size
+    scale = [[size[0]/profile["width"]], [size[1]/profile["height"]], [1]]
+    K = array(profile["camera_matrix"], dtype=float64).reshape(3, 3)*scale
+    return K, array(profile.get("dist_coeffs", [0, 0, 0, 0, 0]), dtype=float64)
+
+def target_rectangle(points):
+    # Rectangle de même centre et de mêmes côtés moyens que le quadrilatère des quatre points
+    p = array(points, dtype=float64)
+    width = (norm(p[1]-p[0])+norm(p[2]-p[3]))/2
+    height = (norm(p[3]-p[0])+norm(p[2]-p[1]))/2
+    cx, cy = p.mean(axis=0)
+    return array([[cx-width/2, cy-height/2], [cx+width/2, cy-height/2], [cx+width/2, cy+height/2], [cx-width/2, cy+height/2]], dtype=float32)
+
+def build_tables(correction, size, sourceSize):
+    # Tables de remap() pour des images de taille size (éventuellement réduites par rapport à sourceSize)
+    profile, points = correction
+    if profile != None:
+        K, D = camera_matrix(profile, size)
+    else:
+        K, D = eye(3), zeros(5)
+    # G : pixel de l'image corrigée -> pixel de l'image sans distorsion
+    G = eye(3)
+    if points != None:
+        quad = array(points, dtype=float32)*array([size[0]/sourceSize[0], size[1]/sourceSize[1]], dtype=float32)
+        G = getPerspectiveTransform(target_rectangle(quad), quad)
+    # initUndistortRectifyMap envoie le pixel u sur (K.R)^-1.u avant d'appliquer la distorsion :
+    # avec R = K^-1.G^-1.K, on obtient K^-1.G.u, soit la perspective puis la distorsion en un seul passage
+    R = inv(K) @ inv(G) @ K
+    return initUndistortRectifyMap(K, D, R, K, size, CV_16SC2)
+
+class Corrector:
+    def __init__(self, correction, sourceSize, cache_dir=None):
+        self.correction = correction
+        self.sourceSize = tuple(sourceSize)
+        self.cache_dir = cache_dir
+        # Taille des images -> (tables, image corrigée)
+        self.tables = dict()
+
+    def path(self, size):
+        key = json.dumps([self.correction, list(size), list(self.sourceSize)], sort_keys=True)
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode()).hexdigest()+".npz")
+
+    def load(self, size):
+        if self.cache_dir == None:
+            return build_tables(self.correction, size, self.sourceSize)
+        path = self.path(size)
+        try:
+            with load(path) as tables:
+                map1, map2 = tables["map1"], tables["map2"]
+            # La date du fichier sert de date de dernière utilisation
+            os.utime(path)
+            return map1, map2
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            # Table absente, tronquée ou illisible : recalculée
+            pass
+        map1, map2 = build_tables(self.correction, size, self.sourceSize)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Plusieurs processus peuvent calculer les mêmes tables : écriture puis renommage
+            partial = path[:-4]+"."+str(os.getpid())+".npz"
+            savez(partial, map1=map1, map2=map2)
+            os.replace(partial, path)
+            self.evict()
+        except OSError:
+            pass
+        return map1, map2
+
+    def evict(self):
+        # Les fichiers <clé>.<pid>.npz sont en cours d'écriture par un autre processus
+        tables = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".npz") and name.count(".") == 1]
+        tables.sort(key=os.path.getmtime)
+        for path in tables[:max(0, len(tables)-TABLES_MAX)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def __call__(self, frame):
+        # Image corrigée, écrite dans un tampon réutilisé d'une image à l'autre
+        size = (frame.shape[1], frame.shape[0])
+        if size not in self.tables:
+            map1, map2 = self.load(size)
+            self.tables[size] = (map1, map2, empty(frame.shape, dtype=frame.dtype))
+        map1, map2, out = self.tables[size]
+        return remap(frame, map1, map2, INTER_LINEAR, dst=out)
+
+def tables_dir():
+    # CACHE_DIR au moment de l'appel (à transmettre aux processus de décodage)
+    return CACHE_DIR
+
+def make_corrector(correction, sourceSize, cache_dir=None):
+    # None si aucune correction n'est demandée ; par défaut, tables gardées dans CACHE_DIR
+    if correction == None:
+        return None
+    return Corrector(correction, sourceSize, cache_dir or CACHE_DIR)
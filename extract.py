@@ -9,110 +9,1265 @@ from cv2 import (
     CAP_PROP_FPS,
     cvtColor,
     COLOR_BGR2RGB,
+    COLOR_BGR2GRAY,
+    COLOR_BGR2YUV_I420,
+    COLOR_GRAY2RGB,
+    COLOR_YUV2RGB_I420,
     CAP_PROP_POS_MSEC,
     CAP_PROP_POS_FRAMES,
     INTER_AREA,
-    ROTATE_90_COUNTERCLOCKWISE,
-    ROTATE_90_CLOCKWISE,
-    ROTATE_180,
-    rotate,
     flip,
+    absdiff,
     CAP_PROP_EXPOSURE,
     CAP_PROP_AUTO_EXPOSURE,
     CAP_PROP_SETTINGS,
+    CAP_PROP_FORMAT,
+    CAP_PROP_FOURCC,
+    imread,
+    imdecode,
+    IMREAD_COLOR,
+    IMREAD_REDUCED_COLOR_2,
+    IMREAD_REDUCED_COLOR_4,
+    IMREAD_REDUCED_COLOR_8,
+    goodFeaturesToTrack,
+    calcOpticalFlowPyrLK,
+    estimateAffinePartial2D,
+    warpAffine,
 )
+try:
+    from cv2 import CAP_PROP_LRF_HAS_KEY_FRAME, CAP_PROP_ORIENTATION_META
+except ImportError:
+    # OpenCV < 4.5 : ni images clés ni rotation enregistrée par le téléphone
+    CAP_PROP_LRF_HAS_KEY_FRAME = None
+    CAP_PROP_ORIENTATION_META = None
+try:
+    # Dates de prise de vue des suites d'images (Pillow est installé avec matplotlib)
+    from PIL import Image
+except ImportError:
+    Image = None
 
 from datetime import datetime
-import os, sys
+import os, sys, json
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from collections import deque
+from multiprocessing.shared_memory import SharedMemory
 
 from numpy import log as ln
+from numpy import ndarray, memmap, uint8, prod, empty, copyto, rot90, array, cumsum, convolve, pad, ones
+from math import atan2, cos, sin
+
+from correction import make_corrector, tables_dir
+
+# --------------------------------------------------
+# Vidéo ouverte une seule fois
+# --------------------------------------------------
+# Les informations du conteneur et la première image sont lues à l'ouverture ;
+# la même VideoCapture sert ensuite à la boîte de dialogue d'importation puis à
+# l'extraction des images, sans réanalyser le fichier ni recréer le décodeur.
+
+class VideoSource:
+    def __init__(self, video_file):
+        self.video_file = video_file
+        self.video_capture = VideoCapture(video_file)
+        if not self.video_capture.isOpened():
+            self.video_capture.release()
+            raise IOError("Impossible d'ouvrir la vidéo : "+str(video_file))
+
+        self.width  = int(self.video_capture.get(CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.video_capture.get(CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.video_capture.get(CAP_PROP_FPS)
+        self.frame_count = int(self.video_capture.get(CAP_PROP_FRAME_COUNT))
+        if self.fps <= 0 or self.frame_count <= 0:
+            self.video_capture.release()
+            raise IOError("Durée de la vidéo inconnue : "+str(video_file))
+        self.duration = self.frame_count/self.fps
+        fourcc = int(self.video_capture.get(CAP_PROP_FOURCC))
+        self.codec = "".join(chr((fourcc >> 8*k) & 0xFF) for k in range(4))
+        # Rotation enregistrée par le téléphone (déjà appliquée par OpenCV aux images lues)
+        self.orientation = 0
+        if CAP_PROP_ORIENTATION_META != None:
+            self.orientation = int(self.video_capture.get(CAP_PROP_ORIENTATION_META))
+
+        ret, frameOrig = self.video_capture.read()
+        if ret != True:
+            self.video_capture.release()
+            raise IOError("Impossible de lire la première image : "+str(video_file))
+        # Image d'aperçu en RGB
+        self.preview = cvtColor(frameOrig, COLOR_BGR2RGB)
+        self.index = None
+        self.motion = None
+
+    def infos(self):
+        return self.preview, self.width, self.height, self.fps, self.frame_count, self.duration
+
+    def open_capture(self):
+        # Nouveau décodeur indépendant (pour une lecture en parallèle de l'importation)
+        return VideoCapture(self.video_file)
+
+    def load_index(self, build=True):
+        # L'index (voir load_index) n'est chargé qu'une fois par vidéo ouverte ;
+        # sans build, seul un index déjà enregistré à côté de la vidéo est lu
+        if self.index == None:
+            self.index = load_index(self.video_file) if build else stored_index(self.video_file)
+        return self.index
+
+    def load_motion(self, first, last, workers=1, compute=True, callback=None):
+        # Mouvement de la caméra sur les images [first, last) (voir load_motion), gardé pour
+        # la dernière fenêtre mesurée pendant cette ouverture
+        if self.motion == None or first < self.motion[0] or last > self.motion[0]+len(self.motion[1]):
+            motion = load_motion(self, first, last, workers, compute, callback)
+            if motion == None:
+                return None
+            self.motion = (first, motion)
+        return self.motion[1][first-self.motion[0]:last-self.motion[0]]
+
+    def release(self):
+        if self.video_capture != None:
+            self.video_capture.release()
+            self.video_capture = None
+
+def open_source(video):
+    # Accepte un chemin ou une VideoSource déjà ouverte ; renvoie (source, True si elle a été ouverte ici)
+    if isinstance(video, VideoSource):
+        return video, False
+    return VideoSource(video), True
 
 def extract_infos(video_file):
-    video_capture = VideoCapture(video_file)
-    camera_Width  = int(video_capture.get(CAP_PROP_FRAME_WIDTH))  
-    camera_Height = int(video_capture.get(CAP_PROP_FRAME_HEIGHT))
+    source = VideoSource(video_file)
+    source.release()
+    return source.infos()
 
-    frameSize = (camera_Width, camera_Height)
+# --------------------------------------------------
+# Suites d'images numérotées
+# --------------------------------------------------
+# Les caméras rapides enregistrent une image par fichier (PNG, JPEG, TIFF...).
+# ImageSequenceSource se comporte comme une VideoSource : sa SequenceCapture imite
+# la VideoCapture (grab, retrieve, set, get) pour tout le reste de l'importation,
+# et read_frames lui fait lire plusieurs fichiers à la fois dans un pool de threads
+# (OpenCV libère le GIL pendant le décodage). Chaque image étant indépendante,
+# l'index des images les déclare toutes images clés : les sauts ne coûtent rien.
 
-    fps = video_capture.get(CAP_PROP_FPS) 
-    frame_count = int(video_capture.get(CAP_PROP_FRAME_COUNT))
-    duration = frame_count/fps
+SEQUENCE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp")
+# Images par seconde supposées si ni l'utilisateur ni les fichiers ne donnent les temps
+SEQUENCE_FPS = 30
+# Étiquettes EXIF : sous-dossier Exif, date de prise de vue et ses fractions de seconde
+EXIF_IFD = 0x8769
+EXIF_DATE_ORIGINAL = 36867
+EXIF_SUBSEC_ORIGINAL = 37521
 
-    video_capture.set(CAP_PROP_POS_FRAMES, 0) 
-    ret, frameOrig = video_capture.read()
-    if ret:
-        frame = cvtColor(frameOrig, COLOR_BGR2RGB)
-        return frame,camera_Width,camera_Height ,fps,frame_count,duration
+def is_sequence(path):
+    return os.path.isdir(path) or os.path.splitext(path)[1].lower() in SEQUENCE_EXTENSIONS
 
-    
-def extract_images(video_file,settings_perso): 
-    images = []
-    settings = dict()
-    error = False
+def sequence_key(name):
+    # Tri par préfixe puis par numéro (img_2 avant img_10)
+    base = os.path.splitext(name)[0]
+    prefix = base.rstrip("0123456789")
+    number = int(base[len(prefix):]) if len(prefix) < len(base) else -1
+    return prefix, number, name
+
+def sequence_files(path):
+    # Toutes les images du dossier, ou celles qui ne diffèrent du fichier choisi que par leur numéro
+    if os.path.isdir(path):
+        folder, prefix, extension = path, None, None
+    else:
+        folder = os.path.dirname(path)
+        base, extension = os.path.splitext(os.path.basename(path))
+        prefix = base.rstrip("0123456789")
+        extension = extension.lower()
+    files = []
+    for name in os.listdir(folder):
+        base, ext = os.path.splitext(name)
+        if ext.lower() not in SEQUENCE_EXTENSIONS:
+            continue
+        if extension != None and (ext.lower() != extension or base.rstrip("0123456789") != prefix):
+            continue
+        files.append(name)
+    files.sort(key=sequence_key)
+    return [os.path.join(folder, name) for name in files]
+
+def exif_time(image_file):
+    # Date de prise de vue en s (avec ses fractions de seconde), None si absente
+    if Image == None:
+        return None
+    try:
+        with Image.open(image_file) as image:
+            exif = image.getexif().get_ifd(EXIF_IFD)
+        date = exif.get(EXIF_DATE_ORIGINAL)
+        if not date:
+            return None
+        subsec = str(exif.get(EXIF_SUBSEC_ORIGINAL, "")).strip()
+        return datetime.strptime(str(date).strip(), "%Y:%m:%d %H:%M:%S").timestamp()+(float("0."+subsec) if subsec.isdigit() else 0)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def sequence_timestamps(files):
+    # Temps des images (en ms) d'après les dates de prise de vue, None si elles manquent ou ne croissent pas
+    if exif_time(files[0]) == None:
+        return None
+    with ThreadPoolExecutor() as pool:
+        times = list(pool.map(exif_time, files))
+    if None in times:
+        return None
+    pts = [(t-times[0])*1000 for t in times]
+    if any(pts[n+1] <= pts[n] for n in range(len(pts)-1)):
+        return None
+    return pts
+
+class SequenceCapture:
+    def __init__(self, files, pts, workers=None):
+        self.files = files
+        self.pts = pts
+        # Dernière image avancée par grab() et prochaine image à avancer
+        self.position = -1
+        self.next = 0
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = None
+
+    def isOpened(self):
+        return len(self.files) > 0
+
+    def grab(self):
+        # Aucune lecture ici : le fichier n'est décodé que par retrieve()
+        if self.next >= len(self.files):
+            return False
+        self.position = self.next
+        self.next += 1
+        return True
+
+    def retrieve(self, buffer=None):
+        if self.position < 0:
+            return False, None
+        frame = imread(self.files[self.position], IMREAD_COLOR)
+        if frame is None:
+            return False, None
+        return True, self.fit(frame, buffer)
+
+    def read(self, buffer=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(buffer)
+
+    def fit(self, frame, buffer):
+        # Copie dans le tampon fourni s'il a la bonne taille (les fichiers peuvent différer)
+        if buffer is not None and buffer.shape == frame.shape:
+            copyto(buffer, frame)
+            return buffer
+        return frame
+
+    def set(self, prop, value):
+        if prop == CAP_PROP_POS_FRAMES:
+            self.next = min(max(0, int(value)), len(self.files))
+        elif prop == CAP_PROP_POS_MSEC:
+            self.next = min(bisect_left(self.pts, value), len(self.files))
+        else:
+            return False
+        return True
+
+    def get(self, prop):
+        if prop == CAP_PROP_POS_FRAMES:
+            return self.next
+        if prop == CAP_PROP_POS_MSEC:
+            return self.pts[self.position] if self.position >= 0 else 0
+        if prop == CAP_PROP_FRAME_COUNT:
+            return len(self.files)
+        return 0
+
+    def decode(self, indices, buffer=None):
+        # Équivalent de read_frames : les fichiers suivants sont lus en parallèle,
+        # avec au plus deux fichiers d'avance par thread
+        if self.pool == None:
+            self.pool = ThreadPoolExecutor(self.workers)
+        ahead = 2*self.workers
+        pending = deque()
+        try:
+            for n, i in enumerate(indices):
+                while len(pending) < ahead and n+len(pending) < len(indices):
+                    j = indices[n+len(pending)]
+                    pending.append(self.pool.submit(imread, self.files[j], IMREAD_COLOR))
+                frame = pending.popleft().result()
+                if frame is None:
+                    return
+                self.position = i
+                self.next = i+1
+                yield i, self.fit(frame, buffer), self.pts[i]
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def release(self):
+        if self.pool != None:
+            self.pool.shutdown()
+            self.pool = None
+
+class ImageSequenceSource(VideoSource):
+    def __init__(self, path, fps=None):
+        # path : dossier ou l'un des fichiers de la suite ; fps : images par seconde
+        # (sinon dates de prise de vue des fichiers, sinon SEQUENCE_FPS)
+        self.video_file = path
+        self.files = sequence_files(path)
+        if len(self.files) < 2:
+            raise IOError("Aucune suite d'images : "+str(path))
+        frameOrig = imread(self.files[0], IMREAD_COLOR)
+        if frameOrig is None:
+            raise IOError("Impossible de lire la première image : "+self.files[0])
+        self.height, self.width = frameOrig.shape[:2]
+        self.frame_count = len(self.files)
+        self.codec = os.path.splitext(self.files[0])[1][1:].upper()
+        self.orientation = 0
+        self.preview = cvtColor(frameOrig, COLOR_BGR2RGB)
+        self.motion = None
+
+        pts = None
+        if fps == None:
+            pts = sequence_timestamps(self.files)
+        # Temps connus (fps donné ou dates des fichiers) ; sinon à demander à l'utilisateur
+        self.timed = fps != None or pts != None
+        self.video_capture = SequenceCapture(self.files, [])
+        if pts != None:
+            self.set_timestamps(pts)
+        else:
+            self.set_fps(fps or SEQUENCE_FPS)
+
+    def set_fps(self, fps):
+        self.set_timestamps([k*1000/fps for k in range(self.frame_count)])
+        self.timed = True
+
+    def set_timestamps(self, pts):
+        self.pts = pts
+        self.index = {"pts":pts, "keyframes":list(range(len(pts)))}
+        self.duration = index_duration(self.index)
+        self.fps = self.frame_count/self.duration
+        self.video_capture.pts = pts
+
+    def open_capture(self):
+        return SequenceCapture(self.files, self.pts)
+
+    def load_index(self, build=True):
+        # Pas de fichier d'index : les temps sont connus dès l'ouverture
+        return self.index
 
     
+# Au-delà de ce pas entre deux images échantillonnées, un saut direct (seek) vers
+# l'image suivante coûte moins cher que le décodage des images intermédiaires.
+# Les vidéos de smartphone (H.264) ont en général une image clé toutes les 30 images
+# ou plus : chaque seek oblige alors à redécoder depuis cette image clé.
+SEQUENTIAL_MAX_STRIDE = 30
+
+def choose_decode_mode(increment):
+    if increment <= SEQUENTIAL_MAX_STRIDE:
+        return "sequential"
+    return "seek"
+
+# --------------------------------------------------
+# Index des images (temps de présentation et images clés)
+# --------------------------------------------------
+# Les vidéos de smartphone ont souvent une fréquence d'images variable : le temps
+# d'une image ne se déduit pas de son numéro et des fps annoncés, et le saut par
+# numéro d'image d'OpenCV (qui passe par ces fps) tombe à côté. L'index relève en
+# une passe le temps réel de chaque image et les images clés ; il est enregistré
+# à côté de la vidéo pour les ouvertures suivantes.
+
+INDEX_VERSION = 1
+# Un saut vers l'image clé n'est fait que s'il évite au moins ce nombre d'images à décoder
+SEEK_MIN_SKIP = 8
+# Part de la vidéo couverte par la fenêtre importée à partir de laquelle l'index est
+# construit avant l'importation : en dessous, la passe sur tout le fichier coûterait
+# plus que l'importation elle-même (voir index_needed)
+INDEX_MIN_COVERAGE = 0.5
+
+def index_path(video_file):
+    return video_file+".index.json"
+
+def build_index(video_file):
+    # Lecture des paquets sans décodage (mode brut) quand OpenCV le permet,
+    # sinon passage sur toutes les images avec grab() (sans conversion)
+    packets = []
     video_capture = VideoCapture(video_file)
+    try:
+        if CAP_PROP_LRF_HAS_KEY_FRAME != None and video_capture.set(CAP_PROP_FORMAT, -1):
+            while video_capture.grab():
+                packets.append((video_capture.get(CAP_PROP_POS_MSEC), video_capture.get(CAP_PROP_LRF_HAS_KEY_FRAME) != 0))
+    finally:
+        video_capture.release()
+
+    if len(packets) == 0:
+        video_capture = VideoCapture(video_file)
+        try:
+            while video_capture.grab():
+                packets.append((video_capture.get(CAP_PROP_POS_MSEC), False))
+        finally:
+            video_capture.release()
+
+    # Les paquets arrivent dans l'ordre de décodage : tri dans l'ordre de présentation
+    packets.sort()
+    pts = [packet[0] for packet in packets]
+    if len(pts) < 2 or any(pts[n+1] <= pts[n] for n in range(len(pts)-1)):
+        # Temps absents ou incohérents : index inutilisable
+        return None
+    keyframes = [n for n, packet in enumerate(packets) if packet[1]]
+    stat = os.stat(video_file)
+    return {"version":INDEX_VERSION, "size":stat.st_size, "mtime":stat.st_mtime_ns, "pts":pts, "keyframes":keyframes or None}
+
+def stored_index(video_file):
+    # Index enregistré à côté de la vidéo s'il correspond toujours au fichier, None sinon
+    try:
+        stat = os.stat(video_file)
+        with open(index_path(video_file), "r") as indexfile:
+            index = json.load(indexfile)
+        if index.get("version") == INDEX_VERSION and index["size"] == stat.st_size and index["mtime"] == stat.st_mtime_ns:
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
 
-    camera_Width  = int(video_capture.get(CAP_PROP_FRAME_WIDTH)) 
-    camera_Height = int(video_capture.get(CAP_PROP_FRAME_HEIGHT)) 
+def load_index(video_file):
+    # Index enregistré à côté de la vidéo, sinon construit puis enregistré
+    index = stored_index(video_file)
+    if index != None:
+        return index
 
+    path = index_path(video_file)
+    index = build_index(video_file)
+    if index != None:
+        try:
+            with open(path, "w") as indexfile:
+                json.dump(index, indexfile)
+        except OSError:
+            # Dossier en lecture seule (clé USB, partage réseau...) : l'index sera reconstruit la prochaine fois
+            pass
+    return index
+
+def index_needed(settings_perso, frame_count, fps, lazy=False):
+    # L'index vaut sa passe sur toute la vidéo pour une lecture à la demande (sauts à chaque
+    # image affichée), des images lues par sauts ou une fenêtre couvrant une grande partie
+    # de la vidéo ; une courte importation lue d'une traite s'en passe
+    if lazy:
+        return True
+    first, last, duration = frame_window(settings_perso, frame_count, fps)
+    indices = sample_indices(frame_count, settings_perso[2], first, last)
+    if len(indices) > 1 and choose_decode_mode(indices[1]-indices[0]) == "seek":
+        return True
+    return last-first >= INDEX_MIN_COVERAGE*frame_count
+
+def index_duration(index):
+    # Durée en s : temps de la dernière image plus la durée moyenne d'une image
+    pts = index["pts"]
+    return (pts[-1]+(pts[-1]-pts[0])/(len(pts)-1))/1000
+
+def keyframe_before(index, i):
+    # Indice de la dernière image clé avant l'image i (i lui-même si les images clés sont inconnues)
+    if index["keyframes"] == None:
+        return i
+    p = bisect_right(index["keyframes"], i)
+    if p == 0:
+        return i
+    return index["keyframes"][p-1]
+
+def frame_at(index, msec):
+    # Indice de l'image dont le temps de présentation est le plus proche de msec
+    pts = index["pts"]
+    p = bisect_left(pts, msec)
+    if p == len(pts) or (p > 0 and msec-pts[p-1] <= pts[p]-msec):
+        p -= 1
+    return p
+
+def grab_frame(video_capture, i, position, index):
+    # Amène le décodeur sur l'image i (à lire ensuite avec retrieve()). position est
+    # l'indice de la dernière image lue (None si inconnu). Renvoie l'indice de l'image
+    # effectivement lue, ou None en fin de vidéo.
+    key = keyframe_before(index, i)
+    # Sans images clés connues, un saut peut coûter jusqu'à un GOP entier de décodage
+    skip = SEEK_MIN_SKIP if index["keyframes"] != None else SEQUENTIAL_MAX_STRIDE
+    if position == None or i <= position or key-position > skip:
+        # Le décodage reprend de toute façon à l'image clé : on saute directement à son temps
+        video_capture.set(CAP_PROP_POS_MSEC, index["pts"][key])
+        position = None
+    restarted = False
+    while True:
+        while position == None or position < i:
+            if video_capture.grab() != True:
+                return None
+            position = frame_at(index, video_capture.get(CAP_PROP_POS_MSEC))
+        if position == i or restarted:
+            # L'image lue est toujours repérée par son temps, jamais supposée
+            return position
+        # Le saut a dépassé l'image voulue (image clé mal indexée) : reprise à l'image clé
+        # précédente, ou au début de la vidéo, puis avance image par image jusqu'à l'image i
+        p = bisect_left(index["keyframes"], key) if index["keyframes"] != None else 0
+        key = index["keyframes"][p-1] if p > 0 else 0
+        if key == 0:
+            video_capture.set(CAP_PROP_POS_FRAMES, 0)
+            restarted = True
+        else:
+            video_capture.set(CAP_PROP_POS_MSEC, index["pts"][key])
+        position = None
+
+def read_frames(video_capture, indices, mode="auto", buffer=None, index=None):
+    # Renvoie successivement (indice, image BGR, temps en ms) pour chaque indice demandé.
+    # Si buffer est fourni, le décodeur y écrit chaque image : elle doit être
+    # exploitée avant de passer à la suivante. Avec un index, le mode est ignoré :
+    # le décodeur avance image par image et ne saute qu'aux images clés.
+    indices = list(indices)
+    if len(indices) == 0:
+        return
+    if isinstance(video_capture, SequenceCapture):
+        # Suite d'images : plusieurs fichiers lus à la fois
+        yield from video_capture.decode(indices, buffer)
+        return
+    if index != None:
+        position = None
+        for i in indices:
+            position = grab_frame(video_capture, i, position, index)
+            if position == None:
+                return
+            ret, frameOrig = video_capture.retrieve(buffer)
+            if ret != True:
+                return
+            # Temps de l'image effectivement lue
+            yield i, frameOrig, index["pts"][position]
+        return
+    if mode == "auto":
+        # Pas moyen (les indices ne sont pas forcément réguliers)
+        increment = (indices[-1]-indices[0])/(len(indices)-1) if len(indices) > 1 else 1
+        mode = choose_decode_mode(increment)
+
+    if mode == "seek":
+        for i in indices:
+            video_capture.set(CAP_PROP_POS_FRAMES, i)
+            ret, frameOrig = video_capture.read(buffer)
+            if ret != True:
+                return
+            yield i, frameOrig, video_capture.get(CAP_PROP_POS_MSEC)
+    else:
+        # Lecture du flux en une seule passe : grab() pour les images ignorées
+        # (pas de conversion), retrieve() uniquement pour les images conservées
+        position = indices[0]
+        video_capture.set(CAP_PROP_POS_FRAMES, position)
+        for i in indices:
+            while position < i:
+                if video_capture.grab() != True:
+                    return
+                position += 1
+            if video_capture.grab() != True:
+                return
+            position += 1
+            ret, frameOrig = video_capture.retrieve(buffer)
+            if ret != True:
+                return
+            yield i, frameOrig, video_capture.get(CAP_PROP_POS_MSEC)
+
+# Rotation de l'image (en degrés, sens horaire) -> nombre de quarts de tour pour numpy.rot90 (sens trigonométrique)
+ROT90_TURNS = {90: -1, -90: 1, 180: 2}
+
+class FramePreprocessor:
+    # Redimensionnement, conversion de couleurs et rotation d'une image décodée, écrits
+    # directement dans l'emplacement de sortie (une case d'un tableau (N, H, W, 3)).
+    # Les tampons intermédiaires sont alloués une seule fois pour toute l'importation.
+    def __init__(self, frameSize, rotation, sourceSize=None, fmt="rgb", crop=None, reduction=1, correct=None, stabilize=None):
+        self.frameSize = frameSize
+        self.rotation = rotation
+        self.fmt = fmt
+        # Zone (x, y, largeur, hauteur) de l'image décodée gardée avant tout autre traitement,
+        # ramenée à l'échelle des images décodées réduites (voir MjpegCapture)
+        if crop != None and reduction > 1:
+            crop = tuple(value//reduction for value in crop)
+        self.crop = crop
+        # Correction de la distorsion et de la perspective (voir correction.Corrector), avant la zone
+        self.correct = correct
+        # Compensation du mouvement de la caméra (voir Stabilizer), avant la correction
+        self.stabilize = stabilize
+        self.shape = frame_shape(frameSize, rotation, fmt)
+        self.resized = empty((frameSize[1], frameSize[0], 3), dtype=uint8)
+        if fmt == "gray":
+            self.gray = empty((frameSize[1], frameSize[0]), dtype=uint8)
+        elif fmt == "yuv420" and rotation in ROT90_TURNS:
+            # Le sous-échantillonnage de la chrominance se fait après la rotation
+            self.rotated = empty(frame_shape(frameSize, rotation), dtype=uint8)
+        # Tampon de décodage à passer à read_frames (imdecode alloue lui-même les images réduites)
+        self.decoded = None
+        if sourceSize != None and reduction == 1:
+            self.decoded = empty((sourceSize[1], sourceSize[0], 3), dtype=uint8)
+
+    def __call__(self, frameOrig, out=None, i=None):
+        # i : indice de l'image dans la vidéo (nécessaire à la stabilisation)
+        if out is None:
+            out = empty(self.shape, dtype=uint8)
+        if self.stabilize != None and i != None:
+            frameOrig = self.stabilize(frameOrig, i)
+        if self.correct != None:
+            frameOrig = self.correct(frameOrig)
+        if self.crop != None:
+            # Simple vue sur la zone : pas de copie
+            x, y, w, h = self.crop
+            frameOrig = frameOrig[y:y+h, x:x+w]
+        src = frameOrig
+        if frameOrig.shape[1] != self.frameSize[0] or frameOrig.shape[0] != self.frameSize[1]:
+            src = resize(frameOrig, self.frameSize, dst=self.resized, fx=0, fy=0, interpolation = INTER_AREA)
+        if self.fmt == "gray":
+            if self.rotation in ROT90_TURNS:
+                copyto(out, rot90(cvtColor(src, COLOR_BGR2GRAY, dst=self.gray), ROT90_TURNS[self.rotation]))
+            else:
+                cvtColor(src, COLOR_BGR2GRAY, dst=out)
+        elif self.fmt == "yuv420":
+            if self.rotation in ROT90_TURNS:
+                copyto(self.rotated, rot90(src, ROT90_TURNS[self.rotation]))
+                src = self.rotated
+            cvtColor(src, COLOR_BGR2YUV_I420, dst=out)
+        elif self.rotation in ROT90_TURNS:
+            # Inversion des canaux et rotation sont de simples vues : une seule copie vers la sortie
+            copyto(out, rot90(src[:, :, ::-1], ROT90_TURNS[self.rotation]))
+        else:
+            cvtColor(src, COLOR_BGR2RGB, dst=out)
+        return out
+
+def to_rgb(frame, fmt="rgb"):
+    # Conversion pour l'affichage d'une image stockée dans un format compact
+    if fmt == "gray":
+        return cvtColor(frame, COLOR_GRAY2RGB)
+    if fmt == "yuv420":
+        return cvtColor(frame, COLOR_YUV2RGB_I420)
+    return frame
+
+# Nombre maximal d'images conservées en mémoire lors d'une importation complète (en RGB)
+MAX_IMAGES = 150
+
+# Formats de stockage des images : RGB, YUV 4:2:0 planaire (I420) ou niveaux de gris
+FRAME_FORMATS = ("rgb", "yuv420", "gray")
+# Nombre d'octets par pixel de chaque format
+FORMAT_BYTES = {"rgb": 3, "yuv420": 1.5, "gray": 1}
+
+def frame_format(settings_perso):
+    # Le format est le cinquième réglage d'importation (RGB par défaut)
+    if len(settings_perso) > 4:
+        return settings_perso[4]
+    return "rgb"
+
+def max_images(fmt="rgb"):
+    # À mémoire égale, les formats compacts permettent de garder plus d'images
+    return int(MAX_IMAGES*FORMAT_BYTES["rgb"]/FORMAT_BYTES[fmt])
+
+def crop_region(settings_perso):
+    # Zone (x, y, largeur, hauteur) de l'image d'origine à importer : huitième réglage,
+    # None pour l'image entière
+    if len(settings_perso) > 7 and settings_perso[7] != None:
+        return tuple(settings_perso[7])
+    return None
+
+def output_size(camera_Width, camera_Height, settings_perso):
     frameSize = (camera_Width, camera_Height)
-    frameRatio= camera_Width/camera_Height
     # On applique le choix de l'utilisateur...
     if settings_perso[0] != camera_Width or settings_perso[1] != camera_Height:
         frameSize = (settings_perso[0],settings_perso[1])
-        frameRatio = settings_perso[0]/settings_perso[1]
-    
 
-    # ... mais on s'assure que l'image soit quand même pas trop grande (pour la fluidité...)
+    # ... à la zone choisie, avec la même échelle que pour l'image entière...
+    roi = crop_region(settings_perso)
+    if roi != None:
+        frameSize = (max(2, round(roi[2]*frameSize[0]/camera_Width)), max(2, round(roi[3]*frameSize[1]/camera_Height)))
 
+    # ... mais on s'assure que l'image soit quand même pas trop grande (pour la fluidité...)
     if frameSize[0] > 1280 or frameSize[1] > 720:
-        frameSize = (settings_perso[0]//2,settings_perso[1]//2)
+        frameSize = (frameSize[0]//2,frameSize[1]//2)
+
+    # Le YUV 4:2:0 demande des dimensions paires
+    if frame_format(settings_perso) == "yuv420":
+        frameSize = (frameSize[0]//2*2, frameSize[1]//2*2)
+    return frameSize
+
+def source_point(settings, x, y):
+    # Pixel (colonne x, ligne y) d'une image importée -> position dans l'image d'origine
+    # (avant zone, redimensionnement et rotation)
+    width, height = settings["width"], settings["height"]
+    rotation = settings.get("rotation", 0)
+    if rotation == 90:
+        x, y = y, height-1-x
+    elif rotation == -90:
+        x, y = width-1-y, x
+    elif rotation == 180:
+        x, y = width-1-x, height-1-y
+    roi = settings.get("roi") or (0, 0, settings["camera_width"], settings["camera_height"])
+    return roi[0]+x*roi[2]/width, roi[1]+y*roi[3]/height
+
+def imported_point(settings, x, y):
+    # Position dans l'image d'origine -> pixel (colonne, ligne) de l'image importée (inverse de source_point)
+    width, height = settings["width"], settings["height"]
+    roi = settings.get("roi") or (0, 0, settings["camera_width"], settings["camera_height"])
+    x, y = (x-roi[0])*width/roi[2], (y-roi[1])*height/roi[3]
+    rotation = settings.get("rotation", 0)
+    if rotation == 90:
+        x, y = height-1-y, x
+    elif rotation == -90:
+        x, y = y, width-1-x
+    elif rotation == 180:
+        x, y = width-1-x, height-1-y
+    return x, y
 
+def frame_shape(frameSize, rotation, fmt="rgb"):
+    # Dimensions (lignes, colonnes, canaux) d'une image après redimensionnement et rotation
+    width, height = frameSize
+    if rotation == 90 or rotation == -90:
+        width, height = height, width
+    if fmt == "gray":
+        return (height, width)
+    if fmt == "yuv420":
+        # Plan Y suivi des plans U et V (un quart de la taille chacun)
+        return (height*3//2, width)
+    return (height, width, 3)
 
-    fps = video_capture.get(CAP_PROP_FPS) 
-    frame_count = int(video_capture.get(CAP_PROP_FRAME_COUNT))
-    duration = frame_count/fps
-    maxFrames = settings_perso[2]
-    frameRate = 1/maxFrames*duration
-    increment = round(1/(maxFrames/frame_count))
+def sample_indices(frame_count, maxFrames, first=0, last=None):
+    # maxFrames images au plus, régulièrement réparties sur les images [first, last)
+    if last == None:
+        last = frame_count
+    increment = max(1, round((last-first)/maxFrames))
+    return range(first, last, increment)
 
+def time_window(settings_perso):
+    # Fenêtre d'importation (début, fin) en s : sixième et septième réglages,
+    # fin à None pour aller jusqu'au bout de la vidéo
+    if len(settings_perso) > 6:
+        return settings_perso[5], settings_perso[6]
+    return 0, None
+
+SAMPLING_MODES = ("uniform", "motion")
+
+def sampling_mode(settings_perso):
+    # Répartition des images : "uniform" (pas constant) ou "motion" (selon le mouvement),
+    # neuvième réglage
+    if len(settings_perso) > 8:
+        return settings_perso[8]
+    return "uniform"
+
+def correction_settings(settings_perso):
+    # Correction de l'objectif et de la perspective (voir correction.py) ou None, dixième réglage
+    if len(settings_perso) > 9:
+        return settings_perso[9]
+    return None
+
+def stabilisation_enabled(settings_perso):
+    # Compensation des tremblements de la caméra (voir Stabilizer), onzième réglage
+    if len(settings_perso) > 10:
+        return bool(settings_perso[10])
+    return False
+
+def frame_window(settings_perso, frame_count, fps, index=None):
+    # Images [first, last) de la fenêtre d'importation et sa durée (en s)
+    start, end = time_window(settings_perso)
+    if index != None:
+        pts = index["pts"]
+        first = bisect_left(pts, start*1000)
+        last = len(pts) if end == None else bisect_right(pts, end*1000)
+    else:
+        first = int(round(start*fps))
+        last = frame_count if end == None else int(round(end*fps))+1
+    first = min(max(0, first), frame_count-1)
+    last = min(max(first+1, last), frame_count)
+
+    if index == None:
+        duration = (last-first)/fps
+    elif last == frame_count:
+        duration = index_duration(index)-pts[first]/1000
+    else:
+        duration = (pts[last]-pts[first])/1000
+    return first, last, duration
+
+# --------------------------------------------------
+# Échantillonnage selon le mouvement
+# --------------------------------------------------
+# Une première passe rapide mesure le mouvement entre images consécutives (différence
+# absolue moyenne d'images réduites en niveaux de gris) ; les images sont ensuite
+# choisies pour que chacune couvre la même quantité de mouvement. Les passages
+# immobiles gardent quelques images grâce à un mouvement minimal.
+
+# Largeur des images réduites pour la mesure du mouvement
+MOTION_WIDTH = 64
+# Mouvement minimal attribué à chaque image (fraction du mouvement moyen)
+MOTION_FLOOR = 0.1
+
+def motion_energy(video_capture, first, last, crop=None, index=None):
+    # energy[k] : mouvement entre les images first+k-1 et first+k (0 pour la première)
+    energy = []
+    previous = None
+    small = None
+    for i, frameOrig, timestamp in read_frames(video_capture, range(first, last), "sequential", None, index):
+        if crop != None:
+            x, y, w, h = crop
+            frameOrig = frameOrig[y:y+h, x:x+w]
+        if small == None:
+            small = (MOTION_WIDTH, max(1, round(frameOrig.shape[0]*MOTION_WIDTH/frameOrig.shape[1])))
+        gray = cvtColor(resize(frameOrig, small, interpolation=INTER_AREA), COLOR_BGR2GRAY)
+        energy.append(0 if previous is None else float(absdiff(gray, previous).mean()))
+        previous = gray
+    return energy
+
+def motion_indices(energy, first, maxFrames):
+    # maxFrames indices (croissants, sans doublon) répartis selon le mouvement cumulé
+    n = len(energy)
+    if maxFrames >= n:
+        return list(range(first, first+n))
+    floor = MOTION_FLOOR*sum(energy)/n+1e-6
+    cumulated = []
+    total = 0
+    for value in energy:
+        total += value+floor
+        cumulated.append(total)
+    indices = []
+    k = -1
+    for m in range(maxFrames):
+        # Au moins une image après la précédente, et assez d'images restantes pour la suite
+        k = max(bisect_left(cumulated, total*m/maxFrames), k+1)
+        k = min(k, n-(maxFrames-m))
+        indices.append(first+k)
+    return indices
+
+def import_indices(video_capture, settings_perso, frame_count, first, last, index=None):
+    # Indices des images à importer dans la fenêtre [first, last)
+    if sampling_mode(settings_perso) == "motion":
+        # La zone est définie sur l'image corrigée : avec une correction, le mouvement est mesuré sur toute l'image
+        crop = crop_region(settings_perso) if correction_settings(settings_perso) == None else None
+        energy = motion_energy(video_capture, first, last, crop, index)
+        if len(energy) > 0:
+            return motion_indices(energy, first, settings_perso[2])
+    return sample_indices(frame_count, settings_perso[2], first, last)
+
+# --------------------------------------------------
+# Décodage réduit des vidéos MJPEG
+# --------------------------------------------------
+# Chaque image d'une vidéo MJPEG (enregistrements de la webcam) est un JPEG complet.
+# En mode brut, la VideoCapture rend le paquet sans le décoder ; imdecode le décode
+# alors directement à 1/2, 1/4 ou 1/8 de sa taille (mise à l'échelle dans le domaine
+# de la DCT), bien plus vite qu'un décodage complet suivi d'un redimensionnement.
+
+MJPEG_CODECS = ("MJPG",)
+REDUCED_FLAGS = {2: IMREAD_REDUCED_COLOR_2, 4: IMREAD_REDUCED_COLOR_4, 8: IMREAD_REDUCED_COLOR_8}
+
+def mjpeg_reduction(source, frameSize, crop=None):
+    # Plus grande réduction qui garde la zone décodée au moins aussi grande que frameSize (1 sinon)
+    if source.codec.upper() not in MJPEG_CODECS:
+        return 1
+    width, height = (source.width, source.height) if crop == None else crop[2:]
+    for reduction in (8, 4, 2):
+        if width//reduction >= frameSize[0] and height//reduction >= frameSize[1]:
+            return reduction
+    return 1
+
+class MjpegCapture:
+    def __init__(self, video_file, reduction):
+        self.video_capture = VideoCapture(video_file)
+        self.reduction = reduction
+        self.flag = REDUCED_FLAGS[reduction]
+        self.raw = self.video_capture.isOpened() and self.video_capture.set(CAP_PROP_FORMAT, -1)
+
+    def isOpened(self):
+        return self.video_capture.isOpened()
+
+    def grab(self):
+        # En mode brut, grab() ne fait que lire le paquet suivant
+        return self.video_capture.grab()
+
+    def retrieve(self, buffer=None):
+        ret, packet = self.video_capture.retrieve()
+        if ret != True or packet is None:
+            return False, None
+        frame = imdecode(packet, self.flag)
+        if frame is None:
+            return False, None
+        return True, frame
+
+    def read(self, buffer=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(buffer)
+
+    def set(self, prop, value):
+        return self.video_capture.set(prop, value)
+
+    def get(self, prop):
+        return self.video_capture.get(prop)
+
+    def release(self):
+        self.video_capture.release()
+
+def open_mjpeg(video_file, reduction):
+    # MjpegCapture si la première image se décode ainsi, None sinon (lecture normale)
+    if reduction <= 1:
+        return None
+    video_capture = MjpegCapture(video_file, reduction)
+    if video_capture.raw and video_capture.read()[0]:
+        video_capture.set(CAP_PROP_POS_FRAMES, 0)
+        return video_capture
+    video_capture.release()
+    return None
+
+# --------------------------------------------------
+# Décodage parallèle par blocs
+# --------------------------------------------------
+# La plage d'images est découpée en blocs contigus, chacun décodé dans son propre
+# processus avec sa propre VideoCapture : le premier saut du bloc repart de l'image
+# clé la plus proche, la suite est lue séquentiellement. Les images prétraitées
+# sont écrites directement à leur place dans un tampon partagé (mémoire partagée
+# ou fichier memmap).
+
+# Nombre minimal d'images par bloc (en dessous, le lancement des processus coûte plus qu'il ne rapporte)
+PARALLEL_MIN_CHUNK = 16
+# Plusieurs blocs par processus pour suivre la progression et pouvoir interrompre l'importation
+CHUNKS_PER_WORKER = 4
+
+def parallel_workers(nb_images, workers):
+    return max(1, min(workers, nb_images//PARALLEL_MIN_CHUNK))
+
+def split_chunks(indices, workers):
+    indices = list(indices)
+    nb_chunks = max(1, min(workers*CHUNKS_PER_WORKER, len(indices)//PARALLEL_MIN_CHUNK))
+    size = -(-len(indices)//nb_chunks)
+    return [indices[k:k+size] for k in range(0, len(indices), size)]
+
+def open_target(target):
+    # target = ("shm", nom de la mémoire partagée, forme) ou ("memmap", chemin du fichier, forme)
+    kind, name, shape = target
+    if kind == "shm":
+        shm = SharedMemory(name=name)
+        return ndarray(shape, dtype=uint8, buffer=shm.buf), shm
+    return memmap(name, dtype=uint8, mode="r+", shape=shape), None
+
+def decode_chunk(video_file, indices, frameSize, rotation, target, first_slot, fmt="rgb", index=None, crop=None, reduction=1, correction=None, cache_dir=None, stabilize=None):
+    # Exécuté dans un processus séparé
+    video_capture = open_mjpeg(video_file, reduction)
+    if video_capture == None:
+        video_capture = VideoCapture(video_file)
+        reduction = 1
+    sourceSize = (int(video_capture.get(CAP_PROP_FRAME_WIDTH)), int(video_capture.get(CAP_PROP_FRAME_HEIGHT)))
+    preprocess = FramePreprocessor(frameSize, rotation, sourceSize, fmt, crop, reduction, make_corrector(correction, sourceSize, cache_dir), stabilize)
+    frames, shm = open_target(target)
     mytime = []
-    if maxFrames < 150:
-        i = 0
-        while video_capture.isOpened():
-            video_capture.set(CAP_PROP_POS_FRAMES, i) 
-            ret, frameOrig = video_capture.read()
-            if ret == True:
-                mytime.append(video_capture.get(CAP_PROP_POS_MSEC))
-                frame = cvtColor(resize(frameOrig, frameSize,fx=0,fy=0, interpolation = INTER_AREA), COLOR_BGR2RGB)
-                if settings_perso[3] == 90:
-                    frame = rotate(frame, ROTATE_90_CLOCKWISE)
-                elif settings_perso[3] == -90:
-                    frame = rotate(frame, ROTATE_90_COUNTERCLOCKWISE)
-                elif settings_perso[3] == 180:
-                    frame = rotate(frame, ROTATE_180)
-                images.append(frame)
-                i+=increment
-            else:
+    try:
+        k = first_slot
+        for i, frameOrig, timestamp in read_frames(video_capture, indices, "auto", preprocess.decoded, index):
+            preprocess(frameOrig, frames[k], i)
+            mytime.append(timestamp)
+            k += 1
+    finally:
+        video_capture.release()
+        if shm != None:
+            del frames
+            shm.close()
+        else:
+            frames.flush()
+    return mytime
+
+def decode_parallel(video_file, indices, frameSize, rotation, target, workers, callback=None, fmt="rgb", index=None, crop=None, reduction=1, correction=None, stabilize=None):
+    # callback(mytime) est appelé à chaque avancée des images décodées depuis le début ;
+    # s'il renvoie False, les blocs restants sont abandonnés
+    chunks = split_chunks(indices, workers)
+    results = [None]*len(chunks)
+    mytime = []
+    done = 0
+    complete = True
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = dict()
+        first_slot = 0
+        for n, chunk in enumerate(chunks):
+            futures[pool.submit(decode_chunk, video_file, chunk, frameSize, rotation, target, first_slot, fmt, index, crop, reduction, correction, tables_dir(), stabilize)] = n
+            first_slot += len(chunk)
+
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            # Un bloc incomplet (fin de vidéo atteinte plus tôt que prévu) arrête la suite
+            # pour ne pas laisser de trous dans les images
+            while complete and done < len(chunks) and results[done] != None:
+                mytime += results[done]
+                complete = len(results[done]) == len(chunks[done])
+                done += 1
+            if callback != None and callback(mytime) == False:
+                # Sans attendre les blocs en cours (la sortie du with attendrait chacun d'eux)
+                pool.shutdown(wait=False, cancel_futures=True)
                 break
+    return mytime
 
-        
-        settings["nb_images"] = len(images)
-        settings["fps"] = 1/frameRate
-        settings["duration"] = duration
-        settings["width"] = frameSize[0]
-        settings["height"] = frameSize[1]
+# --------------------------------------------------
+# Stabilisation des vidéos filmées à main levée
+# --------------------------------------------------
+# Le mouvement global de la caméra entre deux images consécutives (translation et
+# rotation) est estimé sur des images réduites en suivant des points caractéristiques.
+# La trajectoire cumulée est lissée, et chaque image importée est déplacée de l'écart
+# entre les deux. La mesure, la plus coûteuse, ne porte que sur la fenêtre importée :
+# elle est faite par blocs dans des processus séparés et enregistrée à côté de la vidéo.
+# Changer la taille ou le nombre d'images, ou choisir une fenêtre déjà mesurée, ne la
+# refait pas.
+
+MOTION_VERSION = 2
+# Largeur des images réduites pour la mesure du mouvement de la caméra
+STAB_WIDTH = 320
+# Nombre de points suivis d'une image à l'autre
+STAB_FEATURES = 200
+# Demi-largeur (en images) de la moyenne glissante de la trajectoire
+STAB_RADIUS = 15
+
+def motion_path(video_file):
+    return video_file+".motion.json"
+
+def frame_motion(previous, gray):
+    # (dx, dy, angle) du mouvement global de previous à gray, nul s'il ne peut pas être estimé
+    points = goodFeaturesToTrack(previous, STAB_FEATURES, 0.01, 8)
+    if points is None or len(points) < 6:
+        return 0.0, 0.0, 0.0
+    moved, status, error = calcOpticalFlowPyrLK(previous, gray, points, None)
+    good = status.ravel() == 1
+    if good.sum() < 6:
+        return 0.0, 0.0, 0.0
+    M, inliers = estimateAffinePartial2D(points[good], moved[good])
+    if M is None:
+        return 0.0, 0.0, 0.0
+    return float(M[0, 2]), float(M[1, 2]), atan2(M[1, 0], M[0, 0])
+
+def path_motion(video_capture, first, last, index=None, callback=None):
+    # Mouvement de chaque image de [first, last) par rapport à la précédente (en pixels de la vidéo).
+    # callback(nombre d'images mesurées) est appelé après chaque image ; s'il renvoie False,
+    # la mesure est abandonnée et None est renvoyé
+    motion = []
+    previous = None
+    small = None
+    for i, frameOrig, timestamp in read_frames(video_capture, range(max(0, first-1), last), "sequential", None, index):
+        if small == None:
+            scale = frameOrig.shape[1]/STAB_WIDTH
+            small = (STAB_WIDTH, max(1, round(frameOrig.shape[0]/scale)))
+        gray = cvtColor(resize(frameOrig, small, interpolation=INTER_AREA), COLOR_BGR2GRAY)
+        if i >= first:
+            if previous is None:
+                motion.append((0.0, 0.0, 0.0))
+            else:
+                dx, dy, da = frame_motion(previous, gray)
+                motion.append((dx*scale, dy*scale, da))
+            if callback != None and callback(len(motion)) == False:
+                return None
+        previous = gray
+    # Fin de vidéo atteinte plus tôt que prévu : images restantes immobiles
+    motion += [(0.0, 0.0, 0.0)]*(last-first-len(motion))
+    return motion
+
+def motion_chunk(video_file, first, last, index=None):
+    # Exécuté dans un processus séparé
+    video_capture = VideoCapture(video_file)
+    try:
+        return path_motion(video_capture, first, last, index)
+    finally:
         video_capture.release()
-        return images, settings, error, mytime
-    else:
-        error = True
-        settings["nb_images"] = frame_count
+
+def estimate_motion(source, first, last, workers=1, callback=None):
+    # Mouvement des images [first, last). callback(images mesurées, total) suit la progression ;
+    # s'il renvoie False, la mesure est abandonnée et None est renvoyé
+    index = source.index
+    total = last-first
+    if workers <= 1 or isinstance(source, ImageSequenceSource):
+        video_capture = source.open_capture()
+        try:
+            return path_motion(video_capture, first, last, index, None if callback == None else lambda done: callback(done, total))
+        finally:
+            video_capture.release()
+    # Chaque bloc relit l'image qui le précède pour mesurer le mouvement de sa première image
+    chunks = split_chunks(range(first, last), workers)
+    results = [None]*len(chunks)
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = dict((pool.submit(motion_chunk, source.video_file, chunk[0], chunk[-1]+1, index), n) for n, chunk in enumerate(chunks))
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            done += len(chunks[futures[future]])
+            if callback != None and callback(done, total) == False:
+                # Sans attendre les blocs en cours (voir decode_parallel)
+                pool.shutdown(wait=False, cancel_futures=True)
+                return None
+    return [step for result in results for step in result]
+
+def load_motion(source, first, last, workers=1, compute=True, callback=None):
+    # Mouvement des images [first, last) : extrait de la mesure enregistrée à côté de la vidéo
+    # si elle correspond toujours au fichier et couvre la fenêtre, sinon mesuré (si compute)
+    # puis enregistré. None si la mesure est abandonnée (voir estimate_motion).
+    # Les suites d'images ne sont mesurées qu'une fois par ouverture.
+    sidecar = not isinstance(source, ImageSequenceSource)
+    if sidecar:
+        path = motion_path(source.video_file)
+        try:
+            stat = os.stat(source.video_file)
+            with open(path, "r") as motionfile:
+                saved = json.load(motionfile)
+            if saved.get("version") == MOTION_VERSION and saved["size"] == stat.st_size and saved["mtime"] == stat.st_mtime_ns:
+                start = saved["first"]
+                if start <= first and last <= start+len(saved["motion"]):
+                    return saved["motion"][first-start:last-start]
+        except (OSError, ValueError, KeyError):
+            pass
+    if not compute:
+        return None
+
+    motion = estimate_motion(source, first, last, workers, callback)
+    if motion != None and sidecar:
+        try:
+            stat = os.stat(source.video_file)
+            with open(path, "w") as motionfile:
+                json.dump({"version":MOTION_VERSION, "size":stat.st_size, "mtime":stat.st_mtime_ns, "first":first, "motion":motion}, motionfile)
+        except OSError:
+            pass
+    return motion
+
+def smooth_corrections(motion, radius=STAB_RADIUS):
+    # (dx, dy, angle) à appliquer à chaque image : écart entre la trajectoire lissée
+    # (moyenne glissante sur 2*radius+1 images) et la trajectoire réelle de la caméra
+    trajectory = cumsum(array(motion, dtype=float).reshape(-1, 3), axis=0)
+    window = ones(2*radius+1)/(2*radius+1)
+    smoothed = empty(trajectory.shape)
+    for c in range(3):
+        smoothed[:, c] = convolve(pad(trajectory[:, c], radius, mode="edge"), window, mode="valid")
+    return smoothed-trajectory
+
+class Stabilizer:
+    def __init__(self, motion, sourceSize, first=0, radius=STAB_RADIUS):
+        # motion : mouvement des images [first, first+len(motion)) (voir load_motion)
+        self.corrections = smooth_corrections(motion, radius)
+        self.sourceSize = sourceSize
+        self.first = first
+        self.out = None
+
+    def matrix(self, i, size):
+        # Déplacement de l'image i (de taille size, éventuellement réduite)
+        dx, dy, da = self.corrections[min(max(0, i-self.first), len(self.corrections)-1)]
+        scale = size[0]/self.sourceSize[0]
+        return array([[cos(da), -sin(da), dx*scale], [sin(da), cos(da), dy*scale]])
+
+    def __call__(self, frame, i):
+        # Image stabilisée, écrite dans un tampon réutilisé d'une image à l'autre
+        if self.out is None or self.out.shape != frame.shape:
+            self.out = empty(frame.shape, dtype=frame.dtype)
+        size = (frame.shape[1], frame.shape[0])
+        return warpAffine(frame, self.matrix(i, size), size, dst=self.out)
+
+def extract_images(video,settings_perso,mode="auto",workers=1,callback=None,index=None,measure=None): 
+    # video : chemin du fichier ou VideoSource déjà ouverte (qui reste alors ouverte)
+    # measure(images mesurées, total) : progression de la mesure du mouvement de la caméra
+    # (stabilisation) ; s'il renvoie False, l'importation s'arrête sans image
+    images = []
+    # Les images sont écrites dans un tableau (N, H, W, 3) (selon le format) alloué d'avance ;
+    # callback reçoit ce tableau entier, seules les len(mytime) premières images sont valides
+    settings = dict()
+    error = False
+
+    source, owned = open_source(video)
+    try:
+        video_capture = source.video_capture
+
+        camera_Width  = source.width
+        camera_Height = source.height
+
+        frameSize = output_size(camera_Width, camera_Height, settings_perso)
+
+        frame_count = source.frame_count
+        if index != None:
+            # Nombre d'images et durée réels (fréquence d'images variable)
+            frame_count = len(index["pts"])
+        # Seule la fenêtre choisie est décodée : le saut initial mène à l'image clé qui la précède
+        first, last, duration = frame_window(settings_perso, frame_count, source.fps, index)
+        maxFrames = settings_perso[2]
+        frameRate = 1/maxFrames*duration
+        fmt = frame_format(settings_perso)
+        roi = crop_region(settings_perso)
+
+        mytime = []
+
         settings["fps"] = 1/frameRate
         settings["duration"] = duration
         settings["width"] = frameSize[0]
         settings["height"] = frameSize[1]
-        return images, settings, error, mytime
+        settings["frame_count"] = frame_count
+        settings["camera_width"] = camera_Width
+        settings["camera_height"] = camera_Height
+        settings["format"] = fmt
+        settings["start"], settings["end"] = time_window(settings_perso)
+        settings["video_fps"] = source.fps
+        settings["rotation"] = settings_perso[3]
+        settings["roi"] = roi
+        settings["sampling"] = sampling_mode(settings_perso)
+        settings["correction"] = correction_settings(settings_perso)
+        settings["stabilisation"] = stabilisation_enabled(settings_perso)
+        settings["window"] = [first, last]
+        settings["indexed"] = index != None
+
+        if maxFrames >= max_images(fmt):
+            error = True
+            settings["nb_images"] = frame_count
+            return images, settings, error, mytime
+
+        indices = import_indices(video_capture, settings_perso, frame_count, first, last, index)
+        settings["nb_images"] = len(indices)
+        stabilize = None
+        if settings["stabilisation"]:
+            # Mouvement de la caméra mesuré sur la fenêtre importée seulement
+            motion = source.load_motion(first, last, workers, callback=measure)
+            if motion == None:
+                # Mesure interrompue : aucune image n'est décodée
+                indices = indices[:0]
+            else:
+                stabilize = Stabilizer(motion, (camera_Width, camera_Height), first)
+
+        # callback(images, mytime, settings) est appelé après chaque image décodée ;
+        # s'il renvoie False, l'importation s'arrête avec les images déjà décodées
+        # Les fichiers d'une suite d'images sont déjà lus en parallèle (voir SequenceCapture)
+        if isinstance(source, ImageSequenceSource):
+            workers = 1
+        workers = parallel_workers(len(indices), workers)
+        shape = (len(indices),)+frame_shape(frameSize, settings_perso[3], fmt)
+        # Vidéo MJPEG et images beaucoup plus petites que la vidéo : décodage directement réduit
+        reduction = mjpeg_reduction(source, frameSize, roi)
+        if workers > 1:
+            # Chaque processus ouvre sa propre VideoCapture
+            if owned:
+                source.release()
+            shm = SharedMemory(create=True, size=int(prod(shape)))
+            decoded = ndarray(shape, dtype=uint8, buffer=shm.buf)
+            images = empty(shape, dtype=uint8)
+            copied = 0
+            def progress(times):
+                # Les images décodées depuis le début sont recopiées au fur et à mesure hors de
+                # la mémoire partagée : l'interface peut les afficher pendant la suite du décodage
+                nonlocal copied
+                copyto(images[copied:len(times)], decoded[copied:len(times)])
+                copied = len(times)
+                if callback != None:
+                    return callback(images, times, settings)
+                return True
+            try:
+                mytime = decode_parallel(source.video_file, indices, frameSize, settings_perso[3], ("shm", shm.name, shape), workers, progress, fmt, index, roi, reduction, settings["correction"], stabilize)
+                images = images[:len(mytime)]
+            finally:
+                # La mémoire partagée ne peut être fermée tant qu'une vue l'utilise
+                del decoded
+                shm.close()
+                shm.unlink()
+        else:
+            images = empty(shape, dtype=uint8)
+            reduced = open_mjpeg(source.video_file, reduction)
+            if reduced != None:
+                video_capture = reduced
+            else:
+                reduction = 1
+            correct = make_corrector(settings["correction"], (camera_Width, camera_Height))
+            preprocess = FramePreprocessor(frameSize, settings_perso[3], (camera_Width, camera_Height), fmt, roi, reduction, correct, stabilize)
+            try:
+                for i, frameOrig, timestamp in read_frames(video_capture, indices, mode, preprocess.decoded, index):
+                    preprocess(frameOrig, images[len(mytime)], i)
+                    mytime.append(timestamp)
+                    if callback != None and callback(images, mytime, settings) == False:
+                        break
+            finally:
+                if reduced != None:
+                    reduced.release()
+            # Vue sur les images effectivement décodées (pas de copie)
+            images = images[:len(mytime)]
+    finally:
+        if owned:
+            source.release()
+
+    settings["nb_images"] = len(images)
+    settings["indices"] = list(indices)[:len(images)]
+    return images, settings, error, mytime
 
 def webcam_init(camera_id, params=None):
     
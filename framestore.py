@@ -0,0 +1,725 @@
+# Stockage des images importées : accès à la demande, sans tout garder en mémoire
+
+import threading, os, json, hashlib, time
+from bisect import bisect_left
+from collections import OrderedDict
+
+from cv2 import (
+    CAP_PROP_POS_FRAMES,
+    COLOR_BGR2GRAY,
+    COLOR_BGR2RGB,
+    COLOR_GRAY2RGB,
+    INTER_AREA,
+    cvtColor,
+    resize,
+)
+from numpy import zeros, uint8, memmap, rot90, ascontiguousarray
+
+from correction import make_corrector
+from extract import (open_source, ImageSequenceSource, mjpeg_reduction, open_mjpeg, source_point, imported_point, ROT90_TURNS, output_size, sample_indices, import_indices, time_window, sampling_mode, correction_settings, stabilisation_enabled, Stabilizer, frame_window, crop_region, frame_shape, frame_format, FramePreprocessor, read_frames, grab_frame, parallel_workers, decode_parallel, SEQUENTIAL_MAX_STRIDE)
+
+
+# --------------------------------------------------
+# Images décodées à la demande depuis la vidéo
+# --------------------------------------------------
+# Se comporte comme une liste d'images RGB (len(), provider[k]) mais ne décode
+# que les images réellement affichées. Les dernières images décodées sont gardées
+# dans un cache LRU borné et une lecture anticipée est faite en arrière-plan
+# pendant la lecture ou le passage image par image.
+
+class FrameProvider:
+    def __init__(self, video, settings_perso, cache_size=64, readahead=8, index=None, workers=1, measure=None):
+        # video : chemin du fichier ou VideoSource, dont la VideoCapture est alors reprise
+        # (et libérée par release()) ; measure : voir extract_images
+        self.source = open_source(video)[0]
+        self.video_capture = self.source.video_capture
+        self.index = index
+
+        camera_Width  = self.source.width
+        camera_Height = self.source.height
+        self.fps = self.source.fps
+        self.frame_count = self.source.frame_count
+        if index != None:
+            self.frame_count = len(index["pts"])
+        first, last, self.duration = frame_window(settings_perso, self.frame_count, self.fps, index)
+        self.window = [first, last]
+
+        self.frameSize = output_size(camera_Width, camera_Height, settings_perso)
+        self.rotation = settings_perso[3]
+        self.format = frame_format(settings_perso)
+        self.indices = list(import_indices(self.video_capture, settings_perso, self.frame_count, first, last, index))
+        if index != None:
+            self.timestamps = [index["pts"][i] for i in self.indices]
+        else:
+            # Temps estimés à partir du nombre d'images par seconde (en ms)
+            self.timestamps = [i*1000/self.fps for i in self.indices]
+
+        self.shape = frame_shape(self.frameSize, self.rotation, self.format)
+        self.roi = crop_region(settings_perso)
+        self.sampling = sampling_mode(settings_perso)
+        self.correction = correction_settings(settings_perso)
+        self.stabilisation = stabilisation_enabled(settings_perso)
+        stabilize = None
+        if self.stabilisation:
+            # Le mouvement de la caméra est mesuré sur la fenêtre importée avant le premier affichage
+            motion = self.source.load_motion(first, last, workers, callback=measure)
+            if motion == None:
+                # Mesure interrompue : aucune image
+                self.indices = []
+                self.timestamps = []
+            else:
+                stabilize = Stabilizer(motion, (camera_Width, camera_Height), first)
+        # Vidéo MJPEG : les images affichées sont décodées directement réduites si possible
+        self.reduced = open_mjpeg(self.source.video_file, mjpeg_reduction(self.source, self.frameSize, self.roi))
+        reduction = 1
+        if self.reduced != None:
+            self.video_capture = self.reduced
+            reduction = self.reduced.reduction
+        correct = make_corrector(self.correction, (camera_Width, camera_Height))
+        self.preprocess = FramePreprocessor(self.frameSize, self.rotation, (camera_Width, camera_Height), self.format, self.roi, reduction, correct, stabilize)
+
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.readahead = readahead
+
+        # Position du décodeur (indice de la prochaine image lue dans la vidéo)
+        self.position = None
+        self.lock = threading.RLock()
+
+        self.wanted = []
+        self.condition = threading.Condition()
+        self.closed = False
+        self.thread = None
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += len(self.indices)
+        if k < 0 or k >= len(self.indices):
+            raise IndexError("Indice d'image hors limites : "+str(k))
+        with self.lock:
+            if k in self.cache:
+                self.cache.move_to_end(k)
+                return self.cache[k]
+            return self.load(k)
+
+    def cached(self, k):
+        # Image k déjà décodée (sans attendre un décodage en cours)
+        return k in self.cache
+
+    def load(self, k):
+        with self.lock:
+            if k in self.cache:
+                return self.cache[k]
+            i = self.indices[k]
+            if self.index != None:
+                # Saut aux images clés, repérage de l'image lue par son temps de présentation
+                last = grab_frame(self.video_capture, i, None if self.position == None else self.position-1, self.index)
+                ret = last != None and last == i
+                if ret:
+                    ret, frameOrig = self.video_capture.retrieve(self.preprocess.decoded)
+                self.position = None if last == None else last+1
+            else:
+                # Un saut n'est fait que si l'image demandée n'est pas juste devant le décodeur
+                if self.position == None or i < self.position or i-self.position > SEQUENTIAL_MAX_STRIDE:
+                    self.video_capture.set(CAP_PROP_POS_FRAMES, i)
+                    self.position = i
+                while self.position < i:
+                    self.video_capture.grab()
+                    self.position += 1
+                ret, frameOrig = self.video_capture.read(self.preprocess.decoded)
+                self.position += 1
+            if ret == True:
+                frame = self.preprocess(frameOrig, None, i)
+            else:
+                self.position = None
+                frame = zeros(self.shape, dtype=uint8)
+
+            self.cache[k] = frame
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return frame
+
+    def prefetch(self, k, direction=1):
+        # Lecture anticipée des images voisines dans le sens de parcours
+        if direction >= 0:
+            wanted = range(k+1, min(k+1+self.readahead, len(self.indices)))
+        else:
+            wanted = range(max(0, k-self.readahead), k)
+        with self.condition:
+            self.wanted = [j for j in wanted if j not in self.cache]
+            self.condition.notify()
+        if self.thread == None:
+            self.thread = threading.Thread(target=self.prefetch_loop, daemon=True)
+            self.thread.start()
+
+    def prefetch_loop(self):
+        while True:
+            with self.condition:
+                while len(self.wanted) == 0 and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                k = self.wanted.pop(0)
+            self.load(k)
+
+    def release(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        with self.lock:
+            self.cache.clear()
+            self.source.release()
+            if self.reduced != None:
+                self.reduced.release()
+
+
+# --------------------------------------------------
+# Zones des images d'origine, en pleine résolution
+# --------------------------------------------------
+# Les images importées sont souvent réduites (au-delà de 1280x720, ou par l'utilisateur).
+# La loupe lit la zone autour du pointeur dans l'image d'origine : chaque image est
+# décodée une fois en arrière-plan, avec sa propre VideoCapture, et seules les
+# dernières sont gardées. Tant qu'elle n'est pas prête, region() renvoie None.
+
+class RegionDecoder:
+    def __init__(self, source, settings, cache_size=4):
+        # source : VideoSource de l'importation (éventuellement déjà libérée), settings : videoConfig
+        self.source = source
+        self.settings = settings
+        # Index des images s'il a été chargé pendant l'importation (voir extract.load_index)
+        self.index = source.index
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.video_capture = None
+
+        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.wanted = None
+        self.closed = False
+        self.thread = None
+
+        # Pixels de l'image d'origine par pixel de l'image importée
+        roi = settings.get("roi") or (0, 0, settings["camera_width"], settings["camera_height"])
+        self.scale = roi[2]/settings["width"]
+        # Même correction de l'objectif et de la perspective que les images importées
+        self.correct = make_corrector(settings.get("correction"), (settings["camera_width"], settings["camera_height"]))
+        # Stabilisation seulement si le mouvement de la caméra est déjà connu (pas de mesure ici)
+        self.stabilize = None
+        if settings.get("stabilisation", False):
+            first, last = settings.get("window", (0, settings["frame_count"]))
+            motion = source.load_motion(first, last, compute=False)
+            if motion != None:
+                self.stabilize = Stabilizer(motion, (settings["camera_width"], settings["camera_height"]), first)
+
+    def request(self, k):
+        # Décodage en arrière-plan de l'image k : seule la dernière demande compte
+        with self.lock:
+            if k in self.cache:
+                self.cache.move_to_end(k)
+                return
+        with self.condition:
+            self.wanted = k
+            self.condition.notify()
+        if self.thread == None:
+            self.thread = threading.Thread(target=self.decode_loop, daemon=True)
+            self.thread.start()
+
+    def decode_loop(self):
+        while True:
+            with self.condition:
+                while self.wanted == None and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                k = self.wanted
+                self.wanted = None
+            self.load(k)
+
+    def load(self, k):
+        if self.video_capture == None:
+            self.video_capture = self.source.open_capture()
+        frame = None
+        for i, frameOrig, timestamp in read_frames(self.video_capture, [self.settings["indices"][k]], "seek", None, self.index):
+            frame = frameOrig
+        if frame is None:
+            return
+        if self.stabilize != None:
+            frame = self.stabilize(frame, self.settings["indices"][k])
+        if self.correct != None:
+            frame = self.correct(frame)
+        if self.stabilize != None or self.correct != None:
+            # Stabilizer et Corrector réutilisent leur tampon d'une image à l'autre
+            frame = frame.copy()
+        with self.lock:
+            self.cache[k] = frame
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def region(self, k, x, y, radius):
+        # Carré de l'image d'origine centré sur le pixel (x, y) de l'image importée k, couvrant
+        # radius pixels importés de chaque côté, orienté et en couleurs comme l'affichage, et
+        # ses bords (gauche, haut, droite, bas) en pixels de l'image importée ; None si absent
+        with self.lock:
+            frame = self.cache.get(k)
+        if frame is None:
+            return None
+        sx, sy = source_point(self.settings, x, y)
+        r = max(1, int(radius*self.scale))
+        x1, y1 = int(sx)-r, int(sy)-r
+        if x1 < 0 or y1 < 0 or x1+2*r > frame.shape[1] or y1+2*r > frame.shape[0]:
+            return None
+        region = frame[y1:y1+2*r, x1:x1+2*r]
+        if self.settings.get("format", "rgb") == "gray":
+            region = cvtColor(cvtColor(region, COLOR_BGR2GRAY), COLOR_GRAY2RGB)
+        else:
+            region = cvtColor(region, COLOR_BGR2RGB)
+        rotation = self.settings.get("rotation", 0)
+        if rotation in ROT90_TURNS:
+            region = rot90(region, ROT90_TURNS[rotation])
+        corners = [imported_point(self.settings, x1, y1), imported_point(self.settings, x1+2*r, y1+2*r)]
+        bounds = (min(corners[0][0], corners[1][0]), min(corners[0][1], corners[1][1]), max(corners[0][0], corners[1][0]), max(corners[0][1], corners[1][1]))
+        return ascontiguousarray(region), bounds
+
+    def release(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        with self.lock:
+            self.cache.clear()
+        if self.thread != None:
+            self.thread.join()
+        if self.video_capture != None:
+            self.video_capture.release()
+            self.video_capture = None
+
+
+# --------------------------------------------------
+# Images stockées sur le disque dans un fichier memmap
+# --------------------------------------------------
+# Toutes les images prétraitées sont écrites à la suite dans un unique fichier
+# (tableau numpy.memmap de forme (N, H, W, 3)). Les informations nécessaires à la
+# réouverture (forme, temps, réglages de la vidéo) sont enregistrées à côté dans
+# un fichier .json : rouvrir un fichier existant est immédiat et la mémoire vive
+# utilisée reste constante, quel que soit le nombre d'images.
+
+class FrameStore:
+    def __init__(self, path, frames, meta):
+        self.path = path
+        self.frames = frames
+        self.meta = meta
+        self.nb_images = meta["nb_images"]
+
+    @classmethod
+    def create(cls, path, nb_images, shape):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        frames = memmap(path, dtype=uint8, mode="w+", shape=(max(1, nb_images),)+tuple(shape))
+        meta = {"nb_images":nb_images, "shape":list(shape), "timestamps":[], "settings":{}}
+        return cls(path, frames, meta)
+
+    @classmethod
+    def open(cls, path):
+        with open(path+".json", "r") as metafile:
+            meta = json.load(metafile)
+        shape = (max(1, meta["capacity"]),)+tuple(meta["shape"])
+        frames = memmap(path, dtype=uint8, mode="r", shape=shape)
+        return cls(path, frames, meta)
+
+    def __len__(self):
+        return self.nb_images
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += self.nb_images
+        if k < 0 or k >= self.nb_images:
+            raise IndexError("Indice d'image hors limites : "+str(k))
+        # Vue directe sur le fichier, sans copie
+        return self.frames[k]
+
+    def write(self, k, frame):
+        self.frames[k] = frame
+
+    def save(self):
+        # Écriture des images sur le disque puis des informations de réouverture
+        self.frames.flush()
+        self.meta["nb_images"] = self.nb_images
+        self.meta["capacity"] = self.frames.shape[0]
+        with open(self.path+".json", "w") as metafile:
+            json.dump(self.meta, metafile)
+
+    def release(self):
+        self.frames = None
+        if self.meta.get("partial", False):
+            # Importation interrompue : les fichiers ne resserviront pas
+            for name in (self.path, self.path+".json"):
+                try:
+                    os.remove(name)
+                except OSError:
+                    # Fichier encore ouvert (vue sur le memmap) : supprimé plus tard par ImportCache.evict
+                    pass
+
+
+def extract_to_store(video, settings_perso, path, mode="auto", workers=1, callback=None, index=None, measure=None):
+    # Équivalent de extract_images, mais les images sont écrites dans un FrameStore
+    source, owned = open_source(video)
+    video_capture = source.video_capture
+    settings = dict()
+
+    camera_Width  = source.width
+    camera_Height = source.height
+    frameSize = output_size(camera_Width, camera_Height, settings_perso)
+
+    frame_count = source.frame_count
+    if index != None:
+        frame_count = len(index["pts"])
+    first, last, duration = frame_window(settings_perso, frame_count, source.fps, index)
+    indices = import_indices(video_capture, settings_perso, frame_count, first, last, index)
+    fmt = frame_format(settings_perso)
+    roi = crop_region(settings_perso)
+
+    store = FrameStore.create(path, len(indices), frame_shape(frameSize, settings_perso[3], fmt))
+    settings["nb_images"] = len(indices)
+    settings["fps"] = settings_perso[2]/duration
+    settings["duration"] = duration
+    settings["width"] = frameSize[0]
+    settings["height"] = frameSize[1]
+    settings["frame_count"] = frame_count
+    settings["camera_width"] = camera_Width
+    settings["camera_height"] = camera_Height
+    settings["format"] = fmt
+    settings["start"], settings["end"] = time_window(settings_perso)
+    settings["video_fps"] = source.fps
+    settings["rotation"] = settings_perso[3]
+    settings["roi"] = roi
+    settings["sampling"] = sampling_mode(settings_perso)
+    settings["correction"] = correction_settings(settings_perso)
+    settings["stabilisation"] = stabilisation_enabled(settings_perso)
+    settings["window"] = [first, last]
+    settings["indexed"] = index != None
+    cancelled = False
+    stabilize = None
+    if settings["stabilisation"]:
+        motion = source.load_motion(first, last, workers, callback=measure)
+        if motion == None:
+            # Mesure interrompue : aucune image n'est décodée
+            indices = indices[:0]
+            cancelled = True
+        else:
+            stabilize = Stabilizer(motion, (camera_Width, camera_Height), first)
+
+    # callback(store, mytime, settings) : voir extract_images. Les images déjà
+    # écrites (store[:len(mytime)]) sont lisibles pendant la suite de l'importation.
+    mytime = []
+    store.nb_images = 0
+    # Les fichiers d'une suite d'images sont déjà lus en parallèle (voir SequenceCapture)
+    if isinstance(source, ImageSequenceSource):
+        workers = 1
+    workers = parallel_workers(len(indices), workers)
+    # Vidéo MJPEG et images beaucoup plus petites que la vidéo : décodage directement réduit
+    reduction = mjpeg_reduction(source, frameSize, roi)
+    if workers > 1:
+        # Chaque processus écrit ses images directement dans le fichier memmap
+        if owned:
+            source.release()
+        store.frames.flush()
+        def progress(times):
+            nonlocal cancelled
+            store.nb_images = len(times)
+            if callback != None and callback(store, times, settings) == False:
+                cancelled = True
+                return False
+            return True
+        mytime = decode_parallel(source.video_file, indices, frameSize, settings_perso[3], ("memmap", path, store.frames.shape), workers, progress, fmt, index, roi, reduction, settings["correction"], stabilize)
+    else:
+        reduced = open_mjpeg(source.video_file, reduction)
+        if reduced != None:
+            video_capture = reduced
+        else:
+            reduction = 1
+        try:
+            # Chaque image est écrite directement à sa place dans le fichier memmap
+            correct = make_corrector(settings["correction"], (camera_Width, camera_Height))
+            preprocess = FramePreprocessor(frameSize, settings_perso[3], (camera_Width, camera_Height), fmt, roi, reduction, correct, stabilize)
+            for i, frameOrig, timestamp in read_frames(video_capture, indices, mode, preprocess.decoded, index):
+                preprocess(frameOrig, store.frames[len(mytime)], i)
+                mytime.append(timestamp)
+                store.nb_images = len(mytime)
+                if callback != None and callback(store, mytime, settings) == False:
+                    cancelled = True
+                    break
+        finally:
+            if reduced != None:
+                reduced.release()
+            if owned:
+                source.release()
+
+    k = len(mytime)
+    store.nb_images = k
+    settings["nb_images"] = k
+    settings["indices"] = list(indices)[:k]
+    store.meta["timestamps"] = mytime
+    store.meta["settings"] = settings
+    # Une importation interrompue (ou vide) n'est jamais resservie par le cache
+    store.meta["partial"] = cancelled or k == 0
+    store.save()
+    return store, settings, k == 0, mytime
+
+
+# --------------------------------------------------
+# Cache persistant des importations
+# --------------------------------------------------
+# Chaque importation est conservée dans un FrameStore identifié par l'empreinte
+# du fichier vidéo (taille, date de modification et hachage de quelques blocs)
+# et par les réglages d'importation (largeur, hauteur, nombre d'images, rotation).
+# Si seuls le nombre d'images ou la résolution changent, les images sont
+# rééchantillonnées à partir d'une importation plus complète déjà en cache.
+# Les importations les moins récemment utilisées sont supprimées au-delà de max_size.
+# Une importation faite en mémoire est écrite dans le cache depuis un thread séparé :
+# sous un nom temporaire, renommé une fois l'entrée complète, et les recherches,
+# ajouts et suppressions d'entrées se font un à la fois.
+
+# Taille maximale du cache (en octets)
+CACHE_MAX_SIZE = 2*1024**3
+# Fichiers temporaires laissés par une écriture interrompue (fermeture de l'application) :
+# supprimés après ce délai (en s)
+PARTIAL_MAX_AGE = 24*3600
+# Accès au cache d'un seul thread à la fois (lookup, put, evict)
+CACHE_LOCK = threading.RLock()
+# Taille des blocs lus pour l'empreinte du fichier (début, milieu et fin)
+FINGERPRINT_BLOCK = 64*1024
+
+def fingerprint(video_file):
+    stat = os.stat(video_file)
+    digest = hashlib.sha1()
+    digest.update((str(stat.st_size)+":"+str(stat.st_mtime_ns)).encode())
+    with open(video_file, "rb") as videofile:
+        for position in (0, stat.st_size//2, max(0, stat.st_size-FINGERPRINT_BLOCK)):
+            videofile.seek(position)
+            digest.update(videofile.read(FINGERPRINT_BLOCK))
+    return digest.hexdigest()
+
+def sequence_fingerprint(files, pts):
+    # Empreinte d'une suite d'images : noms, tailles et dates des fichiers, temps des images
+    digest = hashlib.sha1()
+    for image_file in files:
+        stat = os.stat(image_file)
+        digest.update((os.path.basename(image_file)+":"+str(stat.st_size)+":"+str(stat.st_mtime_ns)).encode())
+    digest.update(json.dumps(pts).encode())
+    return digest.hexdigest()
+
+class ImportCache:
+    def __init__(self, cache_dir, max_size=CACHE_MAX_SIZE):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def path(self, video_fingerprint, settings_perso):
+        key = video_fingerprint+":"+",".join(str(value) for value in settings_perso[:4])
+        # Les importations en RGB gardent la clé d'avant l'ajout des formats compacts
+        if frame_format(settings_perso) != "rgb":
+            key += ","+frame_format(settings_perso)
+        if time_window(settings_perso) != (0, None):
+            key += ",{},{}".format(*time_window(settings_perso))
+        if crop_region(settings_perso) != None:
+            key += ",{},{},{},{}".format(*crop_region(settings_perso))
+        if sampling_mode(settings_perso) != "uniform":
+            key += ","+sampling_mode(settings_perso)
+        if correction_settings(settings_perso) != None:
+            key += ","+json.dumps(correction_settings(settings_perso), sort_keys=True)
+        if stabilisation_enabled(settings_perso):
+            key += ",stabilisation"
+        key = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, key+".frames")
+
+    def entries(self):
+        # Liste des importations en cache : (chemin, date de dernière utilisation, taille)
+        entries = []
+        if not os.path.isdir(self.cache_dir):
+            return entries
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".frames"):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    used = os.path.getmtime(path+".json")
+                    size = os.path.getsize(path)+os.path.getsize(path+".json")
+                except OSError:
+                    continue
+                entries.append((path, used, size))
+        return entries
+
+    def open(self, path):
+        try:
+            store = FrameStore.open(path)
+        except (OSError, ValueError, KeyError):
+            return None
+        if store.meta.get("partial", False):
+            return None
+        # La date du fichier .json sert de date de dernière utilisation
+        os.utime(path+".json")
+        return store
+
+    def lookup(self, video_fingerprint, settings_perso, index=None):
+        # index : index des images de la vidéo s'il est déjà chargé (voir extract.load_index)
+        with CACHE_LOCK:
+            path = self.path(video_fingerprint, settings_perso)
+            if os.path.exists(path) and os.path.exists(path+".json"):
+                store = self.open(path)
+                if store != None:
+                    return store
+            return self.resample(video_fingerprint, settings_perso, index)
+
+    def resample(self, video_fingerprint, settings_perso, index=None):
+        # Recherche d'une importation de la même vidéo, avec la même rotation, le même format,
+        # au moins autant d'images et une résolution au moins aussi grande.
+        # Les plans d'une image YUV 4:2:0 ne se redimensionnent pas d'un bloc : pas de rééchantillonnage.
+        # Les images choisies selon le mouvement dépendent d'une mesure sur toute la fenêtre : idem.
+        fmt = frame_format(settings_perso)
+        if fmt == "yuv420" or sampling_mode(settings_perso) != "uniform":
+            return None
+        best = None
+        for path, used, size in self.entries():
+            try:
+                with open(path+".json", "r") as metafile:
+                    meta = json.load(metafile)
+            except (OSError, ValueError):
+                continue
+            if meta.get("partial", False) or meta.get("fingerprint") != video_fingerprint or meta["settings_perso"][3] != settings_perso[3] or meta["settings"].get("format", "rgb") != fmt:
+                continue
+            if meta["settings"].get("stabilisation", False) != stabilisation_enabled(settings_perso):
+                continue
+            # Une autre correction ou une autre zone de l'image ne peut pas servir
+            if json.dumps(meta["settings"].get("correction"), sort_keys=True) != json.dumps(correction_settings(settings_perso), sort_keys=True):
+                continue
+            roi = meta["settings"].get("roi")
+            if (roi and tuple(roi)) != crop_region(settings_perso):
+                continue
+            # Une importation selon le mouvement laisse des trous dans les passages immobiles
+            if meta["settings"].get("sampling", "uniform") != "uniform":
+                continue
+            # Fenêtre calculée comme pour une nouvelle importation : sur les temps réels des images
+            # avec un index (fréquence d'images variable), sur les fps sinon
+            if meta["settings"].get("indexed", False) != (index != None):
+                continue
+            settings = meta["settings"]
+            frameSize = output_size(settings["camera_width"], settings["camera_height"], settings_perso)
+            # Les anciennes entrées couvrent toute la vidéo : fps = nombre d'images / durée
+            fps = settings.get("video_fps", settings["frame_count"]/settings["duration"])
+            first, last, duration = frame_window(settings_perso, settings["frame_count"], fps, index)
+            wanted = list(sample_indices(settings["frame_count"], settings_perso[2], first, last))
+            # Il faut au moins autant d'images en cache dans la fenêtre voulue
+            cached = settings["indices"]
+            if bisect_left(cached, last)-bisect_left(cached, first) < len(wanted) or settings["width"] < frameSize[0] or settings["height"] < frameSize[1]:
+                continue
+            if best == None or meta["nb_images"] < best[1]["nb_images"]:
+                best = (path, meta, frameSize, wanted, duration)
+        if best == None:
+            return None
+
+        source = self.open(best[0])
+        if source == None:
+            return None
+        path, meta, frameSize, wanted, duration = best
+        cached = meta["settings"]["indices"]
+
+        # Pour chaque image voulue, l'image en cache la plus proche (sans doublon)
+        picks = []
+        for i in wanted:
+            p = bisect_left(cached, i)
+            if p == len(cached) or (p > 0 and i-cached[p-1] <= cached[p]-i):
+                p -= 1
+            if len(picks) == 0 or p != picks[-1]:
+                picks.append(p)
+
+        shape = frame_shape(frameSize, settings_perso[3], fmt)
+        store = FrameStore.create(self.path(video_fingerprint, settings_perso), len(picks), shape)
+        for k, p in enumerate(picks):
+            if source[p].shape == shape:
+                store.write(k, source[p])
+            else:
+                store.write(k, resize(source[p], (shape[1], shape[0]), interpolation=INTER_AREA))
+        source.release()
+
+        settings = dict(meta["settings"])
+        settings["nb_images"] = len(picks)
+        settings["duration"] = duration
+        settings["fps"] = len(picks)/duration
+        settings["start"], settings["end"] = time_window(settings_perso)
+        settings["width"] = frameSize[0]
+        settings["height"] = frameSize[1]
+        settings["indices"] = [cached[p] for p in picks]
+        store.nb_images = len(picks)
+        store.meta["timestamps"] = [meta["timestamps"][p] for p in picks]
+        store.meta["settings"] = settings
+        self.put(store, video_fingerprint, settings_perso)
+        return store
+
+    def describe(self, store, video_fingerprint, settings_perso):
+        store.meta["fingerprint"] = video_fingerprint
+        store.meta["settings_perso"] = list(settings_perso[:4])+[frame_format(settings_perso)]+list(time_window(settings_perso))+[crop_region(settings_perso), sampling_mode(settings_perso), correction_settings(settings_perso), stabilisation_enabled(settings_perso)]
+
+    def put(self, store, video_fingerprint, settings_perso):
+        self.describe(store, video_fingerprint, settings_perso)
+        with CACHE_LOCK:
+            store.save()
+            self.evict(keep=store.path)
+
+    def put_images(self, video_fingerprint, settings_perso, images, settings, mytime):
+        # Mise en cache d'une importation faite en mémoire (depuis un thread séparé) : les fichiers
+        # <clé>.frames.<pid>-<thread> sont ignorés par lookup et evict jusqu'au renommage
+        if len(images) == 0:
+            return
+        path = self.path(video_fingerprint, settings_perso)
+        store = FrameStore.create(path+"."+str(os.getpid())+"-"+str(threading.get_ident()), len(images), images[0].shape)
+        for k in range(len(images)):
+            store.write(k, images[k])
+        store.meta["timestamps"] = mytime
+        store.meta["settings"] = settings
+        self.describe(store, video_fingerprint, settings_perso)
+        store.save()
+        partial = store.path
+        store.release()
+        with CACHE_LOCK:
+            try:
+                # Le fichier .json, qui rend l'entrée visible, est renommé en dernier
+                os.replace(partial, path)
+                os.replace(partial+".json", path+".json")
+            except OSError:
+                for name in (partial, partial+".json"):
+                    try:
+                        os.remove(name)
+                    except OSError:
+                        pass
+                return
+            self.evict(keep=path)
+
+    def evict(self, keep=None):
+        with CACHE_LOCK:
+            entries = sorted(self.entries(), key=lambda entry: entry[1])
+            total = sum(entry[2] for entry in entries)
+            for path, used, size in entries:
+                if total <= self.max_size:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    os.remove(path+".json")
+                    total -= size
+                except OSError:
+                    # Fichier encore ouvert (memmap en cours d'utilisation)
+                    pass
+            self.remove_stale()
+
+    def remove_stale(self):
+        # Fichiers temporaires de put_images abandonnés depuis longtemps
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if ".frames." not in name or name.endswith(".frames.json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if now-os.path.getmtime(path) > PARTIAL_MAX_AGE:
+                    os.remove(path)
+            except OSError:
+                pass
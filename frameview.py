@@ -0,0 +1,618 @@
+# Affichage des images et des mesures sans matplotlib : chaque image est transmise à Qt
+# sous forme de QImage construite sur le tableau numpy (sans copie), la trajectoire,
+# l'étalon et les axes sont de simples QGraphicsItem dessinés par-dessus. Les clics et
+# les déplacements de la souris sont transmis dans le repère des mesures, comme ceux du
+# canvas matplotlib (event.xdata, event.ydata). Matplotlib ne sert plus qu'à l'export.
+
+import threading, logging
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QRectF, QPointF, QLineF, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter, QPen, QBrush, QColor, QPolygonF, QFont
+from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsItem, QFrame
+
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.ticker import MaxNLocator
+from numpy import ascontiguousarray
+
+from renderer import CanvasRenderer, FramePyramid, AXIS_ARROWS, PYRAMID_LEVELS, scale_ticks
+
+# Logger de l'application (voir main.py)
+logger = logging.getLogger('debug')
+
+# Couleurs matplotlib des réglages de style (voir Window.settings_update)
+COLORS = {"b":(0, 0, 255), "r":(255, 0, 0), "g":(0, 128, 0), "c":(0, 191, 191), "m":(191, 0, 191), "y":(191, 191, 0), "w":(255, 255, 255), "k":(0, 0, 0)}
+# Taille des marqueurs et des flèches (en pixels de l'écran)
+MARKER_SIZE = 8
+ARROW_SIZE = 7
+# Longueur des graduations et écart des étiquettes (en pixels de l'écran)
+TICK_SIZE = 4
+LABEL_GAP = 3
+# Mémoire maximale des images composées (image et mesures) gardées par la vue (en octets)
+COMPOSITE_MEMORY = 256*1024**2
+# Images voisines composées en arrière-plan de chaque côté de l'image affichée
+COMPOSITE_NEIGHBOURS = 4
+# Agrandissement maximal de la vue (molette), couvert par la pyramide d'affichage
+ZOOM_MAX = max(PYRAMID_LEVELS)
+ZOOM_STEP = 1.25
+
+class CanvasEvent:
+    # Équivalent d'un MouseEvent matplotlib : xdata et ydata valent None hors de l'image
+    def __init__(self, xdata, ydata, button):
+        self.xdata = xdata
+        self.ydata = ydata
+        self.button = button
+
+def draw_marker(painter, marker, p, size):
+    r = size/2
+    if marker == ".":
+        painter.drawEllipse(p, r/2, r/2)
+    elif marker == "o":
+        painter.drawEllipse(p, r, r)
+    elif marker == "s":
+        painter.drawRect(QRectF(p.x()-r, p.y()-r, size, size))
+    elif marker == "v":
+        painter.drawPolygon(QPolygonF([QPointF(p.x()-r, p.y()-r), QPointF(p.x()+r, p.y()-r), QPointF(p.x(), p.y()+r)]))
+    elif marker == "x":
+        painter.drawLine(QLineF(p.x()-r, p.y()-r, p.x()+r, p.y()+r))
+        painter.drawLine(QLineF(p.x()-r, p.y()+r, p.x()+r, p.y()-r))
+    elif marker == "+":
+        painter.drawLine(QLineF(p.x()-r, p.y(), p.x()+r, p.y()))
+        painter.drawLine(QLineF(p.x(), p.y()-r, p.x(), p.y()+r))
+    elif marker in ("<", ">", "^"):
+        # Flèches des axes ("v" est le triangle ci-dessus)
+        if marker == ">":
+            points = [QPointF(p.x()+r, p.y()), QPointF(p.x()-r, p.y()-r), QPointF(p.x()-r, p.y()+r)]
+        elif marker == "<":
+            points = [QPointF(p.x()-r, p.y()), QPointF(p.x()+r, p.y()-r), QPointF(p.x()+r, p.y()+r)]
+        else:
+            points = [QPointF(p.x(), p.y()-r), QPointF(p.x()-r, p.y()+r), QPointF(p.x()+r, p.y()+r)]
+        painter.drawPolygon(QPolygonF(points))
+
+def frame_image(frame):
+    # QImage construite sur le tableau (à garder en vie tant que l'image est utilisée)
+    return QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], QImage.Format_RGB888)
+
+def scene_mapper(extent, width, height):
+    # Repère des mesures -> pixel de l'image (les axes peuvent être inversés)
+    left, right, bottom, top = extent
+    return lambda x, y: QPointF((x-left)*width/(right-left), (top-y)*height/(top-bottom))
+
+def draw_axes(painter, point, extent, xticks, yticks, grid, arrows):
+    # xticks, yticks : (valeurs, étiquettes) ; arrows : voir renderer.AXIS_ARROWS
+    left, right, bottom, top = extent
+    xmin, xmax = min(left, right), max(left, right)
+    ymin, ymax = min(bottom, top), max(bottom, top)
+    if grid:
+        painter.setPen(QPen(QColor(176, 176, 176), 0.8))
+        for x in xticks[0]:
+            painter.drawLine(QLineF(point(x, bottom), point(x, top)))
+        for y in yticks[0]:
+            painter.drawLine(QLineF(point(left, y), point(right, y)))
+
+    painter.setPen(QPen(QColor(0, 0, 0), 1))
+    painter.setBrush(QBrush(QColor(0, 0, 0)))
+    painter.setFont(QFont(painter.font().family(), 8))
+    metrics = painter.fontMetrics()
+    if ymin <= 0 <= ymax:
+        painter.drawLine(QLineF(point(left, 0), point(right, 0)))
+        for x, label in zip(*xticks):
+            p = point(x, 0)
+            painter.drawLine(QLineF(p, p+QPointF(0, TICK_SIZE)))
+            if label != "":
+                painter.drawText(QPointF(p.x()-metrics.width(label)/2, p.y()+TICK_SIZE+LABEL_GAP+metrics.ascent()), label)
+    if xmin <= 0 <= xmax:
+        painter.drawLine(QLineF(point(0, bottom), point(0, top)))
+        for y, label in zip(*yticks):
+            p = point(0, y)
+            painter.drawLine(QLineF(p, p-QPointF(TICK_SIZE, 0)))
+            if label != "":
+                painter.drawText(QPointF(p.x()-TICK_SIZE-LABEL_GAP-metrics.width(label), p.y()+metrics.ascent()/2), label)
+
+    # Flèches au bord de l'image (position en coordonnées d'axe, comme dans CanvasRenderer)
+    (hmarker, hpos), (vmarker, vpos) = arrows
+    draw_marker(painter, hmarker, point(left+hpos*(right-left), 0), ARROW_SIZE*2)
+    draw_marker(painter, vmarker, point(0, bottom+vpos*(top-bottom)), ARROW_SIZE*2)
+
+def draw_segment(painter, point, points):
+    # Segment d'étalonnage (style "ro-") : ((x1, x2), (y1, y2)) ou None
+    if points == None:
+        return
+    (x1, x2), (y1, y2) = points
+    p1, p2 = point(x1, y1), point(x2, y2)
+    color = QColor(*COLORS["r"])
+    painter.setPen(QPen(color, 1.5))
+    painter.setBrush(QBrush(color))
+    painter.drawLine(QLineF(p1, p2))
+    draw_marker(painter, "o", p1, MARKER_SIZE)
+    draw_marker(painter, "o", p2, MARKER_SIZE)
+
+def draw_trajectory(painter, point, x, y, color, marker, line):
+    color = QColor(*COLORS.get(color, COLORS["b"]))
+    # Points non mesurés : None (la ligne est interrompue, comme avec matplotlib)
+    points = [None if xk == None or yk == None else point(xk, yk) for xk, yk in zip(x, y)]
+    if line != "":
+        pen = QPen(color, 1.5)
+        pen.setStyle(Qt.DashLine)
+        painter.setPen(pen)
+        for p1, p2 in zip(points, points[1:]):
+            if p1 != None and p2 != None:
+                painter.drawLine(QLineF(p1, p2))
+    painter.setPen(QPen(color, 1.5))
+    painter.setBrush(QBrush(color))
+    for p in points:
+        if p != None:
+            draw_marker(painter, marker, p, MARKER_SIZE)
+
+def compose(frame, overlay):
+    # Image, axes et étalon tels que la vue les affiche, dans une QImage de la taille de la vue
+    # (peut être appelée depuis un autre thread : overlay est une copie de l'état de la vue).
+    # La trajectoire, qui change à chaque mesure, reste un élément affiché par-dessus.
+    width, height = overlay["size"]
+    ratio = overlay["pixel_ratio"]
+    image = QImage(int(width*ratio), int(height*ratio), QImage.Format_ARGB32_Premultiplied)
+    image.setDevicePixelRatio(ratio)
+    image.fill(Qt.transparent)
+    transform = overlay["transform"]
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+    painter.setTransform(transform)
+    painter.drawImage(QRectF(0, 0, frame.shape[1], frame.shape[0]), frame_image(frame))
+    painter.resetTransform()
+    painter.setRenderHint(QPainter.Antialiasing)
+    to_scene = scene_mapper(overlay["extent"], frame.shape[1], frame.shape[0])
+    point = lambda x, y: transform.map(to_scene(x, y))
+    draw_axes(painter, point, overlay["extent"], overlay["xticks"], overlay["yticks"], overlay["grid"], overlay["arrows"])
+    draw_segment(painter, point, overlay["etalon"])
+    painter.end()
+    return image
+
+class CompositeCache:
+    # Images composées gardées par (numéro de l'image, version de l'affichage), les moins
+    # récemment utilisées d'abord oubliées ; les voisines de l'image affichée sont
+    # composées en arrière-plan (seule la dernière demande compte), uniquement si elles
+    # sont déjà en mémoire : le décodeur reste libre pour l'image demandée par l'interface
+    def __init__(self, memory=COMPOSITE_MEMORY, neighbours=COMPOSITE_NEIGHBOURS):
+        self.memory = memory
+        self.neighbours = neighbours
+        self.cache = OrderedDict()
+        self.bytes = 0
+        self.get_frame = None
+        self.ready = None
+        self.count = 0
+        # Incrémentée à chaque changement de vidéo : les compositions en cours sont abandonnées
+        self.generation = 0
+
+        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.wanted = None
+        self.thread = None
+
+    def set_source(self, get_frame, count, ready):
+        # ready(k) : l'image k est lisible sans la décoder
+        with self.lock:
+            self.get_frame = get_frame
+            self.ready = ready
+            self.count = count
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.bytes = 0
+            self.generation += 1
+        with self.condition:
+            self.wanted = None
+
+    def get(self, k, version):
+        with self.lock:
+            image = self.cache.get((k, version))
+            if image is not None:
+                self.cache.move_to_end((k, version))
+            return image
+
+    def put(self, key, image, generation):
+        with self.lock:
+            if generation != self.generation or key in self.cache:
+                return
+            self.cache[key] = image
+            self.bytes += image.byteCount()
+            while self.bytes > self.memory and len(self.cache) > 1:
+                self.bytes -= self.cache.popitem(last=False)[1].byteCount()
+
+    def request(self, k, version, overlay):
+        with self.lock:
+            if self.get_frame == None:
+                return
+            generation = self.generation
+        with self.condition:
+            self.wanted = (k, version, overlay, generation)
+            self.condition.notify()
+        if self.thread == None:
+            self.thread = threading.Thread(target=self.fill_loop, daemon=True)
+            self.thread.start()
+
+    def fill_loop(self):
+        while True:
+            with self.condition:
+                while self.wanted == None:
+                    self.condition.wait()
+                k, version, overlay, generation = self.wanted
+                self.wanted = None
+            # L'image affichée d'abord, puis ses voisines de plus en plus éloignées
+            for j in [k]+[k+d*s for d in range(1, self.neighbours+1) for s in (1, -1)]:
+                with self.lock:
+                    get_frame, ready, count = self.get_frame, self.ready, self.count
+                    done = (j, version) in self.cache
+                if self.wanted != None:
+                    break
+                if done or j < 0 or j >= count:
+                    continue
+                try:
+                    if not ready(j):
+                        continue
+                    self.put((j, version), compose(get_frame(j), overlay), generation)
+                except Exception:
+                    # Vidéo fermée ou remplacée pendant la composition, ou erreur de dessin :
+                    # l'image reste affichée sans cache
+                    logger.exception("Composition de l'image "+str(j)+" impossible")
+                    break
+
+class FrameItem(QGraphicsItem):
+    def __init__(self):
+        super(FrameItem, self).__init__()
+        self.frame = None
+        self.image = QImage()
+        # Taille de l'image entière (l'image affichée peut être réduite)
+        self.size = (0, 0)
+
+    def set_frame(self, display, size):
+        # display : image éventuellement réduite pour l'affichage (voir renderer.FramePyramid),
+        # size : taille de l'image entière ; le QImage lit directement le tableau : on garde
+        # une référence sur celui-ci
+        if not display.flags["C_CONTIGUOUS"]:
+            display = ascontiguousarray(display)
+        if self.size != size:
+            self.prepareGeometryChange()
+            self.size = size
+        self.frame = display
+        self.image = frame_image(display)
+        self.update()
+
+    def set_image(self, image):
+        self.prepareGeometryChange()
+        self.frame = None
+        self.image = image
+        self.size = (image.width(), image.height())
+        self.update()
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.size[0], self.size[1])
+
+    def paint(self, painter, option, widget=None):
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawImage(self.boundingRect(), self.image)
+
+class CompositeItem(QGraphicsItem):
+    # Image composée (voir compose), affichée telle quelle en pixels de la vue, sous la trajectoire
+    def __init__(self, view):
+        super(CompositeItem, self).__init__()
+        self.view = view
+        self.image = QImage()
+
+    def set_image(self, image):
+        self.image = image
+        self.update()
+
+    def boundingRect(self):
+        return self.view.mapToScene(self.view.viewport().rect()).boundingRect()
+
+    def paint(self, painter, option, widget=None):
+        painter.save()
+        painter.resetTransform()
+        painter.drawImage(0, 0, self.image)
+        painter.restore()
+
+class OverlayItem(QGraphicsItem):
+    # Élément dessiné en pixels de l'écran (épaisseurs et marqueurs indépendants du zoom),
+    # à partir des coordonnées du repère des mesures
+    def __init__(self, view):
+        super(OverlayItem, self).__init__()
+        self.view = view
+
+    def boundingRect(self):
+        # Les flèches et les étiquettes peuvent déborder de l'image
+        rect = self.view.sceneRect()
+        margin = max(rect.width(), rect.height())*0.1
+        return rect.adjusted(-margin, -margin, margin, margin)
+
+    def paint(self, painter, option, widget=None):
+        transform = painter.worldTransform()
+        painter.save()
+        painter.resetTransform()
+        painter.setRenderHint(QPainter.Antialiasing)
+        self.draw(painter, lambda x, y: transform.map(self.view.scene_point(x, y)))
+        painter.restore()
+
+class AxesItem(OverlayItem):
+    def __init__(self, view):
+        super(AxesItem, self).__init__(view)
+        # Graduations : (valeurs, étiquettes) pour chaque axe, grille, flèches
+        self.xticks = ([], [])
+        self.yticks = ([], [])
+        self.grid = False
+        self.arrows = AXIS_ARROWS[1]
+        # Les axes ne changent qu'avec la mise en page : gardés en cache d'une image à l'autre
+        self.setCacheMode(QGraphicsItem.DeviceCoordinateCache)
+
+    def draw(self, painter, point):
+        draw_axes(painter, point, self.view.extent, self.xticks, self.yticks, self.grid, self.arrows)
+
+class SegmentItem(OverlayItem):
+    def __init__(self, view):
+        super(SegmentItem, self).__init__(view)
+        self.points = None
+
+    def draw(self, painter, point):
+        draw_segment(painter, point, self.points)
+
+class TrajectoryItem(OverlayItem):
+    def __init__(self, view):
+        super(TrajectoryItem, self).__init__(view)
+        self.x = []
+        self.y = []
+        self.color = "b"
+        self.marker = "."
+        self.line = ""
+
+    def draw(self, painter, point):
+        draw_trajectory(painter, point, self.x, self.y, self.color, self.marker, self.line)
+
+class FrameView(QGraphicsView):
+    # Émis après un changement de taille ou d'agrandissement (images à réduire de nouveau,
+    # images composées plus valables)
+    resized = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super(FrameView, self).__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setFrameShape(QFrame.NoFrame)
+        self.setStyleSheet("background: transparent;")
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setMouseTracking(True)
+        self.viewport().setMouseTracking(True)
+        # Position de l'image dans le repère des mesures : [gauche, droite, bas, haut]
+        self.extent = [0, 1, 0, 1]
+        # Fonctions appelées pour chaque évènement, comme avec FigureCanvas.mpl_connect
+        self.callbacks = dict()
+        self.next_cid = 0
+        # Échelle de l'image entière dans la vue sans agrandissement
+        self.fit_scale = 1
+
+    def mpl_connect(self, name, func):
+        self.next_cid += 1
+        self.callbacks[self.next_cid] = (name, func)
+        return self.next_cid
+
+    def mpl_disconnect(self, cid):
+        del self.callbacks[cid]
+
+    def scene_point(self, x, y):
+        rect = self.sceneRect()
+        return scene_mapper(self.extent, rect.width(), rect.height())(x, y)
+
+    def data_point(self, p):
+        rect = self.sceneRect()
+        if not rect.contains(p):
+            return None, None
+        left, right, bottom, top = self.extent
+        return left+p.x()*(right-left)/rect.width(), top-p.y()*(top-bottom)/rect.height()
+
+    def emit(self, name, event):
+        xdata, ydata = self.data_point(self.mapToScene(event.pos()))
+        for cid, (callback_name, func) in list(self.callbacks.items()):
+            if callback_name == name:
+                func(CanvasEvent(xdata, ydata, event.button()))
+
+    def mousePressEvent(self, event):
+        self.emit("button_press_event", event)
+
+    def mouseMoveEvent(self, event):
+        self.emit("motion_notify_event", event)
+
+    def fit(self):
+        if not self.sceneRect().isEmpty():
+            self.fitInView(self.sceneRect(), Qt.KeepAspectRatio)
+            self.fit_scale = self.transform().m11()
+
+    def zoom(self):
+        return self.transform().m11()/self.fit_scale
+
+    def display_size(self):
+        # Taille de l'image entière sans agrandissement, en pixels de l'écran
+        rect = self.sceneRect()
+        scale = self.fit_scale*self.devicePixelRatioF()
+        return rect.width()*scale, rect.height()*scale
+
+    def wheelEvent(self, event):
+        # Agrandissement sous la souris, entre l'image entière et ZOOM_MAX
+        factor = ZOOM_STEP if event.angleDelta().y() > 0 else 1/ZOOM_STEP
+        factor = min(max(factor, 1/self.zoom()), ZOOM_MAX/self.zoom())
+        if abs(factor-1) > 1e-3:
+            self.scale(factor, factor)
+            self.resized.emit()
+
+    def resizeEvent(self, event):
+        super(FrameView, self).resizeEvent(event)
+        self.fit()
+        self.resized.emit()
+
+class GraphicsRenderer:
+    # Même interface que renderer.CanvasRenderer, pour une FrameView
+    def __init__(self, view):
+        self.view = view
+        scene = view.scene()
+        self.frame = FrameItem()
+        self.axes = AxesItem(view)
+        self.etalon = SegmentItem(view)
+        self.trajectory = TrajectoryItem(view)
+        # Éléments remplacés par l'image composée quand elle est prête
+        self.live = (self.frame, self.axes, self.etalon)
+        self.composite = CompositeItem(view)
+        self.composite.setVisible(False)
+        # La trajectoire reste un élément à part, au-dessus de l'image composée
+        self.trajectory.setZValue(1)
+        for item in self.live+(self.composite, self.trajectory):
+            scene.addItem(item)
+        self.composites = CompositeCache()
+        self.pyramid = FramePyramid()
+        self.view.resized.connect(self.refresh)
+        self.layout = None
+        # Version de l'affichage (voir render)
+        self.version = None
+        # Derniers arguments de render(), pour l'export avec matplotlib
+        self.state = None
+
+    def set_source(self, get_frame, count, ready):
+        # Images de la vidéo affichée, composées en arrière-plan autour de l'image courante
+        self.composites.set_source(get_frame, count, ready)
+        self.pyramid.set_source(get_frame, count, ready)
+
+    def reset(self):
+        self.layout = None
+        self.state = None
+        self.composites.clear()
+        self.pyramid.clear()
+
+    def refresh(self):
+        # Après un redimensionnement : image réduite et composée pour la nouvelle taille
+        if self.state != None:
+            self.render(*self.state)
+        else:
+            self.show_live()
+
+    def set_scene_size(self, width, height):
+        if self.view.sceneRect() != QRectF(0, 0, width, height):
+            self.view.setSceneRect(QRectF(0, 0, width, height))
+            self.view.fit()
+
+    def show_live(self):
+        # Affichage des éléments eux-mêmes (image composée absente ou périmée)
+        if self.composite.isVisible():
+            self.composite.setVisible(False)
+            for item in self.live:
+                item.setVisible(True)
+
+    def show_composite(self, image):
+        self.composite.set_image(image)
+        if not self.composite.isVisible():
+            self.composite.setVisible(True)
+            for item in self.live:
+                item.setVisible(False)
+
+    def show_logo(self, path):
+        self.reset()
+        self.show_live()
+        image = QImage(path)
+        self.frame.set_image(image)
+        for item in (self.axes, self.etalon, self.trajectory):
+            item.setVisible(False)
+        self.set_scene_size(image.width(), image.height())
+
+    def render(self, k, frame, extent, ratio, x, y, settings, etalonnage, etalon, axisType):
+        self.state = (k, frame, extent, ratio, x, y, settings, etalonnage, etalon, axisType)
+        self.set_scene_size(frame.shape[1], frame.shape[0])
+
+        calibration = (etalonnage["valeurMetres"], etalonnage["valeurPixels"]) if etalonnage["done"] == True else None
+        layout = (tuple(extent), tuple(ratio), calibration, settings["grid"], settings["ticks"], axisType, frame.shape)
+        if layout != self.layout:
+            self.apply_layout(extent, ratio, settings, etalonnage, calibration, axisType)
+            self.layout = layout
+        self.etalon.points = etalon
+        self.trajectory.x, self.trajectory.y = x, y
+        self.trajectory.color, self.trajectory.marker, self.trajectory.line = settings["color"], settings["point"], settings["line"]
+        self.trajectory.setVisible(True)
+        self.trajectory.update()
+
+        # Version de l'affichage : change avec l'étalonnage, les axes et la vue, pas avec les
+        # points mesurés (la trajectoire n'est pas dans l'image composée)
+        overlay = self.overlay()
+        version = hash((layout, overlay["etalon"], overlay["size"], overlay["pixel_ratio"], overlay["matrix"]))
+        self.version = version
+        image = self.composites.get(k, version)
+        if image is not None:
+            # Image déjà composée : un seul drawImage, sans mise à l'échelle
+            self.show_composite(image)
+        else:
+            # Niveau 2 de la pyramide pour une vue agrandie
+            self.pyramid.set_size(self.view.display_size(), frame.shape)
+            self.frame.set_frame(self.pyramid.get(k, frame, 2 if self.view.zoom() > 1.01 else 1), (frame.shape[1], frame.shape[0]))
+            for item in (self.axes, self.etalon):
+                item.setVisible(True)
+            self.show_live()
+            self.etalon.update()
+        self.composites.request(k, version, overlay)
+
+    def preview(self, k):
+        # Aperçu rapide de l'image k : image déjà composée ou vignette, sans lire l'image
+        # elle-même ; False si aucun aperçu n'est disponible
+        if self.state == None:
+            return False
+        image = self.composites.get(k, self.version)
+        if image is not None:
+            self.show_composite(image)
+            return True
+        thumbnail = self.pyramid.thumbnail(k)
+        if thumbnail is None:
+            return False
+        self.show_live()
+        self.frame.set_frame(thumbnail, self.frame.size)
+        return True
+
+    def overlay(self):
+        # Copie de l'état affiché, utilisable par compose() dans un autre thread
+        transform = self.view.viewportTransform()
+        etalon = self.etalon.points
+        return {"size":(self.view.viewport().width(), self.view.viewport().height()), "pixel_ratio":self.view.devicePixelRatioF(),
+                "transform":transform, "matrix":(transform.m11(), transform.m12(), transform.m21(), transform.m22(), transform.dx(), transform.dy()),
+                "extent":list(self.view.extent), "xticks":self.axes.xticks, "yticks":self.axes.yticks, "grid":self.axes.grid, "arrows":self.axes.arrows,
+                "etalon":None if etalon == None else (tuple(etalon[0]), tuple(etalon[1]))}
+
+    def apply_layout(self, extent, ratio, settings, etalonnage, calibration, axisType):
+        left, right, bottom, top = ratio
+        self.view.extent = list(extent)
+        if calibration != None:
+            xticks, xlabels = scale_ticks(left, right, etalonnage)
+            yticks, ylabels = scale_ticks(bottom, top, etalonnage)
+        else:
+            locator = MaxNLocator(nbins=8)
+            xticks = [x for x in locator.tick_values(min(extent[0], extent[1]), max(extent[0], extent[1])) if min(extent[0], extent[1]) <= x <= max(extent[0], extent[1])]
+            yticks = [y for y in locator.tick_values(min(extent[2], extent[3]), max(extent[2], extent[3])) if min(extent[2], extent[3]) <= y <= max(extent[2], extent[3])]
+            xlabels = ["{:g}".format(x) for x in xticks]
+            ylabels = ["{:g}".format(y) for y in yticks]
+        if settings["ticks"] == False:
+            xlabels = ["" for x in xticks]
+            ylabels = ["" for y in yticks]
+        self.axes.xticks = (list(xticks), [str(label) for label in xlabels])
+        self.axes.yticks = (list(yticks), [str(label) for label in ylabels])
+        self.axes.grid = settings["grid"]
+        self.axes.arrows = AXIS_ARROWS[axisType]
+        self.axes.update()
+
+    def paint(self):
+        # Dessin immédiat de la scène, sans attendre la boucle d'évènements
+        self.view.viewport().repaint()
+
+    def export(self, path):
+        # Export du graphique avec matplotlib, à la taille de la vue
+        if self.state == None:
+            self.view.grab().save(path)
+            return
+        figure = Figure(figsize=(self.view.width()/100, self.view.height()/100), dpi=100)
+        figure.patch.set_facecolor("None")
+        canvas = FigureCanvasAgg(figure)
+        CanvasRenderer(canvas, figure.add_subplot(111)).render(*self.state)
+        canvas.print_figure(path)
@@ -8,7 +8,8 @@ version_number = "dev-beta v0.5 (13 mai 2022)"
 # --------------------------------------------------   
 # Importation des librairies
 # -------------------------------------------------- 
-import sys, os, csv, time, subprocess
+import sys, os, csv, time, subprocess, multiprocessing, threading
+from collections import deque
 
 # Gestion de l'interface
 from PyQt5.QtCore import (
@@ -18,6 +19,8 @@ from PyQt5.QtCore import (
     QLocale,
     QRect,
     QPoint,
+    QSize,
+    QEvent,
     QThread,
     Qt,
     QTimer
@@ -49,7 +52,11 @@ from PyQt5.QtWidgets import (
     QLabel,
     QWidget, 
     QTableWidgetItem,
-    QSpacerItem
+    QSpacerItem,
+    QProgressBar,
+    QPushButton,
+    QRubberBand,
+    QInputDialog
 )
 from PyQt5.uic import loadUi
 from waitingspinnerwidget import QtWaitingSpinner
@@ -61,7 +68,7 @@ from time import sleep
 from pyperclip import copy as pccopy
 
 # Gestion des tableaux et des listes
-from numpy import (linspace, array)
+from numpy import (array)
 
 # Gestion des graphiques et du canvas
 import matplotlib
@@ -70,8 +77,14 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
 from matplotlib.figure import Figure
 
 # Gestion de l'importation avec OpenCV
-from extract import (extract_images, extract_infos, webcam_init, webcam_get_image, webcam_init_capture, webcam_write_image, webcam_end_capture, list_webcam_ports, release_cap, set_property, set_exposition)
+from extract import (extract_images, VideoSource, ImageSequenceSource, load_index, index_needed, is_sequence, SEQUENCE_EXTENSIONS, SEQUENCE_FPS, source_point, MAX_IMAGES, FRAME_FORMATS, SAMPLING_MODES, max_images, to_rgb, webcam_init, webcam_get_image, webcam_init_capture, webcam_write_image, webcam_end_capture, list_webcam_ports, release_cap, set_property, set_exposition)
 from webserver import (get_address, start_server, have_internet)
+from planner import ImportPlanner, MEMORY_BUDGET
+import correction
+from correction import load_profiles, make_corrector
+from renderer import CanvasRenderer
+from frameview import FrameView, GraphicsRenderer
+from framestore import (FrameProvider, FrameStore, RegionDecoder, ImportCache, extract_to_store, fingerprint, sequence_fingerprint)
 
 # Gestion des qrcodes
 import qrcode
@@ -84,6 +97,25 @@ if getattr(sys, 'frozen', False):
 elif __file__:
     application_path = str(Path(os.path.dirname(os.path.realpath(__file__))))
 
+# Dossier du cache des images importées (fichiers memmap)
+cache_path = os.path.join(application_path, "videos", "cache")
+# Tables de correction de l'objectif et de la perspective, profils de caméra (.json)
+correction.CACHE_DIR = os.path.join(cache_path, "remap")
+profiles_path = os.path.join(application_path, "profiles")
+# Affichage des images : "matplotlib" (FigureCanvasQTAgg) ou "qt" (QGraphicsView, images
+# transmises sans copie), choisi au lancement avec --display=qt ; matplotlib sert dans tous
+# les cas à l'export
+DISPLAY_BACKENDS = ("matplotlib", "qt")
+DISPLAY_BACKEND = "matplotlib"
+# Attente maximale (en s) du dessin d'une image pendant la lecture
+PLAY_DRAW_TIMEOUT = 1
+# Nombre de clics de mesure pris en compte dans le suivi de la latence
+CLICK_LATENCY_WINDOW = 150
+# Résumé de la latence écrit dans le journal tous les CLICK_LATENCY_REPORT clics
+CLICK_LATENCY_REPORT = 25
+# Délai sans mouvement du curseur (en ms) avant d'afficher l'image complète après des aperçus
+SLIDER_SETTLE_DELAY = 150
+
 import logging
 from logging.handlers import RotatingFileHandler
 
@@ -127,16 +159,43 @@ class Window(QMainWindow):
         self.y = array([])
         self.images = []
         self.loupe = False
+        # Vidéo en cours d'importation et lecture en pleine résolution pour la loupe
+        self.video_source = None
+        self.region_decoder = None
+        # Zone affichée dans la loupe : (image, gauche, haut, droite, bas) en pixels de l'image importée
+        self.loupe_bounds = None
+        # Durées des clics de mesure jusqu'à l'image suivante (voir click_ready)
+        self.click_latencies = deque(maxlen=CLICK_LATENCY_WINDOW)
+        self.click_count = 0
+        # Déplacements du curseur : seule la dernière position demandée est dessinée
+        self.slider_wanted = None
+        # Image affichée en aperçu (ou pas encore affichée) pendant le glissement
+        self.slider_pending = False
+        self.slider_timer = QTimer(self)
+        self.slider_timer.setSingleShot(True)
+        self.slider_timer.setInterval(0)
+        self.slider_timer.timeout.connect(self.slider_render)
+        self.settle_timer = QTimer(self)
+        self.settle_timer.setSingleShot(True)
+        self.settle_timer.setInterval(SLIDER_SETTLE_DELAY)
+        self.settle_timer.timeout.connect(self.slider_settle)
         self.newopen = False
         self.webserver_running = False
+        self.importing = False
+        self.nb_ready = 0
         self.version = "<b>ChronoPhys</b> est un logiciel gratuit pour réaliser des chronophotographies en Sciences-Physiques<br><br><b>Licence</b> : GNU GPLv3 <br><b>Auteur</b> : Thibault Giauffret, <a href=\"https://ensciences.fr\">ensciences.fr</a>(2022)<hr><b>Version</b> : "+version_number+"<br><b>Contact</b> : <a href=\"mailto:contact@ensciences.fr\">contact@ensciences.fr</a>"
 
         # Ajout du plot au canvas
-        self.figure = Figure()
-        self.sc = FigureCanvasQTAgg(self.figure)
-        self.figure.patch.set_facecolor("None")
-        self.figure.tight_layout(pad=0)
-        self.sc.axes = self.figure.add_subplot(111)
+        if DISPLAY_BACKEND == "qt":
+            self.sc = FrameView()
+            self.renderer = GraphicsRenderer(self.sc)
+        else:
+            self.figure = Figure()
+            self.sc = FigureCanvasQTAgg(self.figure)
+            self.figure.patch.set_facecolor("None")
+            self.figure.tight_layout(pad=0)
+            self.sc.axes = self.figure.add_subplot(111)
+            self.renderer = CanvasRenderer(self.sc, self.sc.axes)
 
         # Gestion de la taille du plot
         sizePolicy = QSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -144,10 +203,7 @@ class Window(QMainWindow):
 
         # Affichage de l'image initiale
         self.sc.setStyleSheet("background-color:transparent;")
-        img = matplotlib.image.imread(resource_path('assets/icons/stopwatch.png'))
-        self.sc.axes.imshow(img, extent=[-img.shape[1]/2., img.shape[1]/2., -img.shape[0]/2., img.shape[0]/2. ])
-        self.sc.axes.set_axis_off()
-        self.sc.axes.margins(0)
+        self.renderer.show_logo(resource_path('assets/icons/stopwatch.png'))
         self.clickEvent = self.sc.mpl_connect('button_press_event',self.measure_event)
         self.moveEvent = self.sc.mpl_connect('motion_notify_event',self.loupe_update)
 
@@ -169,9 +225,13 @@ class Window(QMainWindow):
         self.phoneButton.clicked.connect(self.smartphone_video_open);
         self.webcamButton.clicked.connect(self.webcam_video_open);
         self.actionOuvrir_un_fichier_vid_o.triggered.connect(self.video_open)
+        self.actionOuvrir_un_dossier_d_images.triggered.connect(self.folder_open)
         self.actionEnregistrer_une_vid_o_avec_un_smartphone.triggered.connect(self.smartphone_video_open)
         self.actionEnregistrer_une_vid_o_avec_la_webcam.triggered.connect(self.webcam_video_open)
         self.loupeBox.hide()
+        # Un clic dans la loupe pointe la mesure en pleine résolution (voir loupe_pressed)
+        self.loupeBox.setToolTip("Maintenir Maj pour figer la loupe, puis cliquer dans la loupe pour pointer avec précision")
+        self.loupeBox.installEventFilter(self)
 
 
         self.playButton.setText('')
@@ -312,10 +372,10 @@ class Window(QMainWindow):
         self.styleBox.setEnabled(False)
 
         # Chargement dans le canvas de la première image de la vidéo
-        self.sc.axes.cla()  # clear the axes content
-        self.figure.subplots_adjust(bottom=0, right=1, top=1, left=0)
-        self.mywidth = self.images[self.current_image].shape[0]
-        self.myheight = self.images[self.current_image].shape[1]
+        self.renderer.reset()
+        frame = self.get_frame(self.current_image)
+        self.mywidth = frame.shape[0]
+        self.myheight = frame.shape[1]
         self.Vaxis_orient = 1
         self.Haxis_orient = 1
         self.Vaxis_ratio = 0.5
@@ -339,15 +399,10 @@ class Window(QMainWindow):
         self.myextent=[self.Haxis_orient*left, self.Haxis_orient*right,self.Vaxis_orient*bottom, self.Vaxis_orient*top]
         self.ratio = [left,right,bottom,top]
 
-        self.sc.axes.imshow(self.images[0], extent=[ -self.myheight*self.Vaxis_ratio, self.myheight*(1-self.Vaxis_ratio),-self.mywidth*self.Haxis_ratio, self.mywidth*(1-self.Haxis_ratio)])
-        self.sc.axes.margins(0)
         self.sc.setContentsMargins(0, 0, 0, 0)
+        self.canvas_update()
 
-        self.sc.draw_idle()
-
-        self.horizontalSlider.setRange(1, self.nb_images)
-
-        self.axis_update()
+        self.horizontalSlider.setRange(1, self.nb_ready)
         
         # Configuration des boutons 
         if self.newopen == False:
@@ -364,6 +419,7 @@ class Window(QMainWindow):
             self.secondPoint.toggled.connect(lambda: self.etalonnage_clicked(2))
             self.rulerButton.clicked.connect(self.ruler_clicked)
             self.horizontalSlider.valueChanged.connect(self.slider_update)
+            self.horizontalSlider.sliderReleased.connect(self.slider_settle)
             self.saveButton.clicked.connect(lambda: self.save_clicked(self.comboBox.currentIndex()))
             self.tableWidget.clicked.connect(self.row_changed)
             self.tabWidget.tabBarClicked.connect(self.tabbar_clicked)
@@ -402,39 +458,130 @@ class Window(QMainWindow):
     def video_open(self):
         logger.info("Clic openButton")
         dialog = QFileDialog(self)
-        dialog.setNameFilter(str("Video (*.mp4 *.avi *.wmv *mov);;All Files (*.*)"))
+        dialog.setNameFilter(str("Video (*.mp4 *.avi *.wmv *mov);;Suite d'images ("+" ".join("*"+extension for extension in SEQUENCE_EXTENSIONS)+");;All Files (*.*)"))
         dialog.setDirectory(os.getenv('HOME'))
         if dialog.exec_():
             filename = dialog.selectedFiles()[0]
             logger.info("Vidéo sélectionnée : "+filename)
             self.import_video(filename)
 
+    def folder_open(self):
+        # Suite d'images : toutes les images du dossier choisi (voir extract.sequence_files)
+        logger.info("Clic ouvrir un dossier")
+        folder = QFileDialog.getExistingDirectory(self, "Dossier d'images", os.getenv('HOME'))
+        if folder:
+            logger.info("Dossier sélectionné : "+folder)
+            self.import_video(folder)
+
     def get_import_data(self, images, videoConfig, error, video_timestamp):
         logger.info("Importation des données de la vidéo")
         self.dlg_wait.stop()
-        if error == False:
-            self.images = images
-            self.videoConfig = videoConfig
-            self.video_timestamp = video_timestamp
-            self.nb_images = self.videoConfig["nb_images"]
-            self.duration = self.videoConfig["duration"]
-            self.current_image = 0
-            #print(self.images[self.current_image])
-            self.imageLabel.setText('Image : '+str(self.current_image+1)+'/'+str(self.nb_images))
-            self.horizontalSlider.setValue(self.current_image+1)
-            self.t = array([None for i in range(self.nb_images)])
-            self.x = array([None for i in range(self.nb_images)])
-            self.y = array([None for i in range(self.nb_images)])
-            self.ui_update()
-            self.newopen = True
+        self.importing = False
+        if self.import_discard == True or (error == False and videoConfig["nb_images"] == 0):
+            # Annulée, ou arrêtée avant la première image (pendant la mesure du mouvement)
+            logger.info("Importation annulée, les images décodées sont abandonnées")
+            if isinstance(images, (FrameProvider, FrameStore)):
+                images.release()
+            if self.import_shown == True:
+                self.clear_video()
+        elif error == False and self.import_shown == True:
+            self.finish_import(images, videoConfig, video_timestamp)
+        elif error == False:
+            self.set_video(images, videoConfig, video_timestamp)
         else:
-            dlg = CustomDialog("Une erreur est survenue lors de l'ouverture de la vidéo. Assurez-vous qu'elle contienne moins de 150 images.")
+            if isinstance(images, (FrameProvider, FrameStore)):
+                images.release()
+            dlg = CustomDialog("Une erreur est survenue lors de l'ouverture de la vidéo. Assurez-vous qu'elle contienne moins de "+str(max_images(videoConfig.get("format", "rgb")))+" images ou choisissez la lecture à la demande.")
             logger.warning("La vidéo contient trop d'images...")
             if dlg.exec():
                 print("Success!")
             else:
                 print("Cancel!")
 
+    def set_video(self, images, videoConfig, video_timestamp):
+        if isinstance(self.images, (FrameProvider, FrameStore)):
+            self.images.release()
+        self.images = images
+        self.videoConfig = videoConfig
+        self.video_timestamp = video_timestamp
+        self.open_region_decoder()
+        self.nb_images = self.videoConfig["nb_images"]
+        # Pendant une importation progressive, seules les premières images sont disponibles
+        self.nb_ready = min(self.nb_images, len(self.video_timestamp))
+        self.renderer.set_source(self.get_frame, self.nb_ready, self.frame_ready)
+        self.duration = self.videoConfig["duration"]
+        self.current_image = 0
+        #print(self.images[self.current_image])
+        self.imageLabel.setText('Image : '+str(self.current_image+1)+'/'+str(self.nb_images))
+        self.horizontalSlider.setValue(self.current_image+1)
+        self.t = array([None for i in range(self.nb_images)])
+        self.x = array([None for i in range(self.nb_images)])
+        self.y = array([None for i in range(self.nb_images)])
+        self.ui_update()
+        self.newopen = True
+
+    def get_first_images(self, images, videoConfig, video_timestamp):
+        logger.info("Affichage des premières images pendant l'importation")
+        self.import_shown = True
+        self.dlg_wait.release_modality()
+        self.set_video(images, videoConfig, video_timestamp)
+
+    def import_progress(self, nb_ready, percent):
+        self.dlg_wait.set_progress(percent)
+        if self.import_shown == True and self.import_discard == False:
+            self.nb_ready = min(nb_ready, self.nb_images)
+            self.renderer.set_source(self.get_frame, self.nb_ready, self.frame_ready)
+            self.horizontalSlider.setRange(1, self.nb_ready)
+
+    def finish_import(self, images, videoConfig, video_timestamp):
+        logger.info("Fin de l'importation progressive")
+        self.images = images
+        self.videoConfig = videoConfig
+        self.video_timestamp = video_timestamp
+        self.open_region_decoder()
+        nb_images = self.videoConfig["nb_images"]
+        if nb_images < self.nb_images:
+            # Importation arrêtée : on ne garde que les images décodées (et leurs mesures)
+            logger.info("Importation arrêtée après "+str(nb_images)+" images")
+            self.t = self.t[:nb_images]
+            self.x = self.x[:nb_images]
+            self.y = self.y[:nb_images]
+            self.tableWidget.setRowCount(nb_images)
+            self.current_image = min(self.current_image, nb_images-1)
+        self.nb_images = nb_images
+        self.nb_ready = nb_images
+        self.renderer.set_source(self.get_frame, self.nb_ready, self.frame_ready)
+        self.label_nombre.setText(str(self.videoConfig["nb_images"]))
+        self.horizontalSlider.setRange(1, self.nb_ready)
+        self.canvas_update()
+
+    def import_cancel(self, keep):
+        logger.info("Interruption de l'importation (images conservées : "+str(keep)+")")
+        self.import_discard = not keep
+        self.import_worker.cancel()
+
+    def clear_video(self):
+        # Retour à l'état initial, sans vidéo
+        if isinstance(self.images, (FrameProvider, FrameStore)):
+            self.images.release()
+        self.images = []
+        self.close_region_decoder()
+        self.nb_images = 0
+        self.nb_ready = 0
+        self.renderer.set_source(self.get_frame, 0, self.frame_ready)
+        self.mesures = False
+        self.imageLabel.setText('')
+        self.tableWidget.setRowCount(0)
+        self.tabWidget.setCurrentIndex(0)
+        self.tabWidget.setTabEnabled(1, False)
+        self.tabWidget.setTabEnabled(2, False)
+        self.etalonBox.setEnabled(False)
+        self.repereBox.setEnabled(False)
+        self.styleBox.setEnabled(False)
+        self.validateButton.setEnabled(False)
+
+        self.renderer.show_logo(resource_path('assets/icons/stopwatch.png'))
+
             
     # --------------------------------------------------   
     # Gestion du serveur web (envie video depuis smartphone)
@@ -504,18 +651,40 @@ class Window(QMainWindow):
 
     def import_video(self, filename):
         logger.info("Importation de la vidéo")
+        if self.importing == True:
+            logger.warning("Une importation est déjà en cours")
+            return
         try :
             logger.info("Extraction des informations de la vidéo")
-            frame, camera_Width,camera_Height ,fps,frame_count,duration = extract_infos(str(filename))
-            dlg2 = ImportDialog(frame,camera_Width,camera_Height ,fps,frame_count,duration )
+            # La vidéo reste ouverte pour l'importation (pas de seconde analyse du fichier)
+            if is_sequence(str(filename)):
+                # Suite d'images numérotées (caméra rapide) : même importation qu'une vidéo
+                source = ImageSequenceSource(str(filename))
+                logger.info("Suite de "+str(source.frame_count)+" images "+source.codec+" "+str(source.width)+"x"+str(source.height))
+                if not source.timed:
+                    fps, ok = QInputDialog.getDouble(self, "Suite d'images", "Les fichiers n'indiquent pas leur date de prise de vue.\nNombre d'images par seconde de l'enregistrement :", SEQUENCE_FPS, 0.01, 100000, 2)
+                    if not ok:
+                        source.release()
+                        return
+                    source.set_fps(fps)
+            else:
+                source = VideoSource(str(filename))
+                logger.info("Vidéo "+source.codec+" "+str(source.width)+"x"+str(source.height)+", rotation enregistrée : "+str(source.orientation))
+            dlg2 = ImportDialog(*source.infos(), source=source)
         except Exception as ex :
             logger.exception("Une erreur est survenue : " + str(ex))
+            dlg = CustomDialog("Impossible de lire cette vidéo. Vérifiez qu'il s'agit bien d'un fichier vidéo.")
+            dlg.exec()
+            return
 
         if dlg2.exec_() == QDialog.Accepted:
             self.dlg_wait = WaitDialog()
             
-            if self.dlg_wait.start():
+            if not self.dlg_wait.start():
+                source.release()
+            else:
                 value = dlg2.GetValue()
+                options = dlg2.GetOptions()
                 
                 try :
                     # On crée le QThread object
@@ -523,7 +692,8 @@ class Window(QMainWindow):
                     self.import_thread.setTerminationEnabled(True)
 
                     # On crée l'objet "Worker"
-                    self.import_worker = ImportWorker(filename, value)
+                    self.import_worker = ImportWorker(source, value, options)
+                    self.video_source = source
 
                     # On déplace le worker dans le thread
                     self.import_worker.moveToThread(self.import_thread)
@@ -536,14 +706,22 @@ class Window(QMainWindow):
                     self.import_thread.finished.connect(self.import_thread.deleteLater)
 
                     self.import_worker.data.connect(self.get_import_data)
+                    self.import_worker.ready.connect(self.get_first_images)
+                    self.import_worker.progress.connect(self.import_progress)
+                    self.dlg_wait.cancel.connect(self.import_cancel)
 
                     # On démarre le thread
+                    self.importing = True
+                    self.import_shown = False
+                    self.import_discard = False
                     self.import_thread.start()
                 except Exception as ex:
                     logger.exception("Une erreur est survenue : " + str(ex))
+                    source.release()
                 
         else:
             logger.info("Importation refusée")
+            source.release()
 
 
     # --------------------------------------------------   
@@ -568,7 +746,7 @@ class Window(QMainWindow):
 
     def play(self):
         logger.info("Clic playButton, lecture de la vidéo")
-        if self.images != []:
+        if len(self.images) > 0:
             self.playButton.setEnabled(False);
             self.scrollArea.setEnabled(False);
             self.playStatus = True
@@ -580,7 +758,9 @@ class Window(QMainWindow):
 
 
                 # On crée l'objet "Worker"
-                self.worker = Worker(images= self.images, x=self.x, y=self.y, axes=self.sc.axes,myextent = self.myextent,etalonnage=self.etalonnage,showEtalon=self.showEtalon,ratio=self.ratio,settings=self.settings, current_image=self.current_image, nb_images=self.nb_images)
+                self.worker = Worker(images= self.images, current_image=self.current_image, nb_images=self.nb_ready, timestamps=self.video_timestamp, fps=self.videoConfig["fps"])
+                # Signalé après le dessin de chaque image (voir Worker.run)
+                self.play_drawn = self.worker.drawn
 
                 # On déplace le worker dans le thread
                 self.worker.moveToThread(self.mythread)
@@ -614,17 +794,43 @@ class Window(QMainWindow):
 
     def next_clicked(self):
         logger.info("Clic nextButton")
-        if self.current_image < self.nb_images-1 and self.playStatus == False:
+        return self.next_frame()
+
+    def next_frame(self):
+        if self.current_image < self.nb_ready-1 and self.playStatus == False:
             self.current_image+=1
-            self.horizontalSlider.setValue(self.current_image+1)
-            self.canvas_update()
+            self.slider_set(self.current_image+1)
+            self.frame_update()
+            self.prefetch(1)
+            return True
+        return False
 
     def prev_clicked(self):
         logger.info("Clic prevButton")
         if self.current_image > 0 and self.playStatus == False:
             self.current_image-=1
-            self.horizontalSlider.setValue(self.current_image+1)
-            self.canvas_update()
+            self.slider_set(self.current_image+1)
+            self.frame_update()
+            self.prefetch(-1)
+
+    def slider_set(self, value):
+        # Position du curseur sans passer par slider_update (l'image est déjà affichée)
+        self.horizontalSlider.blockSignals(True)
+        self.horizontalSlider.setValue(value)
+        self.horizontalSlider.blockSignals(False)
+
+    def prefetch(self, direction):
+        # Lecture anticipée des images suivantes (ou précédentes) si elles sont décodées à la demande
+        if isinstance(self.images, FrameProvider):
+            self.images.prefetch(self.current_image, direction)
+
+    def get_frame(self, k):
+        # Image k en RGB pour l'affichage (les images peuvent être stockées en YUV ou en niveaux de gris)
+        return to_rgb(self.images[k], self.videoConfig.get("format", "rgb"))
+
+    def frame_ready(self, k):
+        # Image k lisible sans la décoder (toujours vrai sauf pour une vidéo lue à la demande)
+        return not isinstance(self.images, FrameProvider) or self.images.cached(k)
 
     # --------------------------------------------------   
     # Gestion de la loupe
@@ -639,14 +845,47 @@ class Window(QMainWindow):
             self.loupeBox.hide()
             self.loupe = False
 
-    def loupe_update(self,event):
-        if self.loupe == True and self.images !=[]:
-            bottom = self.mywidth*(1-self.Haxis_ratio)
-            left = self.myheight*(self.Vaxis_ratio)
+    def image_point(self, xdata, ydata):
+        # Coordonnées du canvas -> (colonne, ligne) dans l'image affichée
+        bottom = self.mywidth*(1-self.Haxis_ratio)
+        left = self.myheight*(self.Vaxis_ratio)
+        return abs(left)+(self.Haxis_orient*xdata), abs(bottom)-(self.Vaxis_orient*ydata)
+
+    def data_point(self, posx, posy):
+        # (colonne, ligne) dans l'image affichée -> coordonnées du canvas (inverse de image_point)
+        bottom = self.mywidth*(1-self.Haxis_ratio)
+        left = self.myheight*(self.Vaxis_ratio)
+        return (posx-abs(left))/self.Haxis_orient, (abs(bottom)-posy)/self.Vaxis_orient
+
+    def source_point(self, xdata, ydata):
+        # Coordonnées du canvas -> pixel de l'image d'origine (zone, échelle et rotation prises en compte)
+        return source_point(self.videoConfig, *self.image_point(xdata, ydata))
+
+    def open_region_decoder(self):
+        # La loupe lit l'image d'origine quand les images importées sont réduites
+        # (pendant une importation progressive, les indices ne sont connus qu'à la fin)
+        self.close_region_decoder()
+        if self.video_source == None or "indices" not in self.videoConfig or "camera_width" not in self.videoConfig:
+            return
+        region_decoder = RegionDecoder(self.video_source, self.videoConfig)
+        if region_decoder.scale > 1:
+            logger.info("Loupe en pleine résolution (x"+str(round(region_decoder.scale, 2))+")")
+            self.region_decoder = region_decoder
+
+    def close_region_decoder(self):
+        if self.region_decoder != None:
+            self.region_decoder.release()
+            self.region_decoder = None
 
+    def loupe_update(self,event):
+        if self.loupe == True and len(self.images) > 0:
+            if QApplication.keyboardModifiers() & Qt.ShiftModifier:
+                # Loupe figée : le pointeur peut la rejoindre pour y cliquer
+                return
             if event.xdata!=None and event.ydata!=None :
-                posx = (abs(left)+(self.Haxis_orient*event.xdata))+1
-                posy = (abs(bottom)-(self.Vaxis_orient*event.ydata))+1
+                posx, posy = self.image_point(event.xdata, event.ydata)
+                posx += 1
+                posy += 1
                 if int(posy-0.05*self.mywidth) > 0 and  int(posx-0.05*self.mywidth)>0 and int(posy+0.05*self.mywidth) <= self.mywidth and  int(posx+0.05*self.mywidth) <= self.myheight:
 
                     axe = QPixmap(135, 135)
@@ -659,7 +898,17 @@ class Window(QMainWindow):
                     p.end()
                     axe.scaled(135, 135,Qt.KeepAspectRatio, Qt.FastTransformation)
 
-                    image = (self.images[self.current_image][int(posy-0.05*self.mywidth):int(posy+0.05*self.mywidth),int(posx-0.05*self.mywidth):int(posx+0.05*self.mywidth)]).copy()
+                    region = None
+                    if self.region_decoder != None:
+                        # Zone lue dans l'image d'origine (None tant qu'elle n'est pas décodée)
+                        self.region_decoder.request(self.current_image)
+                        region = self.region_decoder.region(self.current_image, posx-1, posy-1, 0.05*self.mywidth)
+                    if region is None:
+                        bounds = (int(posx-0.05*self.mywidth), int(posy-0.05*self.mywidth), int(posx+0.05*self.mywidth), int(posy+0.05*self.mywidth))
+                        image = (self.get_frame(self.current_image)[bounds[1]:bounds[3],bounds[0]:bounds[2]]).copy()
+                    else:
+                        image, bounds = region
+                    self.loupe_bounds = (self.current_image,)+tuple(bounds)
                     #print(image)
                     #print(image.shape[1],image.shape[0])
                     img = QImage(image, image.shape[1], image.shape[0], image.shape[1] * 3,QImage.Format_RGB888)
@@ -721,27 +970,6 @@ class Window(QMainWindow):
             self.Vaxis_orient = -1
             self.Haxis_orient = -1
 
-    def axis_update(self):
-        logger.info("Mise à jour des axes")
-        self.sc.axes.spines["left"].set_position(("data", 0))
-        self.sc.axes.spines["bottom"].set_position(("data", 0))
-        # Hide the top and right spines.
-        self.sc.axes.spines["top"].set_visible(False)
-        self.sc.axes.spines["right"].set_visible(False)
-
-        if self.axisType == 1:
-            self.sc.axes.plot(1, 0, ">k", transform=self.sc.axes.get_yaxis_transform(), clip_on=False)
-            self.sc.axes.plot(0, 1, "^k", transform=self.sc.axes.get_xaxis_transform(), clip_on=False)
-        elif self.axisType == 2:
-            self.sc.axes.plot(1, 0, ">k", transform=self.sc.axes.get_yaxis_transform(), clip_on=False)
-            self.sc.axes.plot(0, 0, "vk", transform=self.sc.axes.get_xaxis_transform(), clip_on=False)
-        elif self.axisType == 3:
-            self.sc.axes.plot(0, 0, "<k", transform=self.sc.axes.get_yaxis_transform(), clip_on=False)
-            self.sc.axes.plot(0, 1, "^k", transform=self.sc.axes.get_xaxis_transform(), clip_on=False)
-        elif self.axisType == 4:
-            self.sc.axes.plot(0, 0, "<k", transform=self.sc.axes.get_yaxis_transform(), clip_on=False)
-            self.sc.axes.plot(0, 0, "vk", transform=self.sc.axes.get_xaxis_transform(), clip_on=False)
-    
     def repere_clicked(self):
         logger.info("Clic repereButton")
         self.etalonBox.setEnabled(True)
@@ -913,39 +1141,69 @@ class Window(QMainWindow):
     def measure_event(self, event):
         if self.mesures == True and event.xdata!=None and event.ydata!=None:
             # print('Event received:',event.xdata,event.ydata)
-
-            self.table_update(self.current_image,event.xdata,event.ydata)
-
-            self.t[self.current_image]=round(self.current_image*self.duration/self.nb_images,3);
-            self.x[self.current_image]=event.xdata;
-            self.y[self.current_image]=event.ydata;
-
-            
-            self.next_clicked()
-
+            self.measure(event.xdata, event.ydata)
             self.loupe_update(event)
 
+    def eventFilter(self, obj, event):
+        if obj is self.loupeBox and event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+            self.loupe_pressed(event.pos())
+            return True
+        return super().eventFilter(obj, event)
+
+    def loupe_pressed(self, pos):
+        # Clic dans la loupe : point de la zone agrandie, lue en pleine résolution si possible
+        pixmap = self.loupeBox.pixmap()
+        if self.mesures == False or self.loupe_bounds == None or self.loupe_bounds[0] != self.current_image or pixmap is None or pixmap.isNull():
+            return
+        k, left, top, right, bottom = self.loupe_bounds
+        posx = left+(right-left)*(pos.x()+0.5)/pixmap.width()
+        posy = top+(bottom-top)*(pos.y()+0.5)/pixmap.height()
+        self.measure(*self.data_point(posx, posy))
+
+    def measure(self, xdata, ydata):
+        start = time.perf_counter()
+
+        k = self.current_image
+        self.table_update(k,xdata,ydata)
+
+        self.t[k]=round(self.video_timestamp[k]/1000,3);
+        self.x[k]=xdata;
+        self.y[k]=ydata;
+
+        # Chemin rapide : seuls la ligne du tableau, la trajectoire et l'image changent
+        if not self.next_frame():
+            self.frame_update()
+
+        # Durée du clic jusqu'à l'image suivante affichée : le dessin est fait tout de suite
+        # pour être compté dans la mesure ; le journal est écrit une fois la mesure faite
+        self.renderer.paint()
+        self.click_ready(start)
+        if "camera_width" in self.videoConfig and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Point de l'image "+str(k+1)+" dans l'image d'origine : "+str(tuple(round(value, 1) for value in self.source_point(xdata, ydata))))
+
+    def click_ready(self, start):
+        self.click_latencies.append(time.perf_counter()-start)
+        self.click_count += 1
+        if self.click_count % CLICK_LATENCY_REPORT == 0:
+            latencies = self.click_latencies
+            logger.info("Mesure : image suivante prête en "+str(round(1000*sum(latencies)/len(latencies), 1))+" ms en moyenne (maximum "+str(round(1000*max(latencies), 1))+" ms) sur les "+str(len(latencies))+" derniers clics")
+
 
     # --------------------------------------------------   
     # Gestion des évènements sur le tableau
     # --------------------------------------------------  
 
     def table_update(self,i,xdata,ydata):
-        logger.info("Mise à jour de la table")
-        # Ajout de la valeur de t dans la ligne correspondant à l'image
-        self.item = QTableWidgetItem()
-        self.item.setText(str(round(self.video_timestamp[self.current_image]/1000,3)))
-        self.tableWidget.setItem(i, 0, self.item)
-
-        # Ajout de la valeur de x dans la ligne correspondant à l'image
-        self.item = QTableWidgetItem()
-        self.item.setText(str(round(xdata*self.etalonnage["valeurMetres"]/self.etalonnage["valeurPixels"],3)))
-        self.tableWidget.setItem(i, 1, self.item)
-
-        # Ajout de la valeur de y dans la ligne correspondant à l'image
-        self.item = QTableWidgetItem()
-        self.item.setText(str(round(ydata*self.etalonnage["valeurMetres"]/self.etalonnage["valeurPixels"],3)))
-        self.tableWidget.setItem(i, 2, self.item)
+        logger.debug("Mise à jour de la table")
+        # Valeurs de t, x et y dans la ligne correspondant à l'image (les cellules déjà
+        # remplies sont modifiées, sans créer de nouveaux éléments)
+        values = (round(self.video_timestamp[i]/1000,3), round(xdata*self.etalonnage["valeurMetres"]/self.etalonnage["valeurPixels"],3), round(ydata*self.etalonnage["valeurMetres"]/self.etalonnage["valeurPixels"],3))
+        for column, value in enumerate(values):
+            item = self.tableWidget.item(i, column)
+            if item is None:
+                self.tableWidget.setItem(i, column, QTableWidgetItem(str(value)))
+            elif item.text() != str(value):
+                item.setText(str(value))
 
     def table_update_etalon(self):
         logger.info("Mise à jour de la table sur au changement de valeur d'étalon")
@@ -985,9 +1243,11 @@ class Window(QMainWindow):
         self.canvas_update()
 
     def row_changed(self,item):
+        if item.row() >= self.nb_ready:
+            return
         self.current_image = item.row()
-        self.horizontalSlider.setValue(self.current_image+1)
-        self.canvas_update()
+        self.slider_set(self.current_image+1)
+        self.frame_update()
 
 
     # --------------------------------------------------   
@@ -996,13 +1256,12 @@ class Window(QMainWindow):
 
     def canvas_update(self):
         logger.info("Mise à jour du canvas")
-        if self.etalonnage["done"] == True:
-            old_labels = self.sc.axes.get_xticklabels()
+        if len(self.images) == 0:
+            return
 
         self.imageLabel.setText('Image : '+str(self.current_image+1)+'/'+str(self.nb_images))
         self.tableWidget.selectRow(self.current_image)
         # print("New image is " + str(self.current_image))
-        self.sc.axes.cla() 
 
         if self.axisType == 1:
             self.Vaxis_orient = 1
@@ -1028,8 +1287,6 @@ class Window(QMainWindow):
 
         #self.myextent=[-self.ycoef*self.myheight*self.ycenter, self.ycoef*self.myheight*(1-self.ycenter),-self.xcoef*self.mywidth*self.xcenter, self.xcoef*self.mywidth*(1-self.xcenter)]
         
-        self.sc.axes.imshow(self.images[self.current_image], extent=self.myextent)
-
         if self.etalonnage["x1"] != 0 or self.etalonnage["x2"] != 0 or self.etalonnage["y1"] != 0 or self.etalonnage["y2"] != 0:
             if self.applyOrient == True:
 
@@ -1038,45 +1295,32 @@ class Window(QMainWindow):
                 self.etalonnage["y1"]*=self.Vaxis_orient*self.old_axisParam[0]
                 self.etalonnage["y2"]*=self.Vaxis_orient*self.old_axisParam[0]
 
-                
-            if self.showEtalon == True:
-                self.sc.axes.plot([self.etalonnage["x1"],self.etalonnage["x2"]],[self.etalonnage["y1"],self.etalonnage["y2"]], "ro-")
-
         for k in range(len(self.x)):
             if self.x[k] != None or self.y[k] != None:
                 if self.applyOrient == True:
                     self.x[k]*=self.Haxis_orient*self.old_axisParam[1]
                     self.y[k]*=self.Vaxis_orient*self.old_axisParam[0]
                     self.table_update(k,self.x[k],self.y[k])
-
-        
-        if self.etalonnage["done"] == True:
-            # labels = [round(float(item.get_text().replace('−','-'))*self.etalonnage["valeurMetres"]/self.etalonnage["valeurPixels"],3)  for item in old_labels]
-            list = linspace(-max(abs(left),abs(right)), max(abs(left),abs(right)), 6)
-            self.sc.axes.set_xticks(list)
-            labels = [round(i*self.etalonnage["valeurMetres"]/self.etalonnage["valeurPixels"],3)  for i in list]
-            
-            self.sc.axes.set_xticklabels(labels)
-
-            list = linspace(-max(abs(bottom),abs(top)), max(abs(bottom),abs(top)), 6)
-            self.sc.axes.set_yticks(list)
-            labels = [round(i*self.etalonnage["valeurMetres"]/self.etalonnage["valeurPixels"],3)  for i in list]
-            self.sc.axes.set_yticklabels(labels)
-
-        self.sc.axes.set_xlim([self.Haxis_orient*left, self.Haxis_orient*right])
-        self.sc.axes.set_ylim([self.Vaxis_orient*bottom, self.Vaxis_orient*top])
         self.applyOrient = False
-        self.sc.axes.plot(self.x,self.y,str(self.settings["color"]+self.settings["point"]+self.settings["line"]))
 
-    
-        self.sc.axes.grid(self.settings["grid"])
-        if self.settings["ticks"] == False :
-            self.sc.axes.set_xticklabels([])
-            self.sc.axes.set_yticklabels([])
+        self.etalon_segment = None
+        if self.showEtalon == True and (self.etalonnage["x1"] != 0 or self.etalonnage["x2"] != 0 or self.etalonnage["y1"] != 0 or self.etalonnage["y2"] != 0):
+            self.etalon_segment = ([self.etalonnage["x1"],self.etalonnage["x2"]],[self.etalonnage["y1"],self.etalonnage["y2"]])
 
-        self.sc.draw_idle()
+        # Les éléments du graphique sont mis à jour, pas recréés (voir renderer.py)
+        self.renderer.render(self.current_image, self.get_frame(self.current_image), self.myextent, self.ratio, self.x, self.y, self.settings, self.etalonnage, self.etalon_segment, self.axisType)
 
-        self.axis_update()
+    def frame_update(self):
+        # Changement d'image ou nouveau point : l'étendue, les graduations et l'étalon calculés
+        # par canvas_update restent valables, seules l'image et la trajectoire sont mises à jour
+        if len(self.images) == 0:
+            return
+        if self.applyOrient == True:
+            self.canvas_update()
+            return
+        self.imageLabel.setText('Image : '+str(self.current_image+1)+'/'+str(self.nb_images))
+        self.tableWidget.selectRow(self.current_image)
+        self.renderer.render(self.current_image, self.get_frame(self.current_image), self.myextent, self.ratio, self.x, self.y, self.settings, self.etalonnage, self.etalon_segment, self.axisType)
 
     # --------------------------------------------------   
     # Mise à jour de l'interface et des évènements
@@ -1121,20 +1365,51 @@ class Window(QMainWindow):
             self.start_measures()
         
 
-    def play_update(self,value,axes):
+    def play_update(self,value):
         # print(value)
         self.current_image = value
-        self.horizontalSlider.setValue(self.current_image+1)
-        self.imageLabel.setText('Image : '+str(self.current_image+1)+'/'+str(self.nb_images))
-        self.sc.axes=axes
-        self.sc.draw_idle()
-        self.axis_update()
-        #self.canvas_update()
+        self.slider_set(self.current_image+1)
+        self.frame_update()
+        self.renderer.paint()
+        self.play_drawn.set()
 
     def slider_update(self,value):
         if self.playStatus == False:
-            self.current_image = value-1
-            self.canvas_update()
+            # Les positions intermédiaires en attente sont remplacées par la dernière : une
+            # seule image est dessinée quand la boucle d'évènements reprend la main
+            self.slider_wanted = value-1
+            if not self.slider_timer.isActive():
+                self.slider_timer.start()
+
+    def slider_render(self):
+        k = self.slider_wanted
+        self.slider_wanted = None
+        if k == None or k >= self.nb_ready or self.playStatus == True:
+            return
+        self.current_image = k
+        if self.horizontalSlider.isSliderDown():
+            # Pendant le glissement : aperçu déjà prêt, ou image si elle est déjà décodée ;
+            # l'image complète est affichée quand le curseur s'arrête
+            self.imageLabel.setText('Image : '+str(self.current_image+1)+'/'+str(self.nb_images))
+            self.slider_pending = True
+            if not self.renderer.preview(k) and self.frame_ready(k):
+                self.frame_update()
+                self.slider_pending = False
+            self.settle_timer.start()
+        else:
+            self.settle_timer.stop()
+            self.slider_pending = False
+            self.frame_update()
+
+    def slider_settle(self):
+        # Curseur arrêté ou relâché : image en pleine qualité à la position courante
+        self.settle_timer.stop()
+        if self.slider_wanted != None:
+            # La dernière position n'est pas encore dessinée : slider_render s'en charge
+            return
+        if self.slider_pending == True and self.playStatus == False and len(self.images) > 0:
+            self.slider_pending = False
+            self.frame_update()
 
     def icon_from_svg(self,svg_filepath):
         img = QPixmap(svg_filepath)
@@ -1236,8 +1511,8 @@ class Window(QMainWindow):
                 return
             
             try :
-                # Sauvegarde du canvas
-                self.sc.print_figure(filePath)
+                # Sauvegarde du canvas (avec matplotlib, quel que soit l'affichage)
+                self.renderer.export(filePath)
                 logger.info("Écriture du fichier png terminée avec succès")
             except Exception as ex:
                 logger.warning("Une erreur est survenue : " + ex)
@@ -1262,6 +1537,9 @@ class Window(QMainWindow):
     def closeEvent(self, event):
         dlg = CustomDialog("Voulez-vous vraiment quitter ?")
         if dlg.exec_():
+            # Une importation interrompue gardée à l'écran est supprimée du disque
+            if isinstance(self.images, (FrameProvider, FrameStore)):
+                self.images.release()
             event.accept() # let the window close
         else:
             event.ignore()
@@ -1368,12 +1646,15 @@ class WebDialog(QDialog):
 # -------------------------------------------------- 
 
 class WaitDialog(QDialog):
+    # Demande d'interruption : True pour garder les images déjà décodées
+    cancel = pyqtSignal(bool)
+
     def __init__(self):
         super().__init__()
         logger.info("Affichage de WaitDialog")
 
         self.setWindowTitle("Importation en cours...")
-        self.setFixedSize(200, 100)
+        self.setFixedSize(300, 190)
 
         self.layout = QVBoxLayout()
 
@@ -1394,9 +1675,25 @@ class WaitDialog(QDialog):
 
         verticalSpacer = QSpacerItem(20, 50, QSizePolicy.Minimum, QSizePolicy.Fixed)
 
+        self.progressBar = QProgressBar()
+        self.progressBar.setRange(0, 100)
+        self.progressBar.setValue(0)
+
+        self.stopButton = QPushButton("Arrêter")
+        self.stopButton.setToolTip("Arrête l'importation en gardant les images déjà décodées")
+        self.stopButton.clicked.connect(lambda : self.request_cancel(True))
+        self.cancelButton = QPushButton("Annuler")
+        self.cancelButton.setToolTip("Arrête l'importation sans garder d'images")
+        self.cancelButton.clicked.connect(lambda : self.request_cancel(False))
+        buttons = QHBoxLayout()
+        buttons.addWidget(self.stopButton)
+        buttons.addWidget(self.cancelButton)
+
         self.layout.addWidget(message)
         self.layout.addItem(verticalSpacer)
         self.layout.addWidget(spinner)
+        self.layout.addWidget(self.progressBar)
+        self.layout.addLayout(buttons)
         self.setLayout(self.layout)
 
         spinner.start()
@@ -1407,6 +1704,20 @@ class WaitDialog(QDialog):
         self.show()
         return True
 
+    def release_modality(self):
+        # Les premières images sont affichées : la fenêtre principale redevient utilisable
+        self.hide()
+        self.setWindowModality(Qt.NonModal)
+        self.show()
+
+    def set_progress(self, percent):
+        self.progressBar.setValue(percent)
+
+    def request_cancel(self, keep):
+        self.stopButton.setEnabled(False)
+        self.cancelButton.setEnabled(False)
+        self.cancel.emit(keep)
+
     def stop(self):
         logger.info("Fermeture de WaitDialog")
         self.done(0)
@@ -1419,9 +1730,13 @@ class WaitDialog(QDialog):
 # -------------------------------------------------- 
 
 class ImportDialog(QDialog):
-    def __init__(self,frame,camera_Width,camera_Height ,fps,frame_count,duration):
+    # Étalonnage de l'importation terminé (émis depuis le thread d'étalonnage)
+    calibrated = pyqtSignal()
+
+    def __init__(self,frame,camera_Width,camera_Height ,fps,frame_count,duration,source=None):
         super().__init__()
         logger.info("Affichage de ImportDialog")
+        self.planner = None
 
         self.frame = frame
         self.duration = duration
@@ -1433,6 +1748,12 @@ class ImportDialog(QDialog):
         self.newcamera_Width = self.camera_Width
         self.newcamera_Height = self.camera_Height
 
+        # Fenêtre d'importation (en s) : seules les images entre le début et la fin sont décodées
+        self.fps = fps
+        self.start = 0
+        self.end = duration
+        self.window_valid = True
+
         logger.info("Chargement de import.ui")
         loadUi(resource_path('assets/ui/import.ui'), self)
         self.setWindowTitle("Importation d'une vidéo")
@@ -1445,6 +1766,27 @@ class ImportDialog(QDialog):
         self.img_label.setPixmap(pixmap)
         self.rotation = 0
 
+        # Zone (x, y, largeur, hauteur) de l'image d'origine à importer, choisie à la souris sur l'aperçu
+        self.roi = None
+        self.roi_origin = None
+        self.img_label.setAlignment(Qt.AlignCenter)
+        self.img_label.setToolTip("Glisser pour choisir la zone à importer, cliquer pour revenir à l'image entière")
+        self.roi_band = QRubberBand(QRubberBand.Rectangle, self.img_label)
+        self.img_label.installEventFilter(self)
+
+        # Correction de l'objectif (profil de caméra) et de la perspective (quatre coins
+        # d'un rectangle cliqués sur l'aperçu) : l'aperçu montre l'image corrigée
+        self.profiles = load_profiles(profiles_path)
+        for profile in self.profiles:
+            self.correction_perso.addItem(profile["name"])
+        self.correction_perso.setEnabled(len(self.profiles) > 0)
+        self.points = None
+        self.picking = None
+        # (profil, points) -> Corrector de l'aperçu, gardé avec ses tables
+        self.correctors = dict()
+        self.correction_perso.currentIndexChanged.connect(self.correction_changed)
+        self.perspective_btn.toggled.connect(self.perspective_toggled)
+
         self.left_btn.clicked.connect(lambda : self.rotate(-90));
         self.right_btn.clicked.connect(lambda : self.rotate(90));
 
@@ -1455,6 +1797,7 @@ class ImportDialog(QDialog):
         self.duree_perso.setText(str(round(self.duration,2)))
         self.fps_ref.setText(str(round(fps,2)))
         self.fps_perso.setText(str(round(fps,2)))
+        self.fin_ref.setText(str(round(self.duration,2)))
 
         self.onlyInt = QIntValidator()
         self.onlyInt .setLocale(QLocale("en_US"))
@@ -1466,28 +1809,116 @@ class ImportDialog(QDialog):
         self.hauteur_perso.setText(str(camera_Height))
         self.images_perso.setText(str(self.frame_count))
 
+        # Nombre de processus utilisés pour le décodage des longues vidéos
+        self.processus_perso.setValidator(self.onlyInt)
+        self.processus_perso.setText(str(os.cpu_count() or 1))
+
+        self.onlyDouble = QDoubleValidator()
+        self.onlyDouble.setLocale(QLocale("en_US"))
+        self.debut_perso.setValidator(self.onlyDouble)
+        self.fin_perso.setValidator(self.onlyDouble)
+        self.debut_perso.setText("0")
+        self.fin_perso.setText(str(round(self.duration,2)))
+
         self.images_perso.textChanged.connect(self.calculate_fps)
         self.largeur_perso.textChanged.connect(self.largeur_test)
         self.hauteur_perso.textChanged.connect(self.hauteur_test)
+        self.debut_perso.textChanged.connect(self.window_test)
+        self.fin_perso.textChanged.connect(self.window_test)
 
         self.btn_apply = self.buttonBox.button(QDialogButtonBox.Ok)
 
-        if self.frame_count >= 150:
-            self.images_perso.setStyleSheet("background-color:'#880000';")
-            self.newframe_count = 0
+        self.stockage_perso.currentIndexChanged.connect(lambda : self.calculate_fps(self.images_perso.text()))
+        # Les formats compacts permettent de garder plus d'images en mémoire
+        self.format_perso.currentIndexChanged.connect(lambda : self.calculate_fps(self.images_perso.text()))
+        # Images régulièrement espacées ou plus serrées quand le mouvement est rapide
+        self.echantillonnage_perso.currentIndexChanged.connect(self.update_plan)
+        # Compensation des tremblements (mouvement de la caméra mesuré une fois par vidéo)
+        self.stabilisation_perso.toggled.connect(self.update_plan)
+
+        # Estimation de la mémoire, du cache et de la durée de l'importation,
+        # étalonnée sur quelques images décodées sur cette machine (dans un thread, avec
+        # sa propre VideoCapture : la boîte de dialogue s'affiche sans attendre)
+        if source != None:
+            self.planner = ImportPlanner(source)
+            self.calibrating = True
+            self.calibrated.connect(self.update_plan)
+            threading.Thread(target=self.calibrate, daemon=True).start()
+        self.memoire_perso.setValidator(self.onlyInt)
+        self.memoire_perso.setText(str(MEMORY_BUDGET))
+        self.memoire_perso.textChanged.connect(self.update_plan)
+        self.processus_perso.textChanged.connect(self.update_plan)
+        self.proposer_btn.clicked.connect(self.propose)
+        self.proposer_btn.setEnabled(self.planner != None)
+
+        # Au-delà de MAX_IMAGES images, les images sont stockées sur le disque
+        if self.frame_count >= MAX_IMAGES:
+            self.stockage_perso.setCurrentIndex(2)
         self.check_state()
 
+        # Réglages d'origine trop lourds pour le budget : on propose directement des réglages qui tiennent
+        settings_perso = self.current_settings()
+        if self.planner != None and settings_perso != None:
+            options = self.GetOptions()
+            if self.planner.estimate(settings_perso, options["storage"], options["workers"])["memory"] > self.budget():
+                self.propose()
+
+    def calibrate(self):
+        try:
+            video_capture = self.planner.source.open_capture()
+            try:
+                self.planner.calibrate(video_capture)
+            finally:
+                video_capture.release()
+        except Exception as ex:
+            logger.exception("Étalonnage de l'importation impossible : " + str(ex))
+        self.calibrating = False
+        try:
+            self.calibrated.emit()
+        except RuntimeError:
+            # Boîte de dialogue déjà fermée
+            pass
+
     def calculate_fps(self, string):
-        if string == '' or int(string) > self.frame_count or int(string) > 150:
+        limit = max_images(FRAME_FORMATS[self.format_perso.currentIndex()])
+        self.stockage_perso.setItemText(0, "En mémoire (< "+str(limit)+" images)")
+        if string == '' or int(string) > self.window_frames() or (self.stockage_perso.currentIndex() == 0 and int(string) >= limit):
             self.fps_perso.setText("-")
             self.images_perso.setStyleSheet("background-color:'#880000';")
             self.newframe_count = 0
         else :
-            self.fps_perso.setText(str(round(int(string)/self.duration,2)))
+            self.fps_perso.setText(str(round(int(string)/(self.end-self.start),2)))
             self.images_perso.setStyleSheet("")
             self.newframe_count = int(string)
         self.check_state()
 
+    def window_frames(self):
+        # Nombre d'images de la vidéo dans la fenêtre d'importation
+        return max(1, min(self.frame_count, round((self.end-self.start)*self.fps)))
+
+    def window_test(self, string):
+        try:
+            start = float(self.debut_perso.text())
+            end = float(self.fin_perso.text())
+        except ValueError:
+            start, end = -1, -1
+        if start < 0 or end <= start or end > self.duration+0.01:
+            self.debut_perso.setStyleSheet("background-color:'#880000';")
+            self.fin_perso.setStyleSheet("background-color:'#880000';")
+            self.window_valid = False
+            self.check_state()
+            return
+        self.debut_perso.setStyleSheet("")
+        self.fin_perso.setStyleSheet("")
+        self.window_valid = True
+        # Si toutes les images étaient demandées, on garde toutes celles de la nouvelle fenêtre
+        all_frames = self.images_perso.text() != '' and int(self.images_perso.text()) == self.window_frames()
+        self.start, self.end = start, min(end, self.duration)
+        self.duree_perso.setText(str(round(self.end-self.start,2)))
+        if all_frames or (self.images_perso.text() != '' and int(self.images_perso.text()) > self.window_frames()):
+            self.images_perso.setText(str(self.window_frames()))
+        self.calculate_fps(self.images_perso.text())
+
     def largeur_test(self, string):
         if string == '' or int(string) > self.camera_Width:
             self.largeur_perso.setStyleSheet("background-color:'#880000';")
@@ -1507,17 +1938,211 @@ class ImportDialog(QDialog):
         self.check_state()
 
     def check_state(self):
-        if self.newcamera_Height != 0 and self.newcamera_Width  != 0 and self.newframe_count != 0:
+        if self.newcamera_Height != 0 and self.newcamera_Width  != 0 and self.newframe_count != 0 and self.window_valid:
             self.btn_apply.setEnabled(True)
         else :
             self.btn_apply.setEnabled(False)
-
-    def rotate(self, rot):
-        my_transform = QTransform()
-        my_transform.rotate(rot)
-        self.img = self.img.transformed(my_transform)
+        self.update_plan()
+
+    def budget(self):
+        # Budget mémoire en octets
+        if self.memoire_perso.text() == '' or int(self.memoire_perso.text()) <= 0:
+            return MEMORY_BUDGET*1024**2
+        return int(self.memoire_perso.text())*1024**2
+
+    def update_plan(self):
+        if self.planner == None:
+            return
+        settings_perso = self.current_settings()
+        if settings_perso == None:
+            self.plan_label.setText("")
+            return
+        options = self.GetOptions()
+        plan = self.planner.estimate(settings_perso, options["storage"], options["workers"])
+        text = ""
+        if self.roi != None:
+            text = "Zone de "+str(self.roi[2])+"x"+str(self.roi[3])+" pixels à partir de ("+str(self.roi[0])+", "+str(self.roi[1])+"). "
+        text += "Images de "+str(plan["width"])+"x"+str(plan["height"])+" pixels"
+        if plan["width"] != settings_perso[0] or plan["height"] != settings_perso[1]:
+            text += " (réduites pour la fluidité)"
+        text += ". Mémoire : "+str(round(plan["memory"]/1024**2))+" Mo"
+        if plan["disk"] > 0:
+            text += ", cache : "+str(round(plan["disk"]/1024**2))+" Mo"
+            text += ", durée : "+str(round(plan["time"], 1))+" s"
+            if self.calibrating:
+                text += " (étalonnage en cours)"
+        if plan["memory"] > self.budget():
+            text += ". Dépasse la mémoire maximale !"
+            self.plan_label.setStyleSheet("color:'#cc3333';")
+        else:
+            self.plan_label.setStyleSheet("")
+        self.plan_label.setText(text)
+
+    def propose(self):
+        # Réglages les plus grands qui tiennent dans la mémoire maximale
+        options = self.GetOptions()
+        settings_perso = self.planner.propose(self.budget(), self.rotation, FRAME_FORMATS[self.format_perso.currentIndex()], options["storage"], options["workers"], self.current_window(), self.roi, SAMPLING_MODES[self.echantillonnage_perso.currentIndex()], self.current_correction(), self.stabilisation_perso.isChecked())
+        if settings_perso == None:
+            logger.info("Aucun réglage ne tient dans la mémoire maximale")
+            self.plan_label.setStyleSheet("color:'#cc3333';")
+            self.plan_label.setText("Aucun réglage ne tient dans la mémoire maximale : augmentez-la, raccourcissez la fenêtre ou stockez les images sur le disque.")
+            return
+        logger.info("Réglages proposés : "+str(settings_perso))
+        self.largeur_perso.setText(str(settings_perso[0]))
+        self.hauteur_perso.setText(str(settings_perso[1]))
+        self.images_perso.setText(str(settings_perso[2]))
+
+    def eventFilter(self, obj, event):
+        if obj is self.img_label and self.picking != None:
+            if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+                self.pick_point(event.pos())
+            return event.type() in (QEvent.MouseButtonPress, QEvent.MouseMove, QEvent.MouseButtonRelease)
+        if obj is self.img_label:
+            if event.type() == QEvent.MouseButtonPress and event.button() == Qt.LeftButton:
+                self.roi_origin = event.pos()
+                self.roi_band.setGeometry(QRect(self.roi_origin, QSize()))
+                self.roi_band.show()
+                return True
+            if event.type() == QEvent.MouseMove and self.roi_origin != None:
+                self.roi_band.setGeometry(QRect(self.roi_origin, event.pos()).normalized())
+                return True
+            if event.type() == QEvent.MouseButtonRelease and self.roi_origin != None:
+                self.roi_origin = None
+                self.set_roi(self.roi_band.geometry())
+                return True
+        return super().eventFilter(obj, event)
+
+    def preview_scale(self):
+        # Position de l'aperçu dans img_label et rapport entre l'image (tournée) et l'aperçu
+        pixmap = self.img_label.pixmap()
+        offset_x = (self.img_label.width()-pixmap.width())/2
+        offset_y = (self.img_label.height()-pixmap.height())/2
+        return offset_x, offset_y, self.img.width()/pixmap.width()
+
+    def preview_to_source(self, x, y):
+        # Point de l'image tournée -> point de l'image d'origine
+        if self.rotation == 90:
+            return y, self.camera_Height-x
+        elif self.rotation == -90:
+            return self.camera_Width-y, x
+        elif self.rotation == 180:
+            return self.camera_Width-x, self.camera_Height-y
+        return x, y
+
+    def source_to_preview(self, x, y):
+        if self.rotation == 90:
+            return self.camera_Height-y, x
+        elif self.rotation == -90:
+            return y, self.camera_Width-x
+        elif self.rotation == 180:
+            return self.camera_Width-x, self.camera_Height-y
+        return x, y
+
+    def set_roi(self, rect):
+        offset_x, offset_y, factor = self.preview_scale()
+        corners = [self.preview_to_source((rect.left()-offset_x)*factor, (rect.top()-offset_y)*factor),
+                   self.preview_to_source((rect.right()+1-offset_x)*factor, (rect.bottom()+1-offset_y)*factor)]
+        x1 = max(0, int(min(corner[0] for corner in corners)))
+        y1 = max(0, int(min(corner[1] for corner in corners)))
+        x2 = min(self.camera_Width, int(max(corner[0] for corner in corners)))
+        y2 = min(self.camera_Height, int(max(corner[1] for corner in corners)))
+        # Dimensions paires (nécessaires au format YUV 4:2:0)
+        width = (x2-x1)//2*2
+        height = (y2-y1)//2*2
+        if width < 8 or height < 8:
+            logger.info("Importation de l'image entière")
+            self.roi = None
+            self.roi_band.hide()
+        else:
+            self.roi = (x1, y1, width, height)
+            logger.info("Zone choisie : "+str(self.roi))
+            self.show_roi()
+        self.update_plan()
+
+    def show_roi(self):
+        if self.roi == None:
+            self.roi_band.hide()
+            return
+        offset_x, offset_y, factor = self.preview_scale()
+        x, y, width, height = self.roi
+        corners = [self.source_to_preview(x, y), self.source_to_preview(x+width, y+height)]
+        left = min(corner[0] for corner in corners)/factor+offset_x
+        top = min(corner[1] for corner in corners)/factor+offset_y
+        right = max(corner[0] for corner in corners)/factor+offset_x
+        bottom = max(corner[1] for corner in corners)/factor+offset_y
+        self.roi_band.setGeometry(QRect(QPoint(int(left), int(top)), QPoint(int(right), int(bottom))))
+        self.roi_band.show()
+
+    def current_correction(self):
+        # (profil, points) pour correction.Corrector, None sans correction
+        profile = None
+        if self.correction_perso.currentIndex() > 0:
+            profile = self.profiles[self.correction_perso.currentIndex()-1]
+        if profile == None and self.points == None:
+            return None
+        return (profile, self.points)
+
+    def correction_changed(self):
+        # Les points de la perspective et la zone ne correspondent plus à la même image
+        self.points = None
+        self.reset_roi()
+        self.refresh_preview()
+        self.update_plan()
+
+    def perspective_toggled(self, checked):
+        # Bouton enfoncé : saisie des quatre coins sur l'aperçu sans perspective,
+        # bouton relâché avant le quatrième point : pas de correction de la perspective
+        self.points = None
+        self.picking = [] if checked else None
+        self.reset_roi()
+        self.refresh_preview()
+        self.update_plan()
+
+    def pick_point(self, pos):
+        offset_x, offset_y, factor = self.preview_scale()
+        x, y = self.preview_to_source((pos.x()-offset_x)*factor, (pos.y()-offset_y)*factor)
+        self.picking.append((round(x, 1), round(y, 1)))
+        if len(self.picking) == 4:
+            self.points = tuple(self.picking)
+            self.picking = None
+            logger.info("Perspective : "+str(self.points))
+            self.perspective_btn.blockSignals(True)
+            self.perspective_btn.setChecked(False)
+            self.perspective_btn.blockSignals(False)
+            self.update_plan()
+        self.refresh_preview()
+
+    def reset_roi(self):
+        self.roi = None
+        self.roi_band.hide()
+
+    def refresh_preview(self):
+        # Aperçu corrigé et tourné comme les images importées, avec les points déjà saisis
+        self.preview = self.frame
+        correction_perso = self.current_correction()
+        if correction_perso != None:
+            key = (self.correction_perso.currentIndex(), self.points)
+            if key not in self.correctors:
+                self.correctors[key] = make_corrector(correction_perso, (self.camera_Width, self.camera_Height))
+            self.preview = self.correctors[key](self.frame).copy()
+        self.img = QImage(self.preview, self.preview.shape[1], self.preview.shape[0], self.preview.shape[1] * 3,QImage.Format_RGB888)
+        if self.rotation != 0:
+            my_transform = QTransform()
+            my_transform.rotate(self.rotation)
+            self.img = self.img.transformed(my_transform)
         pixmap = QPixmap(self.img).scaled(200, 200,Qt.KeepAspectRatio, Qt.FastTransformation)
+        if self.picking:
+            factor = self.img.width()/pixmap.width()
+            painter = QPainter(pixmap)
+            painter.setPen(QPen(QBrush(QColor(204,51,51)), 2))
+            for point in self.picking:
+                x, y = self.source_to_preview(*point)
+                painter.drawEllipse(QPoint(int(x/factor), int(y/factor)), 3, 3)
+            painter.end()
         self.img_label.setPixmap(pixmap)
+        self.show_roi()
+
+    def rotate(self, rot):
         self.rotation += rot
         if self.rotation == 270:
             self.rotation = -90
@@ -1527,6 +2152,8 @@ class ImportDialog(QDialog):
             self.rotation = 180
         elif self.rotation == -270:
             self.rotation = 90
+        # La zone reste la même dans l'image d'origine, seul son tracé sur l'aperçu change
+        self.refresh_preview()
 
         #print(self.rotation)
 
@@ -1538,10 +2165,34 @@ class ImportDialog(QDialog):
         qp.end()
         return QIcon(img)
 
+    def current_window(self):
+        # (début, fin) en s, fin à None si la fenêtre va jusqu'au bout de la vidéo
+        end = self.end
+        if end >= self.duration-0.01:
+            end = None
+        return (self.start, end)
+
+    def current_settings(self):
+        if self.newcamera_Height != 0 and self.newcamera_Width  != 0 and self.newframe_count != 0 and self.window_valid:
+            return (self.newcamera_Width,self.newcamera_Height, self.newframe_count, self.rotation, FRAME_FORMATS[self.format_perso.currentIndex()])+self.current_window()+(self.roi, SAMPLING_MODES[self.echantillonnage_perso.currentIndex()], self.current_correction(), self.stabilisation_perso.isChecked())
+
     def GetValue(self):
         logger.info("Envoie des valeurs choisies lors de l'importation")
-        if self.newcamera_Height != 0 and self.newcamera_Width  != 0 and self.newframe_count != 0:
-            return (self.newcamera_Width,self.newcamera_Height, self.newframe_count, self.rotation    )                                                        
+        return self.current_settings()                                                        
+
+    def GetOptions(self):
+        options = dict()
+        if self.stockage_perso.currentIndex() == 1:
+            options["storage"] = "lazy"
+        elif self.stockage_perso.currentIndex() == 2:
+            options["storage"] = "disk"
+        else:
+            options["storage"] = "memory"
+        if self.processus_perso.text() != '' and int(self.processus_perso.text()) > 0:
+            options["workers"] = int(self.processus_perso.text())
+        else:
+            options["workers"] = 1
+        return options
 
 # --------------------------------------------------   
 # Classe pour la boîte de dialogue de la webcam
@@ -1940,64 +2591,57 @@ class WebcamDialog(QDialog):
 
 class Worker(QObject):
     finished = pyqtSignal()
-    data = pyqtSignal(int,object)
+    data = pyqtSignal(int)
 
-    def __init__(self, images,x,y, axes,myextent,etalonnage,showEtalon,ratio,settings,current_image, nb_images, parent=None):
+    def __init__(self, images, current_image, nb_images, timestamps=None, fps=None, parent=None):
         super(Worker, self).__init__(parent)
         logger.info("Démarrage du Worker pour la lecture")
 
-        self.axes = axes
         self.current_number = current_image
         self.nb_images = nb_images
         self.images = images
-        self.x = x
-        self.y = y
-        self.myextent = myextent
-        self.etalonnage = etalonnage
-        self.left = ratio[0]
-        self.right = ratio[1]
-        self.bottom = ratio[2]
-        self.top = ratio[3]
-        self.settings=settings
-        self.showEtalon = showEtalon
+        # Temps des images (en ms) ou, à défaut, nombre d'images par seconde de l'importation
+        self.timestamps = timestamps
+        self.fps = fps
+        # Image affichée par l'interface (Window.play_update)
+        self.drawn = threading.Event()
 
         self.threadactive=True
 
-    def run(self):
+    def interval(self, i):
+        # Durée (en s) entre les images i-1 et i dans la vidéo
+        if self.timestamps != None and i < len(self.timestamps):
+            return (self.timestamps[i]-self.timestamps[i-1])/1000
+        if self.fps:
+            return 1/self.fps
+        return 0
 
+    def run(self):
+        # Le thread ne fait que cadencer la lecture : l'affichage reste dans le thread
+        # de l'interface (Window.play_update), avec les éléments du graphique déjà créés.
+        # Chaque image est demandée après le dessin de la précédente, à son temps dans la
+        # vidéo : l'attente est raccourcie du temps passé à dessiner
         k = self.current_number
+        shown = time.perf_counter()
         for i in range(k,self.nb_images):
-            self.axes.cla() 
-            self.axes.imshow(self.images[i], extent=self.myextent)
-            self.axes.plot(self.x,self.y,str(self.settings["color"]+self.settings["point"]+self.settings["line"]))
-            if self.showEtalon == True:
-                self.axes.plot([self.etalonnage["x1"],self.etalonnage["x2"]],[self.etalonnage["y1"],self.etalonnage["y2"]], "ro-")
-
-            if self.etalonnage["done"] == True:
-                list = linspace(-max(abs(self.left),abs(self.right)), max(abs(self.left),abs(self.right)), 6)
-                self.axes.set_xticks(list)
-                labels = [round(i*self.etalonnage["valeurMetres"]/self.etalonnage["valeurPixels"],3)  for i in list]
-                self.axes.set_xticklabels(labels)
-
-                list = linspace(-max(abs(self.bottom),abs(self.top)), max(abs(self.bottom),abs(self.top)), 6)
-                self.axes.set_yticks(list)
-                labels = [round(i*self.etalonnage["valeurMetres"]/self.etalonnage["valeurPixels"],3)  for i in list]
-
-                self.axes.grid(self.settings["grid"])
-                self.axes.get_xaxis().set_visible(self.settings["ticks"])
-                self.axes.get_yaxis().set_visible(self.settings["ticks"])
-
-                self.axes.set_yticklabels(labels)
-
-            self.data.emit(i,self.axes)
-            sleep(0.3)
+            if i > k:
+                delay = self.interval(i)-(time.perf_counter()-shown)
+                if delay > 0:
+                    sleep(delay)
             if self.threadactive != True:
                 break
+            if isinstance(self.images, FrameProvider):
+                self.images.prefetch(i, 1)
+            self.drawn.clear()
+            shown = time.perf_counter()
+            self.data.emit(i)
+            self.drawn.wait(PLAY_DRAW_TIMEOUT)
         self.threadactive = False
         self.finished.emit()
 
     def stop(self):
         self.threadactive = False
+        self.drawn.set()
         self.finished.emit()
         logger.info("Arrêt Worker pour la lecture")
 
@@ -2008,21 +2652,136 @@ class Worker(QObject):
 
 class ImportWorker(QObject):
     finished = pyqtSignal()
-    data = pyqtSignal(list,dict,bool,list)
-
-    def __init__(self, filename, value, parent=None):
+    data = pyqtSignal(object,dict,bool,list)
+    # Premières images disponibles (images en cours de remplissage, réglages, temps) :
+    # les objets sont transmis tels quels (object) pour que l'interface suive leur remplissage
+    ready = pyqtSignal(object,object,object)
+    # Nombre d'images décodées et pourcentage de progression
+    progress = pyqtSignal(int,int)
+
+    def __init__(self, source, value, options, parent=None):
         super(ImportWorker, self).__init__(parent)
-        self.filename = filename
+        # VideoSource déjà ouverte par la fenêtre principale
+        self.source = source
         self.value = value
+        self.options = options
+        self.cancelled = False
+        self.shown = False
+        self.percent = -1
         logger.info("Démarrage du Worker pour l'importation de vidéo")
 
     def run(self):
 
-        self.images, self.videoConfig, error, self.video_timestamp = extract_images(str(self.filename),self.value)
+        if self.options["storage"] == "lazy":
+            # Les images ne sont pas décodées ici mais au fur et à mesure de l'affichage
+            # Le FrameProvider reprend la vidéo ouverte et la libérera
+            self.images = FrameProvider(self.source,self.value,index=self.load_index(),workers=self.options["workers"],measure=self.measure)
+            self.videoConfig = dict()
+            self.videoConfig["nb_images"] = len(self.images)
+            self.videoConfig["fps"] = len(self.images)/self.images.duration
+            self.videoConfig["duration"] = self.images.duration
+            self.videoConfig["width"] = self.images.frameSize[0]
+            self.videoConfig["height"] = self.images.frameSize[1]
+            self.videoConfig["frame_count"] = self.images.frame_count
+            self.videoConfig["indices"] = self.images.indices
+            self.videoConfig["format"] = self.images.format
+            self.videoConfig["camera_width"] = self.source.width
+            self.videoConfig["camera_height"] = self.source.height
+            self.videoConfig["rotation"] = self.images.rotation
+            self.videoConfig["roi"] = self.images.roi
+            self.videoConfig["sampling"] = self.images.sampling
+            self.videoConfig["correction"] = self.images.correction
+            self.videoConfig["stabilisation"] = self.images.stabilisation
+            self.videoConfig["window"] = self.images.window
+            error = False
+            self.video_timestamp = self.images.timestamps
+        else:
+            # Une vidéo déjà importée avec les mêmes réglages est relue depuis le cache
+            cache = ImportCache(cache_path)
+            if isinstance(self.source, ImageSequenceSource):
+                video_fingerprint = sequence_fingerprint(self.source.files, self.source.pts)
+            else:
+                video_fingerprint = fingerprint(self.source.video_file)
+            index = self.load_index()
+            store = cache.lookup(video_fingerprint, self.value, index)
+            if store != None:
+                logger.info("Importation depuis le cache : "+store.path)
+                self.videoConfig = store.meta["settings"]
+                self.video_timestamp = store.meta["timestamps"]
+                error = False
+                if self.options["storage"] == "disk":
+                    self.images = store
+                elif len(store) >= max_images(self.videoConfig.get("format", "rgb")):
+                    # Même limite de mémoire qu'une importation décodée (voir extract_images)
+                    error = True
+                    self.images = []
+                    store.release()
+                else:
+                    self.images = array(store.frames[:len(store)])
+                    store.release()
+            elif self.options["storage"] == "disk":
+                # Les images sont écrites directement dans un fichier memmap du cache
+                path = cache.path(video_fingerprint, self.value)
+                logger.info("Écriture des images dans le fichier : "+path)
+                self.images, self.videoConfig, error, self.video_timestamp = extract_to_store(self.source,self.value,path,workers=self.options["workers"],callback=self.callback,index=index,measure=self.measure)
+                if error == False and self.cancelled == False:
+                    cache.put(self.images, video_fingerprint, self.value)
+                else:
+                    # Importation interrompue : pas de mise en cache, le fichier est supprimé
+                    # à la libération des images (voir FrameStore.release)
+                    self.images.meta["partial"] = True
+            else:
+                self.images, self.videoConfig, error, self.video_timestamp = extract_images(self.source,self.value,workers=self.options["workers"],callback=self.callback,index=index,measure=self.measure)
+                if error == False and self.cancelled == False:
+                    # Écriture du cache en arrière-plan : les images sont affichées sans l'attendre.
+                    # Interrompue par la fermeture de l'application, elle ne laisse qu'un fichier
+                    # temporaire (voir ImportCache.put_images)
+                    threading.Thread(target=cache.put_images, args=(video_fingerprint, self.value, self.images, self.videoConfig, self.video_timestamp), daemon=True).start()
+            # Les images sont extraites : la vidéo peut être fermée
+            self.source.release()
+            self.build_index_later()
 
         self.data.emit(self.images, self.videoConfig, error, self.video_timestamp)
         self.finished.emit()
 
+    def load_index(self):
+        # Temps réels des images et images clés : lus à côté de la vidéo, ou construits (une passe
+        # sur la vidéo) seulement si l'importation en profite (voir index_needed)
+        build = index_needed(self.value, self.source.frame_count, self.source.fps, self.options["storage"] == "lazy")
+        logger.info("Chargement de l'index des images" if build else "Lecture de l'index des images s'il est déjà enregistré")
+        index = self.source.load_index(build)
+        if index == None:
+            logger.info("Index des images indisponible, temps estimés à partir des fps")
+        return index
+
+    def build_index_later(self):
+        # Index construit en arrière-plan après une importation qui s'en est passée, pour les suivantes
+        if self.source.index == None and self.cancelled == False and not isinstance(self.source, ImageSequenceSource):
+            threading.Thread(target=load_index, args=(self.source.video_file,), daemon=True).start()
+
+    def callback(self, images, mytime, settings):
+        # Appelé depuis la boucle de décodage après chaque image (ou bloc d'images)
+        if images is not None and self.shown == False and len(mytime) > 0:
+            self.shown = True
+            self.ready.emit(images, settings, mytime)
+        percent = int(100*len(mytime)/max(1, settings["nb_images"]))
+        if percent != self.percent:
+            self.percent = percent
+            self.progress.emit(len(mytime), percent)
+        return self.cancelled == False
+
+    def measure(self, done, total):
+        # Appelé pendant la mesure du mouvement de la caméra (stabilisation), avant le décodage
+        percent = int(100*done/max(1, total))
+        if percent != self.percent:
+            self.percent = percent
+            self.progress.emit(0, percent)
+        return self.cancelled == False
+
+    def cancel(self):
+        # Appelé directement depuis l'interface : la boucle de décodage s'arrête à l'image suivante
+        self.cancelled = True
+
     def stop(self):
         self.finished.emit()
         logger.info("Arrêt du Worker pour l'importation de vidéo")
@@ -2104,6 +2863,8 @@ def openFolder():
 # -------------------------------------------------- 
 
 if __name__ == "__main__":
+    # Nécessaire pour le décodage parallèle dans l'exécutable (processus relancés)
+    multiprocessing.freeze_support()
     logger.info("-------------------------------------------------------------")
     logger.info("Démarrage de l'application Chronophys")
     logger.info("Version de l'application : "+ version_number)
@@ -2115,6 +2876,12 @@ if __name__ == "__main__":
     except FileExistsError:
         logger.warning("Le dossier videos existe déjà")
 
+    # Affichage choisi en ligne de commande (voir DISPLAY_BACKEND)
+    for arg in sys.argv[1:]:
+        if arg.startswith("--display=") and arg.split("=", 1)[1] in DISPLAY_BACKENDS:
+            DISPLAY_BACKEND = arg.split("=", 1)[1]
+    logger.info("Affichage : "+DISPLAY_BACKEND)
+
     app = QApplication(sys.argv)
     app.setStyle('Fusion')
     ui = Window()
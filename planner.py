@@ -0,0 +1,147 @@
+# Planification d'une importation : mémoire, durée et taille du cache estimées
+# avant de lancer le décodage, à partir des informations de la vidéo et d'une
+# courte mesure de la vitesse du décodeur sur cette machine.
+
+import time
+
+from cv2 import CAP_PROP_POS_FRAMES
+from numpy import prod
+
+from extract import (output_size, sample_indices, sampling_mode, correction_settings, stabilisation_enabled, crop_region, mjpeg_reduction, frame_window, frame_shape, frame_format, max_images, choose_decode_mode, parallel_workers, FramePreprocessor)
+
+# Budget mémoire proposé par défaut (en Mo)
+MEMORY_BUDGET = 1024
+# Nombre d'images décodées pour l'étalonnage
+CALIBRATION_FRAMES = 12
+# Nombre d'images gardées par la lecture à la demande (voir FrameProvider)
+LAZY_CACHE_SIZE = 64
+# Au-delà, extract.output_size divise la taille par deux
+MAX_WIDTH = 1280
+MAX_HEIGHT = 720
+# Réductions successives de la résolution essayées par propose()
+SCALES = (1, 0.75, 0.5, 0.375, 0.25)
+
+# Valeurs utilisées si l'étalonnage échoue (vidéo 1080p H.264 sur un portable modeste)
+DEFAULT_GRAB_TIME = 0.01
+DEFAULT_SEEK_TIME = 0.15
+DEFAULT_PIXEL_TIME = 5e-9
+
+class ImportPlanner:
+    def __init__(self, source):
+        self.source = source
+        # Durées mesurées (en s) : décodage d'une image, saut puis décodage,
+        # conversion et prétraitement par pixel de la vidéo
+        self.grab_time = DEFAULT_GRAB_TIME
+        self.seek_time = DEFAULT_SEEK_TIME
+        self.pixel_time = DEFAULT_PIXEL_TIME
+        self.calibrated = False
+
+    def calibrate(self, video_capture=None):
+        # Mesure sur quelques images, avec la VideoCapture déjà ouverte par la VideoSource
+        # ou avec une autre (étalonnage dans un thread séparé)
+        if video_capture == None:
+            video_capture = self.source.video_capture
+        width, height = self.source.width, self.source.height
+        n = min(CALIBRATION_FRAMES, self.source.frame_count)
+
+        video_capture.set(CAP_PROP_POS_FRAMES, 0)
+        grabbed = 0
+        start = time.perf_counter()
+        while grabbed < n and video_capture.grab():
+            grabbed += 1
+        if grabbed == 0:
+            return False
+        self.grab_time = (time.perf_counter()-start)/grabbed
+
+        preprocess = FramePreprocessor((width, height), 0, (width, height))
+        start = time.perf_counter()
+        ret, frameOrig = video_capture.retrieve(preprocess.decoded)
+        if ret == True:
+            preprocess(frameOrig)
+            self.pixel_time = (time.perf_counter()-start)/(width*height)
+
+        start = time.perf_counter()
+        video_capture.set(CAP_PROP_POS_FRAMES, self.source.frame_count//2)
+        if video_capture.grab():
+            self.seek_time = time.perf_counter()-start
+        video_capture.set(CAP_PROP_POS_FRAMES, 0)
+        self.calibrated = True
+        return True
+
+    def estimate(self, settings_perso, storage="memory", workers=1):
+        # Renvoie un dictionnaire : taille réelle des images, nombre d'images,
+        # mémoire vive maximale et taille du cache (en octets), durée (en s)
+        width, height = self.source.width, self.source.height
+        fmt = frame_format(settings_perso)
+        frameSize = output_size(width, height, settings_perso)
+        first, last, duration = frame_window(settings_perso, self.source.frame_count, self.source.fps)
+        indices = sample_indices(self.source.frame_count, settings_perso[2], first, last)
+        nb_images = len(indices)
+        frame_bytes = int(prod(frame_shape(frameSize, settings_perso[3], fmt)))
+        # Tampons de décodage et de prétraitement (un jeu par processus)
+        work_bytes = width*height*3+frameSize[0]*frameSize[1]*3
+        workers = parallel_workers(nb_images, workers)
+
+        plan = {"width":frameSize[0], "height":frameSize[1], "nb_images":nb_images, "workers":workers}
+        plan["allowed"] = storage != "memory" or settings_perso[2] < max_images(fmt)
+        if storage == "lazy":
+            plan["memory"] = min(nb_images, LAZY_CACHE_SIZE)*frame_bytes+work_bytes
+            plan["disk"] = 0
+            plan["time"] = 0
+            return plan
+
+        increment = indices[1]-indices[0] if nb_images > 1 else 1
+        reduction = mjpeg_reduction(self.source, frameSize, crop_region(settings_perso))
+        if reduction > 1:
+            # MJPEG : les images sautées ne sont pas décodées, les autres le sont directement réduites
+            decode = nb_images*(self.grab_time+width*height*self.pixel_time)/reduction**2
+        else:
+            if choose_decode_mode(increment) == "sequential":
+                # Le saut initial mène à l'image clé qui précède la fenêtre
+                decode = self.seek_time+(indices[-1]-indices[0]+1)*self.grab_time
+            else:
+                decode = nb_images*self.seek_time
+            decode += nb_images*width*height*self.pixel_time
+        if correction_settings(settings_perso) != None:
+            # remap() de chaque image décodée, du même ordre que sa conversion
+            decode += nb_images*width*height*self.pixel_time/reduction**2
+        plan["time"] = decode/workers
+        if stabilisation_enabled(settings_perso) and not self.motion_known(first, last):
+            # Mesure du mouvement de la caméra sur la fenêtre, en parallèle, une seule fois
+            plan["time"] += (last-first)*(self.grab_time+width*height*self.pixel_time)/max(1, workers)
+        if sampling_mode(settings_perso) == "motion":
+            # Mesure préalable du mouvement : toute la fenêtre est décodée une fois, sans parallélisme
+            plan["time"] += (last-first)*(self.grab_time+width*height*self.pixel_time)
+        # Toute importation complète est gardée dans le cache sur le disque
+        plan["disk"] = nb_images*frame_bytes
+        if storage == "memory":
+            # En parallèle, les images passent par la mémoire partagée avant d'être copiées
+            copies = 2 if workers > 1 else 1
+            plan["memory"] = copies*nb_images*frame_bytes+workers*work_bytes
+        else:
+            plan["memory"] = workers*work_bytes
+        return plan
+
+    def motion_known(self, first, last):
+        # Mouvement de la caméra déjà mesuré sur la fenêtre (pendant cette ouverture ou enregistré à côté de la vidéo)
+        return self.source.load_motion(first, last, compute=False) != None
+
+    def propose(self, budget, rotation=0, fmt="rgb", storage="memory", workers=1, window=(0, None), roi=None, sampling="uniform", correction=None, stabilisation=False):
+        # Réglages (largeur, hauteur, nombre d'images, rotation, format, début, fin, zone, choix des images, correction, stabilisation) les
+        # plus grands qui tiennent dans le budget mémoire (en octets) : toutes les images de
+        # la fenêtre d'abord, la résolution est réduite avant le nombre d'images. None si aucun ne tient.
+        width, height = self.source.width, self.source.height
+        # Largeur et hauteur s'appliquent à l'image entière, la limite de taille à la zone importée
+        roi_width, roi_height = (width, height) if roi == None else roi[2:]
+        base = min(1, MAX_WIDTH/roi_width, MAX_HEIGHT/roi_height)
+        first, last, duration = frame_window((width, height, 1, rotation, fmt)+tuple(window), self.source.frame_count, self.source.fps)
+        count = last-first
+        if storage == "memory":
+            count = min(count, max_images(fmt)-1)
+        while count >= 2:
+            for scale in SCALES:
+                settings_perso = (max(2, int(width*base*scale)), max(2, int(height*base*scale)), count, rotation, fmt)+tuple(window)+(roi, sampling, correction, stabilisation)
+                if self.estimate(settings_perso, storage, workers)["memory"] <= budget:
+                    return settings_perso
+            count //= 2
+        return None
@@ -0,0 +1,353 @@
+# Affichage des images et des mesures dans le canvas matplotlib.
+# Les éléments du graphique (image, trajectoire, étalon, flèches des axes) sont créés une
+# seule fois puis mis à jour. Seul un changement de mise en page (étendue, graduations,
+# style, orientation) redessine toute la figure ; sinon, l'image et ce qui la recouvre sont
+# redessinés directement dans le tampon du canvas, puis copiés à l'écran (blitting).
+# Les images sont affichées réduites à la taille de l'écran (voir FramePyramid).
+
+import threading, logging
+from collections import OrderedDict
+
+from cv2 import resize, INTER_AREA
+from matplotlib.image import imread
+from matplotlib.ticker import AutoLocator, ScalarFormatter, NullFormatter
+from numpy import linspace
+
+# Flèches des axes selon l'orientation (voir Window.orient_update) : (marqueur, position
+# en coordonnées d'axe) pour l'axe horizontal puis pour l'axe vertical
+AXIS_ARROWS = {1:((">", 1), ("^", 1)), 2:((">", 1), ("v", 0)), 3:(("<", 0), ("^", 1)), 4:(("<", 0), ("v", 0))}
+# Niveaux de la pyramide d'affichage, par rapport à la taille affichée (2 : vue agrandie)
+PYRAMID_LEVELS = (1, 2)
+# Mémoire maximale des images réduites pour l'affichage (en octets)
+PYRAMID_MEMORY = 256*1024**2
+# Images voisines réduites en arrière-plan de chaque côté de l'image affichée
+PYRAMID_NEIGHBOURS = 4
+# Vignettes d'aperçu (glissement du curseur) : réduction par rapport à la réduction
+# d'affichage, mémoire maximale (en octets)
+THUMBNAIL_SCALE = 4
+THUMBNAIL_MEMORY = 64*1024**2
+
+# Logger de l'application (voir main.py)
+logger = logging.getLogger('debug')
+
+def scale_ticks(low, high, etalonnage):
+    # Six graduations symétriques autour de l'origine, étiquetées en mètres
+    ticks = linspace(-max(abs(low),abs(high)), max(abs(low),abs(high)), 6)
+    return ticks, [round(i*etalonnage["valeurMetres"]/etalonnage["valeurPixels"],3) for i in ticks]
+
+class FramePyramid:
+    # Images réduites à la taille d'affichage (niveau 1) et au double (niveau 2, vue agrandie),
+    # gardées par (numéro de l'image, taille) ; après un redimensionnement, les réductions
+    # sont refaites à la demande, les voisines de l'image affichée en arrière-plan si elles
+    # sont déjà en mémoire (le décodeur reste libre pour l'image demandée par l'interface)
+    def __init__(self, memory=PYRAMID_MEMORY, neighbours=PYRAMID_NEIGHBOURS):
+        self.memory = memory
+        self.neighbours = neighbours
+        self.cache = OrderedDict()
+        self.bytes = 0
+        # Vignette de chaque image déjà lue, gardée après un redimensionnement
+        self.thumbnails = OrderedDict()
+        self.thumbnail_bytes = 0
+        self.get_frame = None
+        self.ready = None
+        self.count = 0
+        # Taille d'affichage de l'image entière (en pixels de l'écran) et forme des images
+        self.size = None
+        self.shape = None
+        # Incrémentée à chaque changement de vidéo : les réductions en cours sont abandonnées
+        self.generation = 0
+
+        self.lock = threading.Lock()
+        self.condition = threading.Condition()
+        self.wanted = None
+        self.thread = None
+
+    def set_source(self, get_frame, count, ready):
+        # ready(k) : l'image k est lisible sans la décoder
+        with self.lock:
+            self.get_frame = get_frame
+            self.ready = ready
+            self.count = count
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+            self.bytes = 0
+            self.thumbnails.clear()
+            self.thumbnail_bytes = 0
+            self.generation += 1
+        with self.condition:
+            self.wanted = None
+
+    def set_size(self, size, shape):
+        # Taille d'affichage de l'image entière, après un redimensionnement
+        with self.lock:
+            self.size = (max(1, int(round(size[0]))), max(1, int(round(size[1]))))
+            self.shape = shape
+
+    def levels(self):
+        # Niveau -> taille, pour les niveaux plus petits que l'image entière
+        if self.size == None:
+            return dict()
+        return dict((level, (self.size[0]*level, self.size[1]*level)) for level in PYRAMID_LEVELS if self.size[0]*level < self.shape[1] and self.size[1]*level < self.shape[0])
+
+    def get(self, k, frame, level=1):
+        # Image k (frame) réduite pour l'affichage, ou frame elle-même si elle n'est pas plus
+        # grande que le niveau demandé ; une réduction manquante est faite tout de suite
+        with self.lock:
+            levels = self.levels()
+            generation = self.generation
+            if level not in levels:
+                display = frame
+            else:
+                key = (k, levels[level])
+                display = self.cache.get(key)
+                if display is not None:
+                    self.cache.move_to_end(key)
+        if display is None:
+            display = resize(frame, key[1], interpolation=INTER_AREA)
+            self.put(key, display, generation)
+        self.request(k)
+        return display
+
+    def thumbnail(self, k):
+        # Vignette de l'image k, ou None (jamais calculée ici : aperçu immédiat uniquement)
+        with self.lock:
+            thumbnail = self.thumbnails.get(k)
+            if thumbnail is not None:
+                self.thumbnails.move_to_end(k)
+            return thumbnail
+
+    def put(self, key, frame, generation):
+        with self.lock:
+            if generation != self.generation or key in self.cache:
+                return
+            self.cache[key] = frame
+            self.bytes += frame.nbytes
+            while self.bytes > self.memory and len(self.cache) > 1:
+                self.bytes -= self.cache.popitem(last=False)[1].nbytes
+
+    def put_thumbnail(self, k, frame, generation):
+        # Vignette de l'image k, réduite depuis l'image entière, que celle-ci soit plus grande
+        # que la taille d'affichage ou non
+        with self.lock:
+            if k in self.thumbnails or self.size == None:
+                return
+            size = (max(1, min(self.size[0], frame.shape[1])//THUMBNAIL_SCALE), max(1, min(self.size[1], frame.shape[0])//THUMBNAIL_SCALE))
+        thumbnail = resize(frame, size, interpolation=INTER_AREA)
+        with self.lock:
+            if generation != self.generation or k in self.thumbnails:
+                return
+            self.thumbnails[k] = thumbnail
+            self.thumbnail_bytes += thumbnail.nbytes
+            while self.thumbnail_bytes > THUMBNAIL_MEMORY and len(self.thumbnails) > 1:
+                self.thumbnail_bytes -= self.thumbnails.popitem(last=False)[1].nbytes
+
+    def request(self, k):
+        with self.lock:
+            if self.get_frame == None or self.size == None:
+                return
+            generation = self.generation
+        with self.condition:
+            self.wanted = (k, generation)
+            self.condition.notify()
+        if self.thread == None:
+            self.thread = threading.Thread(target=self.fill_loop, daemon=True)
+            self.thread.start()
+
+    def fill_loop(self):
+        while True:
+            with self.condition:
+                while self.wanted == None:
+                    self.condition.wait()
+                k, generation = self.wanted
+                self.wanted = None
+            # L'image affichée d'abord, puis ses voisines de plus en plus éloignées
+            for j in [k]+[k+d*s for d in range(1, self.neighbours+1) for s in (1, -1)]:
+                if self.wanted != None:
+                    break
+                with self.lock:
+                    get_frame, ready, count = self.get_frame, self.ready, self.count
+                    sizes = [size for size in self.levels().values() if (j, size) not in self.cache]
+                    done = len(sizes) == 0 and j in self.thumbnails
+                if j < 0 or j >= count or done:
+                    continue
+                try:
+                    if not ready(j):
+                        continue
+                    frame = get_frame(j)
+                    for size in sizes:
+                        self.put((j, size), resize(frame, size, interpolation=INTER_AREA), generation)
+                    self.put_thumbnail(j, frame, generation)
+                except Exception:
+                    # Vidéo fermée ou remplacée pendant la réduction
+                    logger.exception("Réduction de l'image "+str(j)+" impossible")
+                    break
+
+class CanvasRenderer:
+    def __init__(self, canvas, axes):
+        self.canvas = canvas
+        self.axes = axes
+        self.image = None
+        self.trajectory = None
+        self.etalon = None
+        self.arrows = None
+        # Numéro, image et forme de l'image affichée (en pleine résolution ; image à None
+        # pendant un aperçu)
+        self.k = None
+        self.frame = None
+        self.shape = None
+        self.pyramid = FramePyramid()
+        # Mise en page appliquée (None : figure à redessiner entièrement)
+        self.layout = None
+        # Le blitting n'est possible qu'après un premier dessin complet
+        self.drawn = False
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+        self.canvas.mpl_connect("resize_event", self.on_resize)
+
+    def reset(self):
+        # Oubli des éléments (nouvelle vidéo ou retour à l'écran d'accueil)
+        self.axes.cla()
+        self.image = None
+        self.frame = None
+        self.shape = None
+        self.layout = None
+        self.drawn = False
+        self.pyramid.clear()
+
+    def show_logo(self, path):
+        # Image d'accueil, sans axes
+        self.reset()
+        img = imread(path)
+        self.axes.imshow(img, extent=[-img.shape[1]/2., img.shape[1]/2., -img.shape[0]/2., img.shape[0]/2. ])
+        self.axes.set_axis_off()
+        self.axes.margins(0)
+        self.canvas.draw_idle()
+
+    def create(self, frame, extent):
+        self.reset()
+        self.axes.figure.subplots_adjust(bottom=0, right=1, top=1, left=0)
+        self.image = self.axes.imshow(frame, extent=extent)
+        self.etalon, = self.axes.plot([], [], "ro-")
+        self.trajectory, = self.axes.plot([], [])
+        self.arrows = (self.axes.plot(1, 0, "k", transform=self.axes.get_yaxis_transform(), clip_on=False)[0],
+                       self.axes.plot(0, 1, "k", transform=self.axes.get_xaxis_transform(), clip_on=False)[0])
+        self.axes.margins(0)
+        self.axes.spines["left"].set_position(("data", 0))
+        self.axes.spines["bottom"].set_position(("data", 0))
+        self.axes.spines["top"].set_visible(False)
+        self.axes.spines["right"].set_visible(False)
+
+    def set_source(self, get_frame, count, ready):
+        # Pas d'images composées à l'avance avec matplotlib (voir frameview.CompositeCache),
+        # seulement réduites à la taille d'affichage
+        self.pyramid.set_source(get_frame, count, ready)
+
+    def render(self, k, frame, extent, ratio, x, y, settings, etalonnage, etalon, axisType):
+        # k : numéro de l'image ; frame : image RGB ; extent : [gauche, droite, bas, haut] de l'image dans le repère ;
+        # ratio : [left, right, bottom, top] avant orientation (pour les graduations) ;
+        # etalon : ((x1, x2), (y1, y2)) du segment d'étalonnage affiché, ou None
+        if self.image == None or self.shape != frame.shape:
+            self.create(frame, extent)
+            self.shape = frame.shape
+            self.pyramid.set_size(self.display_size(), self.shape)
+        self.k = k
+        self.frame = frame
+        # imshow() ne rééchantillonne que l'image déjà réduite à la taille du graphique
+        self.image.set_data(self.pyramid.get(k, frame))
+        self.trajectory.set_data(x, y)
+        if etalon != None:
+            self.etalon.set_data(*etalon)
+        self.etalon.set_visible(etalon != None)
+
+        calibration = (etalonnage["valeurMetres"], etalonnage["valeurPixels"]) if etalonnage["done"] == True else None
+        layout = (tuple(extent), tuple(ratio), calibration, settings["color"], settings["point"], settings["line"], settings["grid"], settings["ticks"], axisType)
+        if layout != self.layout:
+            self.apply_layout(extent, ratio, settings, etalonnage, calibration, axisType)
+            self.layout = layout
+            self.drawn = False
+            self.canvas.draw_idle()
+        elif self.drawn == True and self.canvas.supports_blit:
+            self.blit()
+        else:
+            self.canvas.draw_idle()
+
+    def preview(self, k):
+        # Aperçu rapide de l'image k (vignette déjà calculée), sans lire l'image elle-même ;
+        # False si aucun aperçu n'est disponible
+        if self.image == None or self.drawn == False:
+            return False
+        thumbnail = self.pyramid.thumbnail(k)
+        if thumbnail is None:
+            return False
+        self.k = k
+        self.frame = None
+        self.image.set_data(thumbnail)
+        if self.canvas.supports_blit:
+            self.blit()
+        else:
+            self.canvas.draw_idle()
+        return True
+
+    def apply_layout(self, extent, ratio, settings, etalonnage, calibration, axisType):
+        left, right, bottom, top = ratio
+        self.image.set_extent(extent)
+        self.axes.set_xlim([extent[0], extent[1]])
+        self.axes.set_ylim([extent[2], extent[3]])
+
+        # Graduations recalculées uniquement ici (étalonnage, orientation ou style modifiés)
+        if calibration != None:
+            ticks, labels = scale_ticks(left, right, etalonnage)
+            self.axes.set_xticks(ticks)
+            self.axes.set_xticklabels(labels if settings["ticks"] else [])
+            ticks, labels = scale_ticks(bottom, top, etalonnage)
+            self.axes.set_yticks(ticks)
+            self.axes.set_yticklabels(labels if settings["ticks"] else [])
+        else:
+            for axis in (self.axes.xaxis, self.axes.yaxis):
+                axis.set_major_locator(AutoLocator())
+                axis.set_major_formatter(ScalarFormatter() if settings["ticks"] else NullFormatter())
+        self.axes.grid(settings["grid"])
+
+        self.trajectory.set_color(settings["color"])
+        self.trajectory.set_marker(settings["point"])
+        self.trajectory.set_linestyle(settings["line"] or "None")
+
+        (hmarker, hpos), (vmarker, vpos) = AXIS_ARROWS[axisType]
+        self.arrows[0].set_data([hpos], [0])
+        self.arrows[0].set_marker(hmarker)
+        self.arrows[1].set_data([0], [vpos])
+        self.arrows[1].set_marker(vmarker)
+
+    def display_size(self):
+        # Taille de l'image entière dans le graphique (en pixels), le rapport largeur/hauteur conservé
+        bbox = self.axes.get_window_extent()
+        scale = min(bbox.width/self.shape[1], bbox.height/self.shape[0])
+        return self.shape[1]*scale, self.shape[0]*scale
+
+    def on_resize(self, event):
+        if self.image != None:
+            self.pyramid.set_size(self.display_size(), self.shape)
+            if self.frame is not None:
+                # Image affichée réduite tout de suite à la nouvelle taille, avant le dessin
+                # qui suit le redimensionnement (les voisines en arrière-plan)
+                self.image.set_data(self.pyramid.get(self.k, self.frame))
+            else:
+                self.pyramid.request(self.k)
+
+    def paint(self):
+        # Dessin immédiat de ce qui est en attente (draw_idle compris), sans attendre la boucle d'évènements
+        self.canvas.repaint()
+
+    def export(self, path):
+        self.canvas.print_figure(path)
+
+    def on_draw(self, event):
+        self.drawn = self.image != None
+
+    def blit(self):
+        # L'image couvre toute la zone du graphique : pas de fond à restaurer, on redessine
+        # l'image puis, dans l'ordre d'affichage, tout ce qui la recouvre
+        for artist in (self.image, self.axes.xaxis, self.axes.yaxis, self.axes.spines["left"], self.axes.spines["bottom"], self.etalon, self.trajectory)+self.arrows:
+            self.axes.draw_artist(artist)
+        self.canvas.blit(self.axes.get_window_extent().padded(10))
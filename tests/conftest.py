@@ -0,0 +1,4 @@
+# Les modules de l'application sont à la racine du dépôt
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
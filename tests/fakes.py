@@ -0,0 +1,65 @@
+# VideoCapture simulée pour les tests : n images numérotées (chaque pixel vaut le numéro
+# de l'image), temps de présentation donnés, et compte des sauts et des décodages
+from bisect import bisect_left
+
+from cv2 import CAP_PROP_POS_FRAMES, CAP_PROP_POS_MSEC
+from numpy import full, copyto, uint8
+
+class FakeCapture:
+    def __init__(self, pts, size=(8, 6), landing=None):
+        # pts : temps des images en ms ; landing : temps demandé -> image où tombe le saut
+        # (pour simuler un saut imprécis, qui dépasse l'image voulue)
+        self.pts = list(pts)
+        self.size = size
+        self.landing = landing or {}
+        self.next = 0
+        self.current = None
+        self.seeks = 0
+        self.grabs = 0
+        self.retrieves = 0
+
+    @classmethod
+    def constant(cls, frame_count, fps=30, **kwargs):
+        return cls([k*1000/fps for k in range(frame_count)], **kwargs)
+
+    def set(self, prop, value):
+        self.seeks += 1
+        if prop == CAP_PROP_POS_FRAMES:
+            self.next = int(value)
+        elif prop == CAP_PROP_POS_MSEC:
+            self.next = self.landing.get(value, bisect_left(self.pts, value))
+        self.current = None
+        return True
+
+    def get(self, prop):
+        if prop == CAP_PROP_POS_MSEC:
+            return self.pts[self.current] if self.current != None else 0
+        if prop == CAP_PROP_POS_FRAMES:
+            return self.next
+        return 0
+
+    def grab(self):
+        if self.next >= len(self.pts):
+            return False
+        self.grabs += 1
+        self.current = self.next
+        self.next += 1
+        return True
+
+    def retrieve(self, buffer=None):
+        if self.current == None:
+            return False, None
+        self.retrieves += 1
+        frame = full((self.size[1], self.size[0], 3), self.current % 256, dtype=uint8)
+        if buffer is not None:
+            copyto(buffer, frame)
+            return True, buffer
+        return True, frame
+
+    def read(self, buffer=None):
+        if not self.grab():
+            return False, None
+        return self.retrieve(buffer)
+
+    def release(self):
+        pass
@@ -0,0 +1,73 @@
+# Taille des images importées (extract.output_size) et correspondance entre un pixel
+# importé et sa position dans l'image d'origine (zone, réduction et rotation), dans les
+# deux sens (loupe en pleine résolution)
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from extract import output_size, source_point, imported_point, FramePreprocessor
+
+def settings_for(frameSize, rotation, roi, camera=(400, 300)):
+    return {"width": frameSize[0], "height": frameSize[1], "rotation": rotation, "roi": roi,
+            "camera_width": camera[0], "camera_height": camera[1]}
+
+def test_output_size():
+    assert output_size(640, 480, (640, 480, 50, 0, "rgb")) == (640, 480)
+    assert output_size(640, 480, (320, 240, 50, 0, "rgb")) == (320, 240)
+    # Au-delà de 1280x720, taille divisée par deux
+    assert output_size(1920, 1080, (1920, 1080, 50, 0, "rgb")) == (960, 540)
+    # Zone : même échelle que l'image entière
+    assert output_size(1920, 1080, (960, 540, 50, 0, "rgb", 0, None, (100, 200, 480, 270))) == (240, 135)
+    assert output_size(1920, 1080, (1920, 1080, 50, 0, "rgb", 0, None, (0, 0, 960, 540))) == (960, 540)
+    # YUV 4:2:0 : dimensions paires
+    assert output_size(1920, 1080, (961, 541, 50, 0, "yuv420")) == (960, 540)
+
+def test_source_point_corners():
+    # Image 400x300 tournée de 90° (sens horaire) : le coin haut gauche d'origine passe en haut à droite
+    settings = settings_for((400, 300), 90, None)
+    assert source_point(settings, 299, 0) == (0, 0)
+    settings = settings_for((400, 300), -90, None)
+    assert source_point(settings, 0, 399) == (0, 0)
+    settings = settings_for((400, 300), 180, None)
+    assert source_point(settings, 399, 299) == (0, 0)
+
+def test_source_point_roi_and_scale():
+    # Zone de 200x100 à partir de (100, 50), importée en 100x50
+    settings = settings_for((100, 50), 0, (100, 50, 200, 100))
+    assert source_point(settings, 0, 0) == (100, 50)
+    assert source_point(settings, 50, 25) == (200, 100)
+
+@pytest.mark.parametrize("rotation", [0, 90, -90, 180])
+def test_source_point_matches_preprocessing(rotation):
+    # Un point blanc de l'image d'origine se retrouve au pixel importé qui lui correspond
+    roi = (40, 30, 200, 160)
+    frameOrig = np.zeros((300, 400, 3), dtype=np.uint8)
+    frameOrig[110, 140] = 255
+    preprocess = FramePreprocessor((200, 160), rotation, (400, 300), "rgb", roi)
+    out = preprocess(frameOrig)
+    row, col = np.argwhere(out[:, :, 0] == 255)[0]
+    assert source_point(settings_for((200, 160), rotation, roi), col, row) == pytest.approx((140, 110))
+
+@pytest.mark.parametrize("rotation", [0, 90, -90, 180])
+def test_imported_point_inverse(rotation):
+    settings = settings_for((100, 80), rotation, (40, 30, 200, 160))
+    for x, y in [(0, 0), (12.5, 70), (99, 3), (57.25, 79)]:
+        if rotation in (90, -90):
+            x, y = y, x
+        assert imported_point(settings, *source_point(settings, x, y)) == pytest.approx((x, y))
+
+@pytest.mark.parametrize("rotation", [0, 90, -90, 180])
+def test_imported_point_matches_preprocessing(rotation):
+    # Position d'un point de l'image d'origine dans l'image importée, sans réduction
+    roi = (40, 30, 200, 160)
+    frameOrig = np.zeros((300, 400, 3), dtype=np.uint8)
+    frameOrig[110, 140] = 255
+    out = FramePreprocessor((200, 160), rotation, (400, 300), "rgb", roi)(frameOrig)
+    row, col = np.argwhere(out[:, :, 0] == 255)[0]
+    assert imported_point(settings_for((200, 160), rotation, roi), 140, 110) == pytest.approx((col, row))
+
+def test_imported_point_outside_region():
+    # Point à gauche de la zone importée : colonne négative
+    x, y = imported_point(settings_for((100, 80), 0, (40, 30, 200, 160)), 20, 30)
+    assert x < 0 and y == 0
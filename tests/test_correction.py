@@ -0,0 +1,85 @@
+# Tables de remap() de correction.py comparées à une correspondance de points calculée à part :
+# homographie résolue directement, puis distorsion de l'objectif par cv2.projectPoints
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from correction import build_tables, target_rectangle
+
+PROFILE = {"name": "test", "width": 200, "height": 100,
+           "camera_matrix": [[150, 0, 100], [0, 150, 50], [0, 0, 1]], "dist_coeffs": [-0.2, 0.05, 0.001, -0.001, 0]}
+# Quadrilatère dans l'image d'origine (deux fois plus grande que les images importées)
+POINTS = ((60, 40), (330, 50), (350, 170), (40, 160))
+SOURCE_SIZE = (400, 200)
+SIZE = (200, 100)
+
+def homography(src, dst):
+    # Homographie envoyant les quatre points src sur les quatre points dst (h33 = 1)
+    A, b = [], []
+    for (x, y), (u, v) in zip(src, dst):
+        A.append([x, y, 1, 0, 0, 0, -u*x, -u*y])
+        A.append([0, 0, 0, x, y, 1, -v*x, -v*y])
+        b += [u, v]
+    return np.append(np.linalg.solve(np.array(A, dtype=float), np.array(b, dtype=float)), 1).reshape(3, 3)
+
+def source_positions(tables):
+    # Position (x, y) lue par remap() pour chaque pixel : partie entière dans map1,
+    # partie fractionnaire en 1/32 de pixel dans map2
+    map1, map2 = tables
+    x = map1[..., 0]+(map2 & 31)/32
+    y = map1[..., 1]+(map2 >> 5)/32
+    return x, y
+
+def pixels():
+    return [(u, v) for u in range(5, SIZE[0], 23) for v in range(3, SIZE[1], 17)]
+
+def test_perspective_only():
+    quad = np.array(POINTS, dtype=float)/2
+    G = homography(target_rectangle(quad), quad)
+    x, y = source_positions(build_tables((None, POINTS), SIZE, SOURCE_SIZE))
+    for u, v in pixels():
+        p = G @ [u, v, 1]
+        assert x[v, u] == pytest.approx(p[0]/p[2], abs=0.05)
+        assert y[v, u] == pytest.approx(p[1]/p[2], abs=0.05)
+
+def test_target_rectangle_corners():
+    # Les coins du rectangle cible sont envoyés sur les coins cliqués
+    quad = np.array(POINTS, dtype=float)/2
+    G = homography(target_rectangle(quad), quad)
+    for corner, point in zip(target_rectangle(quad), quad):
+        p = G @ [corner[0], corner[1], 1]
+        assert p[:2]/p[2] == pytest.approx(point, abs=1e-3)
+
+def test_distortion_only():
+    K = np.array(PROFILE["camera_matrix"], dtype=float)
+    D = np.array(PROFILE["dist_coeffs"], dtype=float)
+    x, y = source_positions(build_tables((PROFILE, None), SIZE, SOURCE_SIZE))
+    for u, v in pixels():
+        ray = np.linalg.inv(K) @ [u, v, 1]
+        projected = cv2.projectPoints(np.array([ray]), np.zeros(3), np.zeros(3), K, D)[0][0, 0]
+        assert x[v, u] == pytest.approx(projected[0], abs=0.05)
+        assert y[v, u] == pytest.approx(projected[1], abs=0.05)
+
+def test_perspective_then_distortion():
+    # Un seul remap() : pixel corrigé -> perspective -> distorsion de l'objectif
+    K = np.array(PROFILE["camera_matrix"], dtype=float)
+    D = np.array(PROFILE["dist_coeffs"], dtype=float)
+    quad = np.array(POINTS, dtype=float)/2
+    G = homography(target_rectangle(quad), quad)
+    x, y = source_positions(build_tables((PROFILE, POINTS), SIZE, SOURCE_SIZE))
+    for u, v in pixels():
+        p = G @ [u, v, 1]
+        ray = np.linalg.inv(K) @ (p/p[2])
+        projected = cv2.projectPoints(np.array([ray]), np.zeros(3), np.zeros(3), K, D)[0][0, 0]
+        assert x[v, u] == pytest.approx(projected[0], abs=0.05)
+        assert y[v, u] == pytest.approx(projected[1], abs=0.05)
+
+def test_profile_scaled_to_frame_size():
+    # Images réduites de moitié : mêmes positions relatives qu'en pleine taille
+    full_x, full_y = source_positions(build_tables((PROFILE, POINTS), SIZE, SOURCE_SIZE))
+    half_x, half_y = source_positions(build_tables((PROFILE, POINTS), (100, 50), SOURCE_SIZE))
+    for u, v in pixels():
+        if u % 2 == 0 and v % 2 == 0:
+            assert half_x[v//2, u//2] == pytest.approx(full_x[v, u]/2, abs=0.05)
+            assert half_y[v//2, u//2] == pytest.approx(full_y[v, u]/2, abs=0.05)
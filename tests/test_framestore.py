@@ -0,0 +1,75 @@
+# Images importées dans un fichier memmap (framestore.FrameStore) : écriture,
+# réouverture sans copie, importation interrompue
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from framestore import FrameStore
+
+SHAPE = (6, 8, 3)
+
+def filled(k):
+    return np.full(SHAPE, k, dtype=np.uint8)
+
+def test_create_save_reopen(tmp_path):
+    path = str(tmp_path/"cache"/"video.frames")
+    store = FrameStore.create(path, 5, SHAPE)
+    for k in range(5):
+        store.write(k, filled(10*k))
+    store.meta["timestamps"] = [k*40.0 for k in range(5)]
+    store.meta["settings"] = {"width": 8, "height": 6}
+    store.save()
+    store.release()
+
+    store = FrameStore.open(path)
+    assert len(store) == 5
+    assert store.meta["timestamps"] == [k*40.0 for k in range(5)]
+    assert store.meta["settings"]["width"] == 8
+    assert [int(store[k][0, 0, 0]) for k in range(5)] == [0, 10, 20, 30, 40]
+    # Vue en lecture seule sur le fichier, sans copie
+    assert isinstance(store[2], np.memmap)
+    assert not store[2].flags.writeable
+    assert store[-1][0, 0, 0] == 40
+    with pytest.raises(IndexError):
+        store[5]
+
+def test_fewer_frames_than_capacity(tmp_path):
+    # Importation arrêtée avant la fin : seules les premières images sont valides
+    path = str(tmp_path/"video.frames")
+    store = FrameStore.create(path, 10, SHAPE)
+    for k in range(3):
+        store.write(k, filled(k+1))
+    store.nb_images = 3
+    store.save()
+    store.release()
+    store = FrameStore.open(path)
+    assert len(store) == 3
+    assert store.meta["capacity"] == 10
+    with pytest.raises(IndexError):
+        store[3]
+
+def test_empty_store(tmp_path):
+    path = str(tmp_path/"video.frames")
+    store = FrameStore.create(path, 0, SHAPE)
+    store.save()
+    store.release()
+    assert len(FrameStore.open(path)) == 0
+
+def test_partial_store_removed_on_release(tmp_path):
+    path = str(tmp_path/"video.frames")
+    store = FrameStore.create(path, 2, SHAPE)
+    store.meta["partial"] = True
+    store.save()
+    store.release()
+    assert not os.path.exists(path)
+    assert not os.path.exists(path+".json")
+
+def test_complete_store_kept_on_release(tmp_path):
+    path = str(tmp_path/"video.frames")
+    store = FrameStore.create(path, 2, SHAPE)
+    store.save()
+    store.release()
+    assert os.path.exists(path) and os.path.exists(path+".json")
@@ -0,0 +1,130 @@
+# Recherche d'une importation dans le cache sur le disque (framestore.ImportCache) :
+# même réglage, réglage absent, rééchantillonnage d'une importation plus grande
+import os, time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from framestore import FrameStore, ImportCache
+
+FINGERPRINT = "0123456789abcdef"
+# Vidéo 128x96 de 20 images à 10 images/s, importée en entier et sans réduction
+CACHED = (128, 96, 20, 0, "rgb")
+
+# Vidéo à fréquence d'images variable : 10 images/s pendant 1 s, puis 20 images/s
+PTS = [k*100.0 for k in range(10)]+[1000+k*50.0 for k in range(10)]
+
+def put_import(cache, settings_perso=CACHED, partial=False, pts=None):
+    # Importation de la vidéo entière : l'image k est remplie de la valeur k
+    store = FrameStore.create(cache.path(FINGERPRINT, settings_perso), 20, (96, 128, 3))
+    for k in range(20):
+        store.write(k, np.full((96, 128, 3), k, dtype=np.uint8))
+    store.meta["timestamps"] = pts or [k*100.0 for k in range(20)]
+    store.meta["settings"] = {"camera_width": 128, "camera_height": 96, "frame_count": 20, "video_fps": 10.0,
+                              "duration": 2.0, "fps": 10.0, "nb_images": 20, "width": 128, "height": 96,
+                              "rotation": 0, "indices": list(range(20)), "indexed": pts != None}
+    if partial:
+        store.meta["partial"] = True
+    cache.put(store, FINGERPRINT, settings_perso)
+    store.frames = None
+    return store.path
+
+def test_miss(tmp_path):
+    cache = ImportCache(str(tmp_path))
+    assert cache.lookup(FINGERPRINT, CACHED) is None
+
+def test_hit(tmp_path):
+    cache = ImportCache(str(tmp_path))
+    path = put_import(cache)
+    store = cache.lookup(FINGERPRINT, CACHED)
+    assert store is not None and store.path == path
+    assert len(store) == 20
+    assert store[7][0, 0, 0] == 7
+    assert store.meta["timestamps"][7] == 700
+
+def test_other_video_or_setting(tmp_path):
+    cache = ImportCache(str(tmp_path))
+    put_import(cache)
+    assert cache.lookup("fedcba9876543210", CACHED) is None
+    # Autre rotation, autre format ou images plus grandes : pas de rééchantillonnage possible
+    assert cache.lookup(FINGERPRINT, (128, 96, 20, 90, "rgb")) is None
+    assert cache.lookup(FINGERPRINT, (128, 96, 20, 0, "gray")) is None
+    assert cache.lookup(FINGERPRINT, (256, 192, 20, 0, "rgb")) is None
+
+def test_partial_import_is_ignored(tmp_path):
+    cache = ImportCache(str(tmp_path))
+    put_import(cache, partial=True)
+    assert cache.lookup(FINGERPRINT, CACHED) is None
+    assert cache.lookup(FINGERPRINT, (64, 48, 10, 0, "rgb")) is None
+
+def test_resample(tmp_path):
+    # Moitié moins d'images, deux fois plus petites : une image sur deux, réduite
+    cache = ImportCache(str(tmp_path))
+    put_import(cache)
+    wanted = (64, 48, 10, 0, "rgb")
+    store = cache.lookup(FINGERPRINT, wanted)
+    assert store is not None and store.path == cache.path(FINGERPRINT, wanted)
+    assert len(store) == 10
+    assert store[0].shape == (48, 64, 3)
+    assert store.meta["settings"]["indices"] == list(range(0, 20, 2))
+    assert store.meta["timestamps"] == [k*100.0 for k in range(0, 20, 2)]
+    assert [int(store[j][0, 0, 0]) for j in range(10)] == list(range(0, 20, 2))
+    # L'importation rééchantillonnée est gardée pour la fois suivante
+    assert cache.lookup(FINGERPRINT, wanted).path == store.path
+
+def test_resample_time_window(tmp_path):
+    # Fenêtre [0,5 s ; 1,5 s] : images 5 à 15 de l'importation en cache
+    cache = ImportCache(str(tmp_path))
+    put_import(cache)
+    store = cache.lookup(FINGERPRINT, (128, 96, 20, 0, "rgb", 0.5, 1.5))
+    assert store is not None
+    assert store.meta["settings"]["indices"] == list(range(5, 16))
+
+def test_resample_with_index(tmp_path):
+    # Fenêtre [1 s ; 1,2 s] sur les temps réels : images 10 à 14 (et non 10 à 12 d'après les fps)
+    cache = ImportCache(str(tmp_path))
+    put_import(cache, pts=PTS)
+    wanted = (128, 96, 20, 0, "rgb", 1.0, 1.2)
+    index = {"pts": PTS, "keyframes": None}
+    assert cache.lookup(FINGERPRINT, wanted) is None
+    store = cache.lookup(FINGERPRINT, wanted, index)
+    assert store is not None
+    assert store.meta["settings"]["indices"] == list(range(10, 15))
+    assert store.meta["settings"]["duration"] == pytest.approx(0.25)
+    assert store.meta["timestamps"] == PTS[10:15]
+
+def test_no_resample_across_index(tmp_path):
+    # Importation faite sans index : pas de rééchantillonnage pour une importation avec index
+    cache = ImportCache(str(tmp_path))
+    put_import(cache)
+    assert cache.lookup(FINGERPRINT, (64, 48, 10, 0, "rgb"), {"pts": PTS, "keyframes": None}) is None
+
+def test_put_images(tmp_path):
+    cache = ImportCache(str(tmp_path))
+    images = np.stack([np.full((48, 64, 3), k, dtype=np.uint8) for k in range(4)])
+    settings = {"camera_width": 128, "camera_height": 96, "frame_count": 20, "width": 64, "height": 48, "indices": [0, 5, 10, 15]}
+    wanted = (64, 48, 4, 0, "rgb")
+    cache.put_images(FINGERPRINT, wanted, images, settings, [0.0, 500.0, 1000.0, 1500.0])
+    # Fichiers temporaires renommés : seule l'entrée complète reste
+    path = cache.path(FINGERPRINT, wanted)
+    assert sorted(os.listdir(str(tmp_path))) == sorted([os.path.basename(path), os.path.basename(path)+".json"])
+    store = cache.lookup(FINGERPRINT, wanted)
+    assert store is not None and len(store) == 4
+    assert store[3][0, 0, 0] == 3
+    assert store.meta["timestamps"][1] == 500
+
+def test_stale_partial_files_removed(tmp_path):
+    cache = ImportCache(str(tmp_path))
+    old = tmp_path/"0123.frames.12-34"
+    recent = tmp_path/"4567.frames.12-56"
+    for partial in (old, recent):
+        partial.write_bytes(b"0")
+    past = time.time()-2*24*3600
+    os.utime(str(old), (past, past))
+    path = put_import(cache)
+    assert not old.exists()
+    # Écriture peut-être encore en cours dans un autre thread ou processus
+    assert recent.exists()
+    assert os.path.exists(path) and os.path.exists(path+".json")
@@ -0,0 +1,99 @@
+# Index des images (extract.py) : image la plus proche d'un temps, image clé précédente,
+# lecture exacte d'une image même quand le saut tombe trop loin, index enregistré à côté de la vidéo
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from extract import frame_at, keyframe_before, grab_frame, read_frames, index_needed, load_index, stored_index, index_path
+from fakes import FakeCapture
+
+# Fréquence d'images variable : 30 images/s puis 10 images/s, une image clé toutes les 10 images
+PTS = [k*1000/30 for k in range(20)]+[2000/3+k*100 for k in range(20)]
+INDEX = {"pts": PTS, "keyframes": [0, 10, 20, 30]}
+
+def test_frame_at():
+    assert frame_at(INDEX, 0) == 0
+    assert frame_at(INDEX, PTS[25]) == 25
+    assert frame_at(INDEX, PTS[25]+40) == 25
+    assert frame_at(INDEX, PTS[25]+60) == 26
+    # À égale distance : l'image d'avant
+    assert frame_at(INDEX, (PTS[3]+PTS[4])/2) == 3
+    assert frame_at(INDEX, -10) == 0
+    assert frame_at(INDEX, 1e6) == len(PTS)-1
+
+def test_keyframe_before():
+    assert keyframe_before(INDEX, 0) == 0
+    assert keyframe_before(INDEX, 9) == 0
+    assert keyframe_before(INDEX, 10) == 10
+    assert keyframe_before(INDEX, 35) == 30
+    assert keyframe_before({"pts": PTS, "keyframes": [5, 15]}, 3) == 3
+    assert keyframe_before({"pts": PTS, "keyframes": None}, 17) == 17
+
+def test_grab_frame_seeks_to_keyframe():
+    capture = FakeCapture(PTS)
+    assert grab_frame(capture, 25, None, INDEX) == 25
+    assert capture.get(cv2.CAP_PROP_POS_MSEC) == PTS[25]
+    # Saut à l'image clé 20 puis décodage des images 20 à 25
+    assert capture.seeks == 1
+    assert capture.grabs == 6
+
+def test_grab_frame_moves_forward_without_seek():
+    capture = FakeCapture(PTS)
+    grab_frame(capture, 22, None, INDEX)
+    seeks = capture.seeks
+    assert grab_frame(capture, 26, 22, INDEX) == 26
+    assert capture.seeks == seeks
+
+def test_grab_frame_overshoot():
+    # Le saut vers l'image clé 20 tombe sur l'image 27 : reprise à l'image clé 10
+    capture = FakeCapture(PTS, landing={PTS[20]: 27})
+    assert grab_frame(capture, 25, None, INDEX) == 25
+    ret, frame = capture.retrieve()
+    assert frame[0, 0, 0] == 25
+
+def test_grab_frame_overshoot_restarts():
+    # Pas d'image clé plus tôt : reprise au début de la vidéo
+    capture = FakeCapture(PTS, landing={PTS[10]: 14})
+    assert grab_frame(capture, 12, None, INDEX) == 12
+    assert capture.get(cv2.CAP_PROP_POS_MSEC) == PTS[12]
+
+def test_grab_frame_end_of_video():
+    assert grab_frame(FakeCapture(PTS[:30]), 35, None, INDEX) is None
+
+def test_read_frames_uses_real_timestamps():
+    read = [(i, int(frame[0, 0, 0]), t) for i, frame, t in read_frames(FakeCapture(PTS), [5, 18, 22, 39], index=INDEX)]
+    assert read == [(i, i, PTS[i]) for i in (5, 18, 22, 39)]
+
+def test_index_needed():
+    # Vidéo de 3000 images à 30 images/s
+    assert index_needed((640, 480, 20, 0, "rgb", 10.0, 11.0), 3000, 30) == False
+    assert index_needed((640, 480, 20, 0, "rgb", 10.0, 11.0), 3000, 30, lazy=True) == True
+    # Images lues par sauts (une image sur 60), sur moins de la moitié de la vidéo
+    assert index_needed((640, 480, 20, 0, "rgb", 10.0, 50.0), 3000, 30) == True
+    assert index_needed((640, 480, 400, 0, "rgb", 10.0, 50.0), 3000, 30) == False
+    # Fenêtre couvrant plus de la moitié de la vidéo
+    assert index_needed((640, 480, 1000, 0, "rgb", 0, 60.0), 3000, 30) == True
+
+def test_index_saved_next_to_video(tmp_path):
+    video_file = str(tmp_path/"video.avi")
+    writer = cv2.VideoWriter(video_file, cv2.VideoWriter_fourcc(*"MJPG"), 25, (32, 24))
+    if not writer.isOpened():
+        pytest.skip("écriture des vidéos MJPEG indisponible")
+    for k in range(12):
+        writer.write(np.full((24, 32, 3), 20*k, dtype=np.uint8))
+    writer.release()
+
+    assert stored_index(video_file) is None
+    index = load_index(video_file)
+    assert index is not None
+    assert len(index["pts"]) == 12
+    assert index["pts"] == sorted(index["pts"])
+    assert os.path.exists(index_path(video_file))
+    assert stored_index(video_file) == index
+    # Vidéo modifiée : l'index enregistré ne correspond plus
+    with open(video_file, "ab") as videofile:
+        videofile.write(b"\0")
+    assert stored_index(video_file) is None
@@ -0,0 +1,64 @@
+# Décodage réduit des vidéos MJPEG (extract.py) : choix de la réduction et images
+# décodées directement à 1/2, 1/4 ou 1/8 de leur taille
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from extract import mjpeg_reduction, open_mjpeg, extract_images, VideoSource
+
+class Source:
+    def __init__(self, codec, width=1280, height=960):
+        self.codec, self.width, self.height = codec, width, height
+
+def test_reduction():
+    source = Source("MJPG")
+    assert mjpeg_reduction(source, (1280, 960)) == 1
+    assert mjpeg_reduction(source, (640, 480)) == 2
+    assert mjpeg_reduction(source, (320, 240)) == 4
+    assert mjpeg_reduction(source, (160, 120)) == 8
+    assert mjpeg_reduction(source, (100, 50)) == 8
+    # Jamais plus petit que la taille voulue
+    assert mjpeg_reduction(source, (330, 240)) == 2
+    assert mjpeg_reduction(Source("mjpg"), (320, 240)) == 4
+
+def test_reduction_other_codecs():
+    assert mjpeg_reduction(Source("avc1"), (160, 120)) == 1
+    assert mjpeg_reduction(Source("H264"), (160, 120)) == 1
+
+def test_reduction_with_region():
+    # Zone de 640x480 : réduction limitée par la zone, pas par l'image entière
+    assert mjpeg_reduction(Source("MJPG"), (160, 120), (100, 100, 640, 480)) == 4
+    assert mjpeg_reduction(Source("MJPG"), (400, 300), (100, 100, 640, 480)) == 1
+
+@pytest.fixture
+def mjpeg_video(tmp_path):
+    video_file = str(tmp_path/"webcam.avi")
+    writer = cv2.VideoWriter(video_file, cv2.VideoWriter_fourcc(*"MJPG"), 25, (320, 240))
+    if not writer.isOpened():
+        pytest.skip("écriture des vidéos MJPEG indisponible")
+    for k in range(8):
+        writer.write(np.full((240, 320, 3), 30*k, dtype=np.uint8))
+    writer.release()
+    return video_file
+
+def test_reduced_decoding(mjpeg_video):
+    capture = open_mjpeg(mjpeg_video, 4)
+    if capture is None:
+        pytest.skip("lecture des paquets bruts indisponible")
+    try:
+        ret, frame = capture.read()
+        assert ret
+        assert frame.shape == (60, 80, 3)
+    finally:
+        capture.release()
+
+def test_reduced_import_matches_full_decoding(mjpeg_video):
+    source = VideoSource(mjpeg_video)
+    assert mjpeg_reduction(source, (80, 60)) == 4
+    reduced, settings, error, mytime = extract_images(source, (80, 60, 8, 0, "rgb"))
+    source.release()
+    assert not error and len(reduced) == 8
+    assert reduced[0].shape == (60, 80, 3)
+    # Images unies : mêmes valeurs qu'avec un décodage complet (à la compression près)
+    assert [int(image[30, 40, 0]) for image in reduced] == pytest.approx([30*k for k in range(8)], abs=4)
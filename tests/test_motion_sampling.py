@@ -0,0 +1,51 @@
+# Choix des images selon le mouvement (extract.motion_indices) : le budget d'images va
+# aux passages où l'image change, sans doublon ni image hors de la fenêtre
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from extract import motion_indices, motion_energy
+from fakes import FakeCapture
+
+def check(indices, first, n, maxFrames):
+    assert len(indices) == min(maxFrames, n)
+    assert indices == sorted(set(indices))
+    assert indices[0] >= first and indices[-1] < first+n
+
+def test_uniform_motion_is_uniform():
+    indices = motion_indices([0]+[1.0]*99, 0, 10)
+    check(indices, 0, 100, 10)
+    steps = [b-a for a, b in zip(indices, indices[1:])]
+    assert max(steps)-min(steps) <= 1
+
+def test_budget_follows_motion():
+    # Mouvement seulement entre les images 40 et 60 d'une fenêtre commençant à l'image 200
+    energy = [0.0]*100
+    for k in range(40, 60):
+        energy[k] = 10.0
+    indices = motion_indices(energy, 200, 20)
+    check(indices, 200, 100, 20)
+    moving = [i for i in indices if 240 <= i < 260]
+    assert len(moving) > 15
+    # La première image de la fenêtre est toujours gardée
+    assert indices[0] == 200
+
+def test_burst_keeps_distinct_frames():
+    # Tout le mouvement sur une seule image : les indices restent distincts
+    energy = [0.0]*30
+    energy[10] = 1000.0
+    check(motion_indices(energy, 0, 25), 0, 30, 25)
+
+def test_budget_larger_than_window():
+    assert motion_indices([0, 1, 2, 3], 7, 10) == [7, 8, 9, 10]
+
+def test_still_video():
+    check(motion_indices([0.0]*50, 0, 5), 0, 50, 5)
+
+def test_motion_energy():
+    # Images de valeur k : différence moyenne de 1 entre deux images consécutives
+    energy = motion_energy(FakeCapture.constant(40, size=(128, 96)), 10, 20)
+    assert len(energy) == 10
+    assert energy[0] == 0
+    assert energy[1:] == pytest.approx([1.0]*9)
@@ -0,0 +1,101 @@
+# Planification d'une importation (planner.ImportPlanner) : mémoire, disque et durée
+# estimés, réglages proposés pour un budget mémoire, étalonnage sur quelques images
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from extract import max_images
+from planner import ImportPlanner, LAZY_CACHE_SIZE, CALIBRATION_FRAMES, MAX_WIDTH, MAX_HEIGHT
+from fakes import FakeCapture
+
+class FakeSource:
+    # Vidéo 1920x1080 à 30 images/s, sans mouvement de la caméra déjà mesuré
+    def __init__(self, frame_count=600, codec="avc1"):
+        self.width, self.height = 1920, 1080
+        self.fps = 30
+        self.frame_count = frame_count
+        self.codec = codec
+        self.video_capture = FakeCapture.constant(frame_count, size=(self.width, self.height))
+
+    def load_motion(self, first, last, workers=1, compute=True, callback=None):
+        return None
+
+FRAME_BYTES = 640*360*3
+WORK_BYTES = 1920*1080*3+640*360*3
+
+def test_estimate_memory():
+    plan = ImportPlanner(FakeSource()).estimate((640, 360, 100, 0, "rgb"))
+    assert (plan["width"], plan["height"], plan["nb_images"]) == (640, 360, 100)
+    assert plan["memory"] == 100*FRAME_BYTES+WORK_BYTES
+    assert plan["disk"] == 100*FRAME_BYTES
+    assert plan["allowed"]
+    assert plan["time"] > 0
+
+def test_estimate_formats_and_storage():
+    planner = ImportPlanner(FakeSource())
+    gray = planner.estimate((640, 360, 100, 0, "gray"))
+    assert gray["memory"] == 100*640*360+WORK_BYTES
+    lazy = planner.estimate((640, 360, 300, 0, "rgb"), "lazy")
+    assert lazy["memory"] == LAZY_CACHE_SIZE*FRAME_BYTES+WORK_BYTES
+    assert lazy["disk"] == 0 and lazy["time"] == 0
+    disk = planner.estimate((640, 360, 300, 0, "rgb"), "disk")
+    assert disk["memory"] == WORK_BYTES
+    assert disk["disk"] == 300*FRAME_BYTES
+    # Trop d'images pour la mémoire, mais pas pour le disque
+    assert not planner.estimate((640, 360, max_images(), 0, "rgb"))["allowed"]
+    assert disk["allowed"]
+
+def test_estimate_parallel_copies():
+    # En parallèle, les images passent par la mémoire partagée
+    plan = ImportPlanner(FakeSource()).estimate((640, 360, 100, 0, "rgb"), workers=4)
+    assert plan["workers"] > 1
+    assert plan["memory"] == 2*100*FRAME_BYTES+plan["workers"]*WORK_BYTES
+
+def test_estimate_time_window():
+    # Moitié moins d'images décodées sur une fenêtre deux fois plus courte
+    planner = ImportPlanner(FakeSource())
+    whole = planner.estimate((640, 360, 100, 0, "rgb", 0, 10.0))
+    half = planner.estimate((640, 360, 100, 0, "rgb", 0, 5.0))
+    assert half["time"] < whole["time"]
+
+def test_propose_fits_budget():
+    planner = ImportPlanner(FakeSource(frame_count=100))
+    budget = 512*1024**2
+    settings = planner.propose(budget)
+    assert settings[:2] == (MAX_WIDTH, MAX_HEIGHT)
+    assert settings[2] == 100
+    assert planner.estimate(settings)["memory"] <= budget
+
+def test_propose_reduces_resolution_first():
+    planner = ImportPlanner(FakeSource(frame_count=100))
+    budget = 100*640*360*3+WORK_BYTES
+    settings = planner.propose(budget)
+    assert settings[2] == 100
+    assert settings[0] < MAX_WIDTH
+    assert planner.estimate(settings)["memory"] <= budget
+
+def test_propose_memory_limit_and_disk():
+    planner = ImportPlanner(FakeSource(frame_count=600))
+    assert planner.propose(10*1024**3)[2] < max_images()
+    assert planner.propose(10*1024**3, storage="disk")[2] == 600
+
+def test_propose_nothing_fits():
+    assert ImportPlanner(FakeSource()).propose(1024) is None
+
+def test_calibrate():
+    source = FakeSource()
+    planner = ImportPlanner(source)
+    assert planner.calibrate()
+    assert planner.calibrated
+    assert planner.grab_time > 0 and planner.pixel_time > 0 and planner.seek_time > 0
+    # L'étalonnage ne décode que quelques images et revient au début
+    assert source.video_capture.grabs == CALIBRATION_FRAMES+1
+    assert source.video_capture.next == 0
+
+def test_calibrate_empty_video():
+    source = FakeSource(frame_count=0)
+    source.frame_count = 600
+    planner = ImportPlanner(source)
+    assert not planner.calibrate()
+    assert not planner.calibrated
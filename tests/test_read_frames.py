@@ -0,0 +1,58 @@
+# Lecture des images choisies (extract.read_frames) : un saut par image en mode "seek",
+# une seule passe grab()/retrieve() en mode "sequential", choix selon le pas en mode "auto"
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from extract import read_frames, choose_decode_mode, SEQUENTIAL_MAX_STRIDE
+from fakes import FakeCapture
+
+def frames(capture, indices, mode, buffer=None):
+    # (indice, numéro de l'image décodée, temps) pour chaque image lue
+    return [(i, int(frame[0, 0, 0]), t) for i, frame, t in read_frames(capture, indices, mode, buffer)]
+
+def test_sequential_single_pass():
+    capture = FakeCapture.constant(100)
+    read = frames(capture, range(10, 40, 3), "sequential")
+    assert [i for i, n, t in read] == list(range(10, 40, 3))
+    assert all(i == n for i, n, t in read)
+    assert [t for i, n, t in read] == pytest.approx([i*1000/30 for i in range(10, 40, 3)])
+    # Un seul saut, chaque image de 10 à 37 décodée une fois, seules les images gardées converties
+    assert capture.seeks == 1
+    assert capture.grabs == 28
+    assert capture.retrieves == 10
+
+def test_seek_per_frame():
+    capture = FakeCapture.constant(300)
+    read = frames(capture, [0, 100, 200], "seek")
+    assert [(i, n) for i, n, t in read] == [(0, 0), (100, 100), (200, 200)]
+    assert capture.seeks == 3
+    assert capture.grabs == 3
+
+def test_same_frames_in_both_modes():
+    indices = [3, 4, 9, 20, 21, 50]
+    assert frames(FakeCapture.constant(60), indices, "sequential") == frames(FakeCapture.constant(60), indices, "seek")
+
+def test_auto_mode_follows_stride():
+    assert choose_decode_mode(1) == "sequential"
+    assert choose_decode_mode(SEQUENTIAL_MAX_STRIDE) == "sequential"
+    assert choose_decode_mode(SEQUENTIAL_MAX_STRIDE+1) == "seek"
+    small = FakeCapture.constant(1000)
+    frames(small, range(0, 100, 5), "auto")
+    assert small.seeks == 1
+    large = FakeCapture.constant(1000)
+    frames(large, range(0, 1000, 100), "auto")
+    assert large.seeks == 10
+
+def test_decoder_writes_into_buffer():
+    capture = FakeCapture.constant(20)
+    buffer = np.empty((6, 8, 3), dtype=np.uint8)
+    for i, frame, t in read_frames(capture, [2, 5], "sequential", buffer):
+        assert frame is buffer
+        assert frame[0, 0, 0] == i
+
+def test_stops_at_end_of_video():
+    assert [i for i, n, t in frames(FakeCapture.constant(10), [5, 8, 12, 15], "sequential")] == [5, 8]
+    assert [i for i, n, t in frames(FakeCapture.constant(10), [5, 12], "seek")] == [5]
+    assert frames(FakeCapture.constant(10), [], "auto") == []
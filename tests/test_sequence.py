@@ -0,0 +1,51 @@
+# Suites d'images numérotées (extract.py) : tri des fichiers par numéro, choix des
+# fichiers d'un dossier ou de la même suite que le fichier choisi, importation
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from extract import sequence_key, sequence_files, is_sequence, ImageSequenceSource, extract_images
+
+def touch(folder, *names):
+    for name in names:
+        (folder/name).write_bytes(b"")
+
+def test_sequence_key_numeric_order():
+    names = ["img_10.png", "img_2.png", "img_1.png", "img_100.png"]
+    assert sorted(names, key=sequence_key) == ["img_1.png", "img_2.png", "img_10.png", "img_100.png"]
+    # Numéros sur un nombre fixe de chiffres : même ordre
+    assert sorted(["f0010.tif", "f0009.tif"], key=sequence_key) == ["f0009.tif", "f0010.tif"]
+    # Préfixe d'abord, fichiers sans numéro avant les autres
+    assert sorted(["b1.png", "a2.png", "a.png"], key=sequence_key) == ["a.png", "a2.png", "b1.png"]
+
+def test_folder(tmp_path):
+    touch(tmp_path, "shot_3.png", "shot_1.png", "shot_12.PNG", "notes.txt", "clip.mp4")
+    assert is_sequence(str(tmp_path))
+    assert [os.path.basename(f) for f in sequence_files(str(tmp_path))] == ["shot_1.png", "shot_3.png", "shot_12.PNG"]
+
+def test_same_sequence_as_chosen_file(tmp_path):
+    touch(tmp_path, "a_001.jpg", "a_002.jpg", "a_003.jpeg", "b_001.jpg", "a_004.JPG", "a_ref.jpg")
+    chosen = str(tmp_path/"a_002.jpg")
+    assert is_sequence(chosen)
+    # Même préfixe et même extension (sans tenir compte de la casse)
+    assert [os.path.basename(f) for f in sequence_files(chosen)] == ["a_001.jpg", "a_002.jpg", "a_004.JPG"]
+
+def test_not_a_sequence(tmp_path):
+    assert not is_sequence(str(tmp_path/"video.mp4"))
+
+def test_import_sequence(tmp_path):
+    # Suite de 12 PNG à 50 images/s, importée comme une vidéo (une image sur deux)
+    for k in range(12):
+        cv2.imwrite(str(tmp_path/"frame_{}.png".format(k)), np.full((24, 32, 3), 10*k, dtype=np.uint8))
+    source = ImageSequenceSource(str(tmp_path), fps=50)
+    assert (source.width, source.height, source.frame_count) == (32, 24, 12)
+    assert source.timed
+    images, settings, error, mytime = extract_images(source, (32, 24, 6, 0, "rgb"))
+    source.release()
+    assert not error
+    assert settings["indices"] == [0, 2, 4, 6, 8, 10]
+    assert mytime == pytest.approx([0, 40, 80, 120, 160, 200])
+    assert [int(image[0, 0, 0]) for image in images] == [0, 20, 40, 60, 80, 100]
@@ -0,0 +1,60 @@
+# Lissage de la trajectoire de la caméra (extract.smooth_corrections) et déplacement
+# appliqué à chaque image (extract.Stabilizer) sur des trajectoires connues
+import math
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from extract import smooth_corrections, Stabilizer
+
+def test_steady_pan_is_kept():
+    # Panoramique régulier : la moyenne glissante d'une droite est la droite elle-même
+    motion = [(2.0, -1.0, 0.01)]*40
+    corrections = smooth_corrections(motion, radius=5)
+    assert corrections.shape == (40, 3)
+    assert np.abs(corrections[5:35]).max() == pytest.approx(0, abs=1e-9)
+
+def test_single_shake_is_spread():
+    # Secousse d'une seule image : la caméra part de 3 pixels puis revient
+    radius = 2
+    motion = np.zeros((20, 3))
+    motion[10, 0] = 3
+    motion[11, 0] = -3
+    corrections = smooth_corrections(motion, radius)
+    expected = np.zeros(20)
+    expected[10-radius:10+radius+1] = 3/(2*radius+1)
+    expected[10] -= 3
+    assert corrections[:, 0] == pytest.approx(expected)
+    assert np.abs(corrections[:, 1:]).max() == 0
+
+def test_still_camera():
+    assert np.abs(smooth_corrections(np.zeros((10, 3)), radius=3)).max() == 0
+
+def test_stabilizer_matrix():
+    # Mouvement des images [10, 30) d'une vidéo 200x100, images importées en 100x50
+    motion = np.zeros((20, 3))
+    motion[5] = (4, 2, 0.1)
+    motion[6] = (-4, -2, -0.1)
+    stabilizer = Stabilizer(motion, (200, 100), first=10, radius=1)
+    dx, dy, da = stabilizer.corrections[5]
+    matrix = stabilizer.matrix(15, (100, 50))
+    assert matrix == pytest.approx(np.array([[math.cos(da), -math.sin(da), dx/2], [math.sin(da), math.cos(da), dy/2]]))
+    # Images hors de la fenêtre mesurée : correction de l'image la plus proche
+    assert stabilizer.matrix(0, (100, 50)) == pytest.approx(stabilizer.matrix(10, (100, 50)))
+    assert stabilizer.matrix(100, (100, 50)) == pytest.approx(stabilizer.matrix(29, (100, 50)))
+
+def test_stabilizer_moves_frame():
+    # Déplacement horizontal d'un pixel : le point blanc suit la correction
+    motion = np.zeros((3, 3))
+    motion[1, 0] = 3
+    motion[2, 0] = -3
+    stabilizer = Stabilizer(motion, (20, 10), radius=1)
+    frame = np.zeros((10, 20, 3), dtype=np.uint8)
+    frame[5, 10] = 255
+    dx = stabilizer.corrections[1][0]
+    assert dx == pytest.approx(-2)
+    out = stabilizer(frame, 1)
+    assert out[5, 8].tolist() == [255, 255, 255]
+    assert out[5, 10].tolist() == [0, 0, 0]
@@ -0,0 +1,47 @@
+# Fenêtre d'importation (extract.frame_window) : images [first, last) et durée d'après le
+# début et la fin choisis, sur les fps ou sur les temps réels de l'index
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from extract import frame_window, time_window, sample_indices
+
+# Fréquence d'images variable : 10 images/s pendant 1 s, puis 20 images/s
+PTS = [k*100.0 for k in range(10)]+[1000+k*50.0 for k in range(10)]
+INDEX = {"pts": PTS, "keyframes": None}
+
+def test_whole_video():
+    assert time_window((640, 480, 50, 0, "rgb")) == (0, None)
+    assert frame_window((640, 480, 50, 0, "rgb"), 300, 30) == (0, 300, 10.0)
+
+def test_window_from_fps():
+    first, last, duration = frame_window((640, 480, 50, 0, "rgb", 1.0, 2.0), 300, 30)
+    assert (first, last) == (30, 61)
+    assert duration == pytest.approx(31/30)
+    # Tout le budget d'images est dépensé dans la fenêtre
+    indices = sample_indices(300, 10, first, last)
+    assert indices[0] == 30 and indices[-1] < 61
+    assert len(indices) >= 10
+
+def test_window_to_end():
+    assert frame_window((640, 480, 50, 0, "rgb", 9.0, None), 300, 30)[:2] == (270, 300)
+
+def test_window_clamped():
+    # Début après la fin de la vidéo : au moins la dernière image
+    assert frame_window((640, 480, 50, 0, "rgb", 100.0, None), 300, 30)[:2] == (299, 300)
+    # Fin avant le début : au moins une image
+    assert frame_window((640, 480, 50, 0, "rgb", 2.0, 1.0), 300, 30)[:2] == (60, 61)
+    assert frame_window((640, 480, 50, 0, "rgb", 0, 100.0), 300, 30)[:2] == (0, 300)
+
+def test_window_from_index():
+    first, last, duration = frame_window((640, 480, 50, 0, "rgb", 0.5, 1.2), len(PTS), 10, INDEX)
+    assert (first, last) == (5, 15)
+    # Du temps de l'image 5 à celui de l'image 15 (0,5 s puis 0,25 s)
+    assert duration == pytest.approx(0.75)
+
+def test_window_from_index_to_end():
+    first, last, duration = frame_window((640, 480, 50, 0, "rgb", 1.0, None), len(PTS), 10, INDEX)
+    assert (first, last) == (10, 20)
+    # Dernière image comptée pour la durée moyenne d'une image de la vidéo
+    assert duration == pytest.approx(1.45+1.45/19-1.0)